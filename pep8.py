@@ -18,17 +18,25 @@ from __future__ import with_statement
 import os
 import sys
 import re
+import json
 import time
-import inspect
+import codecs
+import bisect
 import keyword
 import tokenize
+from array import array
+from collections import OrderedDict, deque
 from optparse import OptionParser
-from fnmatch import fnmatch
+from fnmatch import translate
 try:
     from configparser import RawConfigParser
     from io import TextIOWrapper
 except ImportError:
     from ConfigParser import RawConfigParser
+try:
+    import resource
+except ImportError:
+    resource = None
 
 __version__ = '1.6.2'
 
@@ -67,7 +75,17 @@ NEWLINE = frozenset([tokenize.NL, tokenize.NEWLINE])
 SKIP_TOKENS = NEWLINE.union([tokenize.INDENT, tokenize.DEDENT])
 # ERRORTOKEN is triggered by backticks in Python 3
 SKIP_COMMENTS = SKIP_TOKENS.union([tokenize.COMMENT, tokenize.ERRORTOKEN])
+VISUAL_SKIP_TOKENS = frozenset([tokenize.NL, tokenize.COMMENT])
+CONCATENATED_TOKENS = frozenset([tokenize.STRING, tokenize.COMMENT])
 BENCHMARK_KEYS = ['directories', 'files', 'logical lines', 'physical lines']
+CACHE_KEYS = ['cache hits', 'cache misses']
+MEMO_KEYS = ['memo hits', 'memo misses']
+CACHE_MAX_ENTRIES = 100000
+CACHE_PRUNE_RATIO = 0.9     # Of the entries kept when the cache is pruned
+MMAP_MIN_SIZE = 16 * 1024 * 1024
+WALK_THREADS = 8
+ARCHIVE_SUFFIXES = ('.zip', '.whl', '.tar', '.tar.gz', '.tgz')
+ARCHIVE_READ_AHEAD = 4  # Members read ahead of the results, for each job
 
 INDENT_REGEX = re.compile(r'([ \t]*)')
 RAISE_COMMA_REGEX = re.compile(r'raise\s+\w+\s*,')
@@ -85,6 +103,8 @@ KEYWORD_REGEX = re.compile(r'(\s*)\b(?:%s)\b(\s*)' % r'|'.join(KEYWORDS))
 OPERATOR_REGEX = re.compile(r'(?:[^,\s])(\s*)(?:[-+*/|!<=>%&^]+)(\s*)')
 LAMBDA_REGEX = re.compile(r'\blambda\b')
 HUNK_REGEX = re.compile(r'^@@ -\d+(?:,\d+)? \+(\d+)(?:,(\d+))? @@.*$')
+INDENT_TAB_REGEX = re.compile(r'^ *\t', re.M)
+TRAILING_WHITESPACE_REGEX = re.compile(r'[ \t\v]\x0c*\r*$', re.M)
 
 # Work around Python < 2.6 behaviour, which does not generate NL after
 # a comment which is on a line by itself.
@@ -307,13 +327,21 @@ def missing_whitespace(logical_line):
     E231: [{'a':'b'}]
     """
     line = logical_line
+    # The square brackets before index, counted up to the previous colon
+    counted = open_squares = 0
+    last_brace = last_square = -1
     for index in range(len(line) - 1):
         char = line[index]
         if char in ',;:' and line[index + 1] not in WHITESPACE:
-            before = line[:index]
-            if char == ':' and before.count('[') > before.count(']') and \
-                    before.rfind('{') < before.rfind('['):
-                continue  # Slice syntax, no space required
+            if char == ':':
+                open_squares += (line.count('[', counted, index) -
+                                 line.count(']', counted, index))
+                last_brace = max(last_brace, line.rfind('{', counted, index))
+                last_square = max(last_square,
+                                  line.rfind('[', counted, index))
+                counted = index
+                if open_squares > 0 and last_brace < last_square:
+                    continue  # Slice syntax, no space required
             if char == ',' and line[index + 1] == ')':
                 continue  # Allow tuple with only one element: (3,)
             yield index, "E231 missing whitespace after '%s'" % char
@@ -436,29 +464,28 @@ def continued_indentation(logical_line, tokens, indent_level, hang_closing,
     indent = [last_indent[1]]
     if verbose >= 3:
         print(">>> " + tokens[0][4].rstrip())
+    op = tokenize.OP
 
     for token_type, text, start, end, line in tokens:
-
-        newline = row < start[0] - first_row
-        if newline:
-            row = start[0] - first_row
-            newline = not last_token_multiline and token_type not in NEWLINE
-
-        if newline:
+        col = start[1]
+        token_row = start[0] - first_row
+        if (token_row > row and not last_token_multiline and
+                token_type not in NEWLINE):
             # this is the beginning of a continuation line.
+            row = token_row
             last_indent = start
             if verbose >= 3:
                 print("... " + line.rstrip())
 
             # record the initial indent.
-            rel_indent[row] = expand_indent(line) - indent_level
+            rel_indent[row] = row_indent = expand_indent(line) - indent_level
 
             # identify closing bracket
-            close_bracket = (token_type == tokenize.OP and text in ']})')
+            close_bracket = (token_type == op and text in ']})')
 
             # is the indent relative to an opening bracket line?
             for open_row in reversed(open_rows[depth]):
-                hang = rel_indent[row] - rel_indent[open_row]
+                hang = row_indent - rel_indent[open_row]
                 hanging_indent = hang in valid_hangs
                 if hanging_indent:
                     break
@@ -466,23 +493,24 @@ def continued_indentation(logical_line, tokens, indent_level, hang_closing,
                 hanging_indent = (hang == hangs[depth])
             # is there any chance of visual indent?
             visual_indent = (not close_bracket and hang > 0 and
-                             indent_chances.get(start[1]))
+                             indent_chances.get(col))
+            depth_indent = indent[depth]
 
-            if close_bracket and indent[depth]:
+            if close_bracket and depth_indent:
                 # closing bracket for visual indent
-                if start[1] != indent[depth]:
+                if col != depth_indent:
                     yield (start, "E124 closing bracket does not match "
                            "visual indentation")
             elif close_bracket and not hang:
                 # closing bracket matches indentation of opening bracket's line
                 if hang_closing:
                     yield start, "E133 closing bracket is missing indentation"
-            elif indent[depth] and start[1] < indent[depth]:
+            elif depth_indent and col < depth_indent:
                 if visual_indent is not True:
                     # visual indent is broken
                     yield (start, "E128 continuation line "
                            "under-indented for visual indent")
-            elif hanging_indent or (indent_next and rel_indent[row] == 8):
+            elif hanging_indent or (indent_next and row_indent == 8):
                 # hanging indent is verified
                 if close_bracket and not hang_closing:
                     yield (start, "E123 closing bracket does not match "
@@ -490,7 +518,7 @@ def continued_indentation(logical_line, tokens, indent_level, hang_closing,
                 hangs[depth] = hang
             elif visual_indent is True:
                 # visual indent is verified
-                indent[depth] = start[1]
+                indent[depth] = col
             elif visual_indent in (text, str):
                 # ignore token lined up with matching one from a previous line
                 pass
@@ -498,7 +526,7 @@ def continued_indentation(logical_line, tokens, indent_level, hang_closing,
                 # indent is broken
                 if hang <= 0:
                     error = "E122", "missing indentation or outdented"
-                elif indent[depth]:
+                elif depth_indent:
                     error = "E127", "over-indented for visual indent"
                 elif not close_bracket and hangs[depth]:
                     error = "E131", "unaligned for hanging indent"
@@ -509,19 +537,20 @@ def continued_indentation(logical_line, tokens, indent_level, hang_closing,
                     else:
                         error = "E121", "under-indented for hanging indent"
                 yield start, "%s continuation line %s" % error
+        elif token_row > row:
+            row = token_row
 
         # look for visual indenting
-        if (parens[row] and
-                token_type not in (tokenize.NL, tokenize.COMMENT) and
-                not indent[depth]):
-            indent[depth] = start[1]
-            indent_chances[start[1]] = True
+        if (parens[row] and not indent[depth] and
+                token_type not in VISUAL_SKIP_TOKENS):
+            indent[depth] = col
+            indent_chances[col] = True
             if verbose >= 4:
-                print("bracket depth %s indent to %s" % (depth, start[1]))
+                print("bracket depth %s indent to %s" % (depth, col))
         # deal with implicit string concatenation
-        elif (token_type in (tokenize.STRING, tokenize.COMMENT) or
+        elif (token_type in CONCATENATED_TOKENS or
               text in ('u', 'ur', 'b', 'br')):
-            indent_chances[start[1]] = str
+            indent_chances[col] = str
         # special case for the "if" statement because len("if (") == 4
         elif not indent_chances and not row and not depth and text == 'if':
             indent_chances[end[1] + 1] = True
@@ -529,7 +558,7 @@ def continued_indentation(logical_line, tokens, indent_level, hang_closing,
             open_rows[depth].append(row)
 
         # keep track of bracket depth
-        if token_type == tokenize.OP:
+        if token_type == op:
             if text in '([{':
                 depth += 1
                 indent.append(0)
@@ -540,7 +569,7 @@ def continued_indentation(logical_line, tokens, indent_level, hang_closing,
                 parens[row] += 1
                 if verbose >= 4:
                     print("bracket depth %s seen, col %s, visual min = %s" %
-                          (depth, start[1], indent[depth]))
+                          (depth, col, indent[depth]))
             elif text in ')]}' and depth > 0:
                 # parent indents should not be more than this one
                 prev_indent = indent.pop() or last_indent[1]
@@ -548,9 +577,9 @@ def continued_indentation(logical_line, tokens, indent_level, hang_closing,
                 for d in range(depth):
                     if indent[d] > prev_indent:
                         indent[d] = 0
-                for ind in list(indent_chances):
-                    if ind >= prev_indent:
-                        del indent_chances[ind]
+                for ind in [ind for ind in indent_chances
+                            if ind >= prev_indent]:
+                    del indent_chances[ind]
                 del open_rows[depth + 1:]
                 depth -= 1
                 if depth:
@@ -559,10 +588,9 @@ def continued_indentation(logical_line, tokens, indent_level, hang_closing,
                     if parens[idx]:
                         parens[idx] -= 1
                         break
-            assert len(indent) == depth + 1
-            if start[1] not in indent_chances:
+            if col not in indent_chances:
                 # allow to line up tokens
-                indent_chances[start[1]] = text
+                indent_chances[col] = text
 
         last_token_multiline = (start[0] != end[0])
         if last_token_multiline:
@@ -932,11 +960,20 @@ def compound_statements(logical_line):
     line = logical_line
     last_char = len(line) - 1
     found = line.find(':')
+    # The brackets open before found, counted up to the previous colon
+    counted = braces = squares = parens = 0
     while -1 < found < last_char:
-        before = line[:found]
-        if ((before.count('{') <= before.count('}') and   # {'a': 1} (dict)
-             before.count('[') <= before.count(']') and   # [1:2] (slice)
-             before.count('(') <= before.count(')'))):    # (annotation)
+        braces += line.count('{', counted, found) - line.count('}', counted,
+                                                               found)
+        squares += line.count('[', counted, found) - line.count(']', counted,
+                                                                found)
+        parens += line.count('(', counted, found) - line.count(')', counted,
+                                                               found)
+        counted = found
+        if ((braces <= 0 and       # {'a': 1} (dict)
+             squares <= 0 and      # [1:2] (slice)
+             parens <= 0)):        # (annotation)
+            before = line[:found]
             lambda_kw = LAMBDA_REGEX.search(before)
             if lambda_kw:
                 before = line[:lambda_kw.start()].rstrip()
@@ -1175,10 +1212,21 @@ if '' == ''.encode():
             return f.readlines()
     isidentifier = re.compile(r'[a-zA-Z_]\w*$').match
     stdin_get_value = sys.stdin.read
+
+    def decode_lines(data):
+        """Split the source code read from elsewhere than a file."""
+        return data.replace('\r\n', '\n').replace('\r', '\n').splitlines(True)
 else:
     # Python 3
     def readlines(filename):
-        """Read the source code."""
+        """Read the source code.
+
+        Files larger than MMAP_MIN_SIZE are mapped in memory when possible.
+        """
+        if os.path.getsize(filename) >= MMAP_MIN_SIZE:
+            lines = MappedLines.open(filename)
+            if lines is not None:
+                return lines
         try:
             with open(filename, 'rb') as f:
                 (coding, lines) = tokenize.detect_encoding(f.readline)
@@ -1190,9 +1238,97 @@ else:
                 return f.readlines()
     isidentifier = str.isidentifier
 
+    def decode_lines(data):
+        """Decode the source code read from elsewhere than a file."""
+        from io import StringIO
+        try:
+            coding = tokenize.detect_encoding(iter(
+                data.splitlines(True)).__next__)[0]
+            text = data.decode(coding)
+        except (LookupError, SyntaxError, UnicodeError):
+            text = data.decode('latin-1')
+        return StringIO(text, newline=None).readlines()
+
     def stdin_get_value():
         return TextIOWrapper(sys.stdin.buffer, errors='ignore').read()
-noqa = re.compile(r'# no(?:qa|pep8)\b', re.I).search
+NOQA_REGEX = re.compile(r'# no(?:qa|pep8)\b', re.I)
+noqa = NOQA_REGEX.search
+
+
+class MappedLines(object):
+    """Sequence of the lines of a file mapped in memory.
+
+    Only the offsets of the lines are kept; each line is decoded when it
+    is accessed.
+    """
+
+    cache_size = 64
+
+    def __init__(self, data, encoding, start=0):
+        self._data = data
+        self.encoding = encoding
+        self._decoded = {}
+        self._changed = {}
+        offsets = array('q', [start])
+        find = data.find
+        end = find(b'\n', start)
+        while end >= 0:
+            offsets.append(end + 1)
+            end = find(b'\n', end + 1)
+        if offsets[-1] < len(data):
+            offsets.append(len(data))
+        self._offsets = offsets
+
+    @classmethod
+    def open(cls, filename):
+        """Map the file, or return None if readlines() should be used."""
+        import mmap
+        with open(filename, 'rb') as f:
+            data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        # Leave the newline translation of the text files to readlines()
+        if data.find(b'\r') >= 0:
+            return None
+        start = 0
+        try:
+            encoding = tokenize.detect_encoding(
+                iter(data[:1024].splitlines(True)).__next__)[0]
+            if encoding == 'utf-8-sig':
+                (encoding, start) = ('utf-8', len(codecs.BOM_UTF8))
+            # Fail now rather than while checking
+            decoder = codecs.getincrementaldecoder(encoding)()
+            for offset in range(start, len(data), mmap.PAGESIZE * 256):
+                decoder.decode(data[offset:offset + mmap.PAGESIZE * 256])
+            decoder.decode(b'', True)
+        except (LookupError, SyntaxError, UnicodeError):
+            return None
+        return cls(data, encoding, start)
+
+    def __len__(self):
+        return len(self._offsets) - 1
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self[i] for i in range(*index.indices(len(self)))]
+        if index < 0:
+            index += len(self)
+        line = self._decoded.get(index)
+        if line is None:
+            if not 0 <= index < len(self):
+                raise IndexError('line index out of range')
+            if len(self._decoded) >= self.cache_size:
+                self._decoded = dict(self._changed)
+            line = self._data[self._offsets[index]:self._offsets[index + 1]]
+            line = self._decoded[index] = line.decode(self.encoding)
+        return line
+
+    def __setitem__(self, index, line):
+        if index < 0:
+            index += len(self)
+        self._decoded[index] = self._changed[index] = line
+
+    def __iter__(self):
+        for index in range(len(self)):
+            yield self[index]
 
 
 def expand_indent(line):
@@ -1285,6 +1421,19 @@ def normalize_paths(value, parent=os.curdir):
     return paths
 
 
+_pattern_regexes = {}
+
+
+def compile_patterns(patterns):
+    """Return the match method of one regex for the fnmatch patterns."""
+    key = tuple(patterns)
+    if key not in _pattern_regexes:
+        regex = '|'.join('(?:%s)' % translate(os.path.normcase(pattern))
+                         for pattern in patterns)
+        _pattern_regexes[key] = re.compile(regex).match
+    return _pattern_regexes[key]
+
+
 def filename_match(filename, patterns, default=True):
     """Check if patterns contains a pattern that matches filename.
 
@@ -1292,7 +1441,159 @@ def filename_match(filename, patterns, default=True):
     """
     if not patterns:
         return default
-    return any(fnmatch(filename, pattern) for pattern in patterns)
+    return compile_patterns(patterns)(os.path.normcase(filename)) is not None
+
+
+def _scandir(path):
+    """Return the (name, is_dir, is_symlink) entries of a directory.
+
+    Return None if the directory cannot be read, like os.walk().
+    """
+    entries = []
+    try:
+        if hasattr(os, 'scandir'):
+            for entry in os.scandir(path):
+                try:
+                    is_dir = entry.is_dir()
+                except OSError:
+                    is_dir = False
+                entries.append((entry.name, is_dir,
+                                is_dir and entry.is_symlink()))
+        else:
+            for name in os.listdir(path):
+                fullname = os.path.join(path, name)
+                is_dir = os.path.isdir(fullname)
+                entries.append((name, is_dir,
+                                is_dir and os.path.islink(fullname)))
+    except OSError:
+        return None
+    return entries
+
+
+def git_files(dirname):
+    """Return the files and directories below dirname not ignored by git.
+
+    Return None if dirname is not in a git work tree.
+    """
+    import subprocess
+    try:
+        with open(os.devnull, 'w') as devnull:
+            output = subprocess.check_output(
+                ['git', 'ls-files', '--cached', '--others',
+                 '--exclude-standard', '-z'], cwd=dirname, stderr=devnull)
+    except (OSError, subprocess.CalledProcessError):
+        return None
+    base = os.path.abspath(dirname)
+    files = set()
+    dirs = set([base])
+    for name in output.decode(sys.getfilesystemencoding()).split('\0'):
+        if name:
+            path = os.path.join(base, os.path.normpath(name))
+            files.add(path)
+            parent = os.path.dirname(path)
+            while parent not in dirs:
+                dirs.add(parent)
+                parent = os.path.dirname(parent)
+    return files, dirs
+
+
+def git_diff_lines(rev, paths=(), patterns=None):
+    """Return the changed rows of the files between two git revisions.
+
+    The revisions are given as 'A..B', or 'A...B' from the merge base,
+    and B defaults to HEAD.  Return two dictionaries keyed by the paths
+    relative to the current directory: the changed rows, and the names
+    of the git objects with the changed files.
+    """
+    import subprocess
+    if '..' not in rev:
+        rev += '..'
+    target = rev.split('..')[-1].lstrip('.') or 'HEAD'
+    prefix = subprocess.check_output(['git', 'rev-parse', '--show-prefix'])
+    diff = subprocess.check_output(
+        ['git', '-c', 'core.quotePath=false', 'diff', '--no-color',
+         '--no-ext-diff', '--unified=0', '--diff-filter=d',
+         '--src-prefix=a/', '--dst-prefix=b/', rev, '--'] + list(paths))
+    # Latin-1 keeps the bytes of the paths for git
+    prefix = prefix.decode('latin-1').strip()
+    selected_lines = {}
+    objects = {}
+    encoding = sys.getfilesystemencoding()
+    for path, rows in parse_udiff(diff.decode('latin-1'), patterns,
+                                  '').items():
+        filename = path.encode('latin-1').decode(encoding)
+        if prefix:
+            filename = os.path.relpath(filename, prefix)
+        selected_lines[filename] = rows
+        objects[filename] = '%s:%s' % (target, path)
+    return selected_lines, objects
+
+
+def git_cat_files(objects):
+    """Read the content of git objects with one `git cat-file` process.
+
+    The names of the objects, like 'HEAD:setup.py', are written by a
+    thread while the contents are read.  Yield the content of each
+    object, or None if it is missing.
+    """
+    import subprocess
+    import threading
+    objects = list(objects)
+    process = subprocess.Popen(['git', 'cat-file', '--batch'],
+                               stdin=subprocess.PIPE, stdout=subprocess.PIPE)
+
+    def write_names():
+        try:
+            for name in objects:
+                process.stdin.write(name.encode('latin-1') + b'\n')
+            process.stdin.close()
+        except (IOError, OSError):
+            pass    # git stopped, or the reader did
+
+    writer = threading.Thread(target=write_names)
+    writer.daemon = True
+    writer.start()
+    try:
+        for name in objects:
+            header = process.stdout.readline().split()
+            if not header:
+                raise IOError('git cat-file stopped at %s' % name)
+            if len(header) != 3:
+                yield None      # Missing or ambiguous
+                continue
+            data = process.stdout.read(int(header[2]))
+            process.stdout.read(1)
+            yield data
+    finally:
+        process.stdout.close()
+        process.wait()
+        writer.join()
+
+
+def is_archive(path):
+    """Check if the path is a zip, wheel or tar file to read members from."""
+    return path.lower().endswith(ARCHIVE_SUFFIXES) and os.path.isfile(path)
+
+
+def read_archive(path, match=None):
+    """Read the regular files of a zip or tar archive, in their order.
+
+    Yield (name, data) for each member whose name matches, without
+    extracting anything.  A tar archive is read as a stream.
+    """
+    if path.lower().endswith(('.zip', '.whl')):
+        import zipfile
+        with zipfile.ZipFile(path) as archive:
+            for info in archive.infolist():
+                name = info.filename
+                if not name.endswith('/') and (match is None or match(name)):
+                    yield name, archive.read(info)
+    else:
+        import tarfile
+        with tarfile.open(path, 'r|*') as archive:
+            for info in archive:
+                if info.isfile() and (match is None or match(info.name)):
+                    yield info.name, archive.extractfile(info).read()
 
 
 def _is_eol_token(token):
@@ -1308,37 +1609,445 @@ if COMMENT_WITH_NL:
 
 
 _checks = {'physical_line': {}, 'logical_line': {}, 'tree': {}}
+_check_triggers = {}
+
+# The built-in checks, with the names of their arguments and their codes,
+# as found by init_checks_registry(module).  Registering them from this
+# table is faster than inspecting the module at import time.
+BUILTIN_CHECKS = [
+    ('tabs_or_spaces', 'physical_line indent_char', 'E101'),
+    ('tabs_obsolete', 'physical_line', 'W191'),
+    ('trailing_whitespace', 'physical_line', 'W291 W293'),
+    ('trailing_blank_lines',
+     'physical_line lines line_number total_lines',
+     'W391 W292'),
+    ('maximum_line_length', 'physical_line max_line_length multiline', 'E501'),
+    ('blank_lines',
+     'logical_line blank_lines indent_level line_number blank_before '
+     'previous_logical previous_indent_level',
+     'E301 E302 E303 E304'),
+    ('extraneous_whitespace', 'logical_line', 'E201 E202 E203'),
+    ('whitespace_around_keywords', 'logical_line', 'E271 E272 E273 E274'),
+    ('missing_whitespace', 'logical_line', 'E231'),
+    ('indentation',
+     'logical_line previous_logical indent_char indent_level '
+     'previous_indent_level',
+     'E111 E114 E112 E115 E113 E116'),
+    ('extended_blank_lines',
+     'logical_line blank_lines blank_before indent_level previous_logical',
+     ''),
+    ('continued_indentation',
+     'logical_line tokens indent_level hang_closing indent_char noqa verbose',
+     'E123 E121 E122 E124 E125 E126 E127 E128 E129 E131'),
+    ('whitespace_before_parameters', 'logical_line tokens', 'E211'),
+    ('whitespace_around_operator', 'logical_line', 'E221 E222 E223 E224'),
+    ('missing_whitespace_around_operator',
+     'logical_line tokens',
+     'E225 E226 E227 E228'),
+    ('whitespace_around_comma', 'logical_line', 'E241 E242'),
+    ('whitespace_around_named_parameter_equals',
+     'logical_line tokens',
+     'E251'),
+    ('whitespace_before_comment',
+     'logical_line tokens',
+     'E261 E262 E265 E266'),
+    ('imports_on_separate_lines', 'logical_line', 'E401'),
+    ('module_imports_on_top_of_file',
+     'logical_line indent_level checker_state noqa',
+     'E402'),
+    ('compound_statements', 'logical_line', 'E701 E702 E703 E704 E731'),
+    ('explicit_line_join', 'logical_line tokens', 'E502'),
+    ('break_around_binary_operator', 'logical_line tokens', 'W503'),
+    ('comparison_to_singleton', 'logical_line noqa', 'E711 E712'),
+    ('comparison_negative', 'logical_line', 'E713 E714'),
+    ('comparison_type', 'logical_line noqa', 'E721'),
+    ('python_3000_has_key', 'logical_line noqa', 'W601'),
+    ('python_3000_raise_comma', 'logical_line', 'W602'),
+    ('python_3000_not_equal', 'logical_line', 'W603'),
+    ('python_3000_backticks', 'logical_line', 'W604'),
+]
+
+
+# A logical check with triggers runs only on the lines which contain one
+# of them; the other checks run on every logical line.
+BUILTIN_TRIGGERS = {
+    'comparison_negative': ['not'],
+    'comparison_to_singleton': ['None', 'True', 'False'],
+    'comparison_type': ['type'],
+    'compound_statements': [':', ';'],
+    # Only the logical lines of several rows have a newline before the end
+    'continued_indentation': ['\n'],
+    'explicit_line_join': ['\\'],
+    'extraneous_whitespace': list('([{}]),;:'),
+    'imports_on_separate_lines': ['import'],
+    'missing_whitespace': [',', ';', ':'],
+    'missing_whitespace_around_operator': list('=!<>+-*/%^&|'),
+    'python_3000_backticks': ['`'],
+    'python_3000_has_key': ['.has_key('],
+    'python_3000_not_equal': ['<>'],
+    'python_3000_raise_comma': ['raise'],
+    'whitespace_around_comma': ['  ', '\t'],
+    'whitespace_around_keywords': ['  ', '\t'],
+    'whitespace_around_named_parameter_equals': ['='],
+    'whitespace_around_operator': ['  ', '\t'],
+    'whitespace_before_comment': ['#'],
+    'whitespace_before_parameters': ['(', '['],
+}
 
 
-def register_check(check, codes=None):
-    """Register a new check object."""
-    def _add_check(check, kind, codes, args):
-        if check in _checks[kind]:
-            _checks[kind][check][0].extend(codes or [])
-        else:
-            _checks[kind][check] = (codes or [''], args)
+def _add_check(check, kind, codes, args):
+    if check in _checks[kind]:
+        _checks[kind][check][0].extend(codes or [])
+    else:
+        _checks[kind][check] = (codes or [''], args)
+
+
+def register_check(check, codes=None, triggers=None):
+    """Register a new check object.
+
+    The triggers of a logical check are substrings; the check runs only
+    if one of them is found in the physical lines of the logical line.
+
+    A tree check class which declares `node_types`, the names of the AST
+    node types it handles, does not walk the tree in run(): its method
+    visit(node) is called for each of these nodes, in a walk of the tree
+    shared with the other such checks, and returns the errors found.
+    """
+    import inspect
     if inspect.isfunction(check):
-        args = inspect.signature(check)
-        if args and args in ('physical_line', 'logical_line'):
+        args = list(inspect.signature(check).parameters)
+        if args and args[0] in ('physical_line', 'logical_line'):
             if codes is None:
                 codes = ERRORCODE_REGEX.findall(check.__doc__ or '')
             _add_check(check, args[0], codes, args)
+            if triggers is not None:
+                _check_triggers[check] = list(triggers)
     elif inspect.isclass(check):
-        if iinspect.signature(check.__init__) == ['self', 'tree']:
+        init_args = list(inspect.signature(check.__init__).parameters)
+        if init_args[:2] == ['self', 'tree']:
             _add_check(check, 'tree', codes, None)
 
 
-def init_checks_registry():
-    """Register all globally visible functions.
+def init_checks_registry(module=None):
+    """Register the checks of a module.
 
-    The first argument name is either 'physical_line' or 'logical_line'.
+    Register all globally visible functions where the first argument name
+    is either 'physical_line' or 'logical_line'.  Without a module, the
+    built-in checks are registered from BUILTIN_CHECKS.
     """
-    mod = inspect.getmodule(register_check)
-    for (name, function) in inspect.getmembers(mod, inspect.isfunction):
-        register_check(function)
+    if module is None:
+        namespace = globals()
+        for (name, args, codes) in BUILTIN_CHECKS:
+            args = args.split()
+            check = namespace[name]
+            _add_check(check, args[0], codes.split(), args)
+            if name in BUILTIN_TRIGGERS:
+                _check_triggers[check] = list(BUILTIN_TRIGGERS[name])
+        return
+    import inspect
+    for (name, function) in inspect.getmembers(module, inspect.isfunction):
+        register_check(function, triggers=BUILTIN_TRIGGERS.get(name))
 init_checks_registry()
 
 
+_compiled_checks = {}
+
+
+def compile_checks(checks):
+    """Compile a list of checks into a check plan.
+
+    Each check is wrapped in a function which takes the checker and reads
+    the arguments of the check from its attributes, without reflection.
+    Return a list of (name, check, caller) tuples.
+    """
+    plan = []
+    for name, check, argument_names in checks:
+        key = (name, check, tuple(argument_names))
+        caller = _compiled_checks.get(key)
+        if caller is None:
+            arguments = [('self._checker_states.setdefault(name, {})'
+                          if arg == 'checker_state' else 'self.' + arg)
+                         for arg in argument_names]
+            namespace = {'check': check, 'name': name}
+            exec('def caller(self):\n    return check(%s)\n' %
+                 ', '.join(arguments), namespace)
+            caller = _compiled_checks[key] = namespace['caller']
+        plan.append((name, check, caller))
+    return plan
+
+
+class VisitorPlan(object):
+    """Walk the AST once for all the tree checks with `node_types`."""
+
+    def __init__(self, checks):
+        self.visitors = [(name, cls) for name, cls, __ in checks
+                         if getattr(cls, 'node_types', None)]
+        self._handlers = {}
+        self._types = {}
+        if self.visitors:
+            import ast
+            self.walk = ast.walk
+            for index, (name, cls) in enumerate(self.visitors):
+                for node_type in cls.node_types:
+                    if not isinstance(node_type, type):
+                        node_type = getattr(ast, node_type, None)
+                    if node_type is not None:
+                        self._types.setdefault(node_type, []).append(index)
+
+    def handlers(self, node_class):
+        """Return the indexes of the checks which visit a node class."""
+        indexes = self._handlers.get(node_class)
+        if indexes is None:
+            # A check may handle a base class, like ast.stmt
+            indexes = self._handlers[node_class] = sorted(set(
+                index for base in node_class.__mro__
+                for index in self._types.get(base, ())))
+        return indexes
+
+    def run(self, tree, filename, profiler=None):
+        """Walk the tree, return the errors of each check by name."""
+        timer = profiler and profiler.timer
+        elapsed = [0.0] * len(self.visitors)
+        visits = []
+        for index, (name, cls) in enumerate(self.visitors):
+            start = timer and timer()
+            visits.append(cls(tree, filename).visit)
+            if timer:
+                elapsed[index] += timer() - start
+        results = [[] for visit in visits]
+        handlers = self._handlers
+        for node in self.walk(tree):
+            indexes = handlers.get(node.__class__)
+            if indexes is None:
+                indexes = self.handlers(node.__class__)
+            for index in indexes:
+                start = timer and timer()
+                found = visits[index](node)
+                if found:
+                    results[index].extend(found)
+                if timer:
+                    elapsed[index] += timer() - start
+        if profiler:
+            for index, (name, cls) in enumerate(self.visitors):
+                profiler.record(('tree', name), elapsed[index])
+        return dict((name, results[index])
+                    for index, (name, cls) in enumerate(self.visitors))
+
+
+class CheckProfiler(object):
+    """Measure the calls and the time spent in each check."""
+
+    timer = getattr(time, 'perf_counter', time.time)
+
+    def __init__(self):
+        # For each (kind, name): [calls, total time, max time]
+        self.stats = {}
+
+    def record(self, key, elapsed):
+        """Record a call of a check."""
+        stats = self.stats.get(key)
+        if stats is None:
+            self.stats[key] = [1, elapsed, elapsed]
+        else:
+            stats[0] += 1
+            stats[1] += elapsed
+            if elapsed > stats[2]:
+                stats[2] = elapsed
+
+    def wrap(self, plan, kind):
+        """Return a copy of a check plan which times every call."""
+        timer = self.timer
+        record = self.record
+
+        def timed(name, caller):
+            key = (kind, name)
+
+            def timed_caller(checker):
+                start = timer()
+                result = caller(checker)
+                if result is not None and kind == 'logical_line':
+                    result = list(result)   # Time the generator too
+                record(key, timer() - start)
+                return result
+            return timed_caller
+        return [(name, check, timed(name, caller))
+                for name, check, caller in plan]
+
+    def pop_stats(self):
+        """Return the stats and reset them."""
+        (stats, self.stats) = (self.stats, {})
+        return stats
+
+    def merge(self, stats):
+        """Add the stats of another profiler."""
+        for key, (calls, total, maximum) in stats.items():
+            mine = self.stats.setdefault(key, [0, 0.0, 0.0])
+            mine[0] += calls
+            mine[1] += total
+            mine[2] = max(mine[2], maximum)
+
+    def get_table(self):
+        """Return the rows of the stats, the slowest checks first."""
+        return sorted(((total, maximum, calls, kind, name) for
+                       (kind, name), (calls, total, maximum) in
+                       self.stats.items()), reverse=True)
+
+    def print_table(self):
+        """Print the time spent in each check."""
+        print('%10s %10s %10s  %s' % ('calls', 'total ms', 'max ms', 'check'))
+        for total, maximum, calls, kind, name in self.get_table():
+            print('%10d %10.1f %10.3f  %s (%s)' %
+                  (calls, total * 1000, maximum * 1000, name, kind))
+
+    def dump(self, filename):
+        """Write the stats to a JSON file."""
+        with open(filename, 'w') as f:
+            json.dump([{'kind': kind, 'name': name, 'calls': calls,
+                        'total': total, 'max': maximum}
+                       for total, maximum, calls, kind, name in
+                       self.get_table()], f, indent=2)
+
+
+class TriggerPlan(object):
+    """Select the checks of a plan from the triggers found in a text."""
+
+    def __init__(self, plan):
+        self.plan = plan
+        checks = {}
+        for name, check, caller in plan:
+            for trigger in _check_triggers.get(check, ()):
+                checks.setdefault(trigger, set()).add(check)
+        self._triggered = set().union(*checks.values())
+        # A trigger also enables the checks of the triggers it contains
+        self._enabled = dict(
+            (trigger, set().union(*[checks[other] for other in checks
+                                    if other in trigger]))
+            for trigger in checks)
+        # Match at every position, the longest trigger first
+        words = sorted((t for t in checks if len(t) > 1), key=len)[::-1]
+        chars = ''.join(re.escape(t) for t in checks if len(t) == 1)
+        pattern = [re.escape(t) for t in words] + ['[%s]' % chars] * (
+            len(chars) > 0)
+        self._findall = checks and re.compile(
+            '(?=(%s))' % '|'.join(pattern)).findall
+        self._plans = {}
+
+    def select(self, text):
+        """Return the plan for a text."""
+        if not self._findall:
+            return self.plan
+        found = frozenset(self._findall(text))
+        plan = self._plans.get(found)
+        if plan is None:
+            enabled = set().union(*[self._enabled[t] for t in found])
+            plan = self._plans[found] = [
+                entry for entry in self.plan
+                if entry[1] in enabled or entry[1] not in self._triggered]
+        return plan
+
+
+# The arguments of the logical checks whose results LogicalMemo remembers:
+# the others depend on the lines before the logical line
+MEMO_ARGUMENTS = frozenset([
+    'logical_line', 'tokens', 'noqa', 'indent_level', 'indent_char',
+    'hang_closing', 'verbose'])
+
+
+class LogicalMemo(object):
+    """Remember the results of the logical checks on recent logical lines.
+
+    Only the checks whose arguments are in MEMO_ARGUMENTS are remembered.
+    The key is the text of the physical lines, which gives the tokens but
+    the leading INDENT or DEDENT tokens, told apart by their number and
+    type, and the indent character of the file.  The value is a tuple of
+    the plan selected for the line, then the (index in the plan, results)
+    of the checks which found errors, with rows relative to the first row.
+    The least recently used line is forgotten first.
+    """
+
+    def __init__(self, checks, size):
+        self.checks = frozenset(check for (name, check, args) in checks
+                                if MEMO_ARGUMENTS.issuperset(args))
+        self.size = size
+        self._results = OrderedDict()
+
+    def get(self, key):
+        """Return the results recorded for a key, or None."""
+        results = self._results.pop(key, None)
+        if results is not None:
+            self._results[key] = results
+        return results
+
+    def put(self, key, results):
+        """Record the results for a key."""
+        self._results[key] = results
+        if len(self._results) > self.size:
+            self._results.popitem(last=False)
+
+    @staticmethod
+    def record(results, first_row):
+        """Return the results of a check with rows relative to first_row."""
+        return tuple(((offset[0] - first_row, offset[1]), text)
+                     if isinstance(offset, tuple) else (offset, text)
+                     for offset, text in results)
+
+    @staticmethod
+    def replay(results, first_row):
+        """Return recorded results with their rows counted from first_row."""
+        return [((offset[0] + first_row, offset[1]), text)
+                if isinstance(offset, tuple) else (offset, text)
+                for offset, text in results]
+
+
+# The physical checks which can only report on the rows found by
+# Checker.init_physical_rows()
+BATCH_PHYSICAL_CHECKS = frozenset([
+    tabs_or_spaces, tabs_obsolete, trailing_whitespace, trailing_blank_lines,
+    maximum_line_length])
+
+_long_line_regexes = {}
+
+
+def _match_rows(regex, text):
+    """Return the rows where the regex matches the text."""
+    rows = []
+    (row, pos) = (1, 0)
+    for match in regex.finditer(text):
+        start = match.start()
+        row += text.count('\n', pos, start)
+        pos = start
+        rows.append(row)
+    return rows
+
+
+class OffsetMapping(object):
+    """Map the offsets in a logical line to their positions in the file.
+
+    The offset of the end of each token in the logical line is stored in
+    an array, beside the position of this end, to find the token of an
+    offset with bisect.  The first entry maps offset 0 to the start of
+    the first token.
+    """
+
+    def __init__(self, start):
+        self.offsets = array('l', [0])
+        self.positions = [start]
+
+    def __len__(self):
+        return len(self.offsets)
+
+    def __getitem__(self, index):
+        return (self.offsets[index], self.positions[index])
+
+    def position(self, offset):
+        """Return the (row, col) of an offset in the logical line."""
+        index = bisect.bisect_left(self.offsets, offset)
+        if index == len(self.offsets):
+            index -= 1
+        (row, col) = self.positions[index]
+        return (row, col + offset - self.offsets[index])
+
+
 class Checker(object):
     """Load a Python source file, tokenize it, check coding style."""
 
@@ -1349,9 +2058,33 @@ class Checker(object):
         else:
             assert not kwargs
         self._io_error = None
-        self._physical_checks = options.physical_checks
-        self._logical_checks = options.logical_checks
+        self._noqa_rows = None
+        self._physical_checks = options.physical_plan
+        self._logical_checks = options.logical_plan
+        self._logical_triggers = options.logical_triggers
+        self._logical_memo = options.logical_memo
         self._ast_checks = options.ast_checks
+        self._visitor_plan = options.visitor_plan
+        self._profiler = options.profiler
+        # Only these checks run outside the selected rows, for their state
+        self._physical_state_checks = [
+            entry for entry, (__, __, args) in
+            zip(self._physical_checks, options.physical_checks)
+            if 'checker_state' in args]
+        self._logical_state_checks = [
+            entry for entry, (__, __, args) in
+            zip(self._logical_checks, options.logical_checks)
+            if 'checker_state' in args]
+        # Outside the rows found by init_physical_rows(), only these run
+        self._physical_other_checks = [
+            entry for entry in self._physical_checks
+            if entry[1] not in BATCH_PHYSICAL_CHECKS]
+        self._batch_physical = (len(self._physical_other_checks) <
+                                len(self._physical_checks))
+        # Keep the parse product while checking lines only if they use it
+        self._keep_parse = any(
+            arg in ('source', 'tree') for __, __, args in
+            options.physical_checks + options.logical_checks for arg in args)
         self.max_line_length = options.max_line_length
         self.multiline = False  # in a multiline string?
         self.hang_closing = options.hang_closing
@@ -1374,6 +2107,10 @@ class Checker(object):
                 self.lines = []
         else:
             self.lines = lines
+        # With --diff, only these rows are reported
+        selected_lines = getattr(options, 'selected_lines', None)
+        self.selected_rows = (selected_lines.get(self.filename)
+                              if selected_lines else None)
         if self.lines:
             ord0 = ord(self.lines[0][0])
             if ord0 in (0xef, 0xfeff):  # Strip the UTF-8 BOM
@@ -1399,6 +2136,8 @@ class Checker(object):
 
     def readline(self):
         """Get the next line from the input buffer."""
+        if self.line_number + 1 == self._stop_row:
+            self.skip_to_next_region()
         if self.line_number >= self.total_lines:
             return ''
         line = self.lines[self.line_number]
@@ -1422,9 +2161,15 @@ class Checker(object):
     def check_physical(self, line):
         """Run all physical checks on a raw input line."""
         self.physical_line = line
-        for name, check, argument_names in self._physical_checks:
-            self.init_checker_state(name, argument_names)
-            result = self.run_check(check, argument_names)
+        checks = self._physical_checks
+        if self._skip_physical and self.line_number not in self.selected_rows:
+            checks = self._physical_state_checks
+        elif (self._physical_rows is not None and self.line_number > 0 and
+              self.line_number not in self._physical_rows and
+              line == self.lines[self.line_number - 1]):
+            checks = self._physical_other_checks
+        for name, check, caller in checks:
+            result = caller(self)
             if result is not None:
                 (offset, text) = result
                 self.report_error(self.line_number, offset, text, check)
@@ -1437,13 +2182,17 @@ class Checker(object):
         comments = []
         length = 0
         prev_row = prev_col = mapping = None
+        noqa_rows = self.noqa_rows
         for token_type, text, start, end, line in self.tokens:
             if token_type in SKIP_TOKENS:
                 continue
             if not mapping:
-                mapping = [(0, start)]
+                mapping = OffsetMapping(start)
+                (add_offset, add_position) = (mapping.offsets.append,
+                                              mapping.positions.append)
             if token_type == tokenize.COMMENT:
-                comments.append(text)
+                if noqa_rows[start[0]]:
+                    comments.append(text)
                 continue
             if token_type == tokenize.STRING:
                 text = mute_string(text)
@@ -1453,12 +2202,16 @@ class Checker(object):
                     prev_text = self.lines[prev_row - 1][prev_col - 1]
                     if prev_text == ',' or (prev_text not in '{[(' and
                                             text not in '}])'):
-                        text = ' ' + text
+                        logical.append(' ')
+                        length += 1
                 elif prev_col != start_col:  # different column
-                    text = line[prev_col:start_col] + text
+                    fill = line[prev_col:start_col]
+                    logical.append(fill)
+                    length += len(fill)
             logical.append(text)
             length += len(text)
-            mapping.append((length, end))
+            add_offset(length)
+            add_position(end)
             (prev_row, prev_col) = end
         self.logical_line = ''.join(logical)
         self.noqa = comments and noqa(''.join(comments))
@@ -1479,43 +2232,293 @@ class Checker(object):
             self.blank_before = self.blank_lines
         if self.verbose >= 2:
             print(self.logical_line[:80].rstrip())
-        for name, check, argument_names in self._logical_checks:
+        first_row = self.tokens[0][2][0]
+        last_row = self.tokens[-1][3][0]
+        if self._region_states and first_row >= self._region_states[0][0]:
+            # The state of the checks before the rows of the region
+            self._checker_states.update(self._region_states.pop(0)[1])
+        memo = self._logical_memo
+        key = recorded = None
+        if self.selected_rows is not None and self.selected_rows.isdisjoint(
+                range(first_row, last_row + 1)):
+            (checks, memo) = (self._logical_state_checks, None)
+        else:
+            if memo is not None:
+                key = (''.join(self.lines[first_row - 1:last_row]),
+                       len(self.tokens), self.tokens[0][0], self.indent_char)
+                recorded = memo.get(key)
+                counter = MEMO_KEYS[recorded is None]
+                self.report.counters[counter] = (
+                    self.report.counters.get(counter, 0) + 1)
+            if recorded is not None:
+                # The same lines select the same checks
+                (checks, recorded, key) = (recorded[0], dict(recorded[1:]),
+                                           None)
+            else:
+                # Scan from the first token: the indentation is no trigger,
+                # nor is the final newline.  The rows of the skipped tokens
+                # before it are scanned too, as continued_indentation()
+                # counts the rows from tokens[0].
+                text = start_line[start_col:]
+                if first_row < start_row:
+                    text = ''.join(self.lines[first_row - 1:start_row - 1] +
+                                   [text])
+                if last_row > start_row:
+                    text += ''.join(self.lines[start_row:last_row])
+                if text[-1:] == '\n':
+                    text = text[:-1]
+                checks = self._logical_triggers.select(text)
+                recorded = [checks]
+        for index, (name, check, caller) in enumerate(checks):
             if self.verbose >= 4:
                 print('   ' + name)
-            self.init_checker_state(name, argument_names)
-            for offset, text in self.run_check(check, argument_names) or ():
+            if memo is None or check not in memo.checks:
+                results = caller(self) or ()
+            elif key is None:
+                results = recorded.get(index)
+                if not results:
+                    continue
+                results = memo.replay(results, first_row)
+            else:
+                results = list(caller(self) or ())
+                if results:
+                    recorded.append((index, memo.record(results, first_row)))
+            for offset, text in results:
                 if not isinstance(offset, tuple):
-                    for token_offset, pos in mapping:
-                        if offset <= token_offset:
-                            break
-                    offset = (pos[0], pos[1] + offset - token_offset)
+                    offset = mapping.position(offset)
                 self.report_error(offset[0], offset[1], text, check)
+        if key is not None:
+            memo.put(key, tuple(recorded))
         if self.logical_line:
             self.previous_indent_level = self.indent_level
             self.previous_logical = self.logical_line
         self.blank_lines = 0
         self.tokens = []
 
+    def init_parse(self):
+        """Reset the parse stage: the source and the tree are lazy."""
+        self._source = self._tree = None
+        self._parsed = False
+
+    @property
+    def source(self):
+        """The source code of the file, joined once."""
+        if self._source is None:
+            self._source = ''.join(self.lines)
+        return self._source
+
+    @property
+    def noqa_rows(self):
+        """One byte per row, set if the physical line matches noqa().
+
+        The rows are found with one search of the source when the first
+        check stage needs them: the AST checks, the multiline strings and
+        the comments of the logical lines.  check_all() builds them before
+        the source is released; a source joined later is not kept.
+        """
+        if self._noqa_rows is None:
+            lines = self.lines
+            rows = self._noqa_rows = bytearray(len(lines) + 1)
+            if lines and not isinstance(lines, MappedLines):
+                source = self._source
+                if source is None:
+                    source = ''.join(lines)
+                newlines = len(lines) - (not lines[-1].endswith('\n'))
+                found = (_match_rows(NOQA_REGEX, source)
+                         if source.count('\n') == newlines else None)
+            else:
+                found = None
+            if found is None:
+                found = [row for (row, line) in enumerate(lines, 1)
+                         if noqa(line)]
+            for row in found:
+                rows[row] = 1
+        return self._noqa_rows
+
+    @property
+    def tree(self):
+        """The AST of the file, or None if the syntax is invalid."""
+        if not self._parsed:
+            self._parsed = True
+            try:
+                self._tree = compile(self.source, '', 'exec', PyCF_ONLY_AST)
+            except (SyntaxError, TypeError):
+                self.report_invalid_syntax()
+        return self._tree
+
     def check_ast(self):
-        """Build the file's AST and run all AST checks."""
-        try:
-            tree = compile(''.join(self.lines), '', 'exec', PyCF_ONLY_AST)
-        except (SyntaxError, TypeError):
-            return self.report_invalid_syntax()
+        """Run all AST checks on the file's AST."""
+        tree = self.tree
+        if tree is None:
+            return  # The syntax error is reported by the parse stage
+        profiler = self._profiler
+        visited = {}
+        if self._visitor_plan.visitors:
+            visited = self._visitor_plan.run(tree, self.filename, profiler)
         for name, cls, __ in self._ast_checks:
-            checker = cls(tree, self.filename)
-            for lineno, offset, text, check in checker.run():
-                if not self.lines or not noqa(self.lines[lineno - 1]):
+            if name in visited:
+                results = visited[name]
+            elif profiler:
+                start = profiler.timer()
+                results = list(cls(tree, self.filename).run())
+                profiler.record(('tree', name), profiler.timer() - start)
+            else:
+                results = cls(tree, self.filename).run()
+            noqa_rows = self.noqa_rows
+            for lineno, offset, text, check in results:
+                if lineno >= len(noqa_rows) or not noqa_rows[lineno]:
                     self.report_error(lineno, offset, text, check)
 
+    def init_regions(self):
+        """Find the regions of the file to tokenize for the selected rows.
+
+        A region starts at the top-level statement before the one which
+        holds a selected row, for the context of the blank_lines and
+        indentation checks, and stops at the top-level statement after
+        it.  The tokenizer skips the rows between the regions when no
+        check keeps a state and no indentation contains tabs; otherwise
+        the file is tokenized up to the end of the last region.  The state
+        of module_imports_on_top_of_file is found from the AST instead,
+        at the start of each region.
+        """
+        self._regions = []
+        self._row_jumps = []
+        self._row_offset = 0
+        self._stop_row = self.total_lines + 1
+        self._region_states = []
+        self._skip_physical = False
+        if self.selected_rows is None:
+            return
+        indent_tabs = INDENT_TAB_REGEX.search(self.source)
+        self._skip_physical = not indent_tabs
+        try:
+            # Leave the syntax errors to the checks
+            tree = self._tree if self._parsed else compile(
+                self.source, '', 'exec', PyCF_ONLY_AST)
+        except (SyntaxError, TypeError):
+            tree = None
+        if tree is None or not self.selected_rows:
+            return
+        starts = sorted(set(
+            min([node.lineno] + [dec.lineno for dec in
+                                 getattr(node, 'decorator_list', ())])
+            for node in tree.body))
+        starts.append(self.total_lines + 1)
+        regions = []
+        for row in sorted(self.selected_rows):
+            index = bisect.bisect_right(starts, row) - 1
+            start = starts[index - 1] if index > 0 else 1
+            stop = starts[index + 1] if index + 1 < len(starts) else starts[-1]
+            if regions and start <= regions[-1][1]:
+                regions[-1][1] = max(stop, regions[-1][1])
+            else:
+                regions.append([start, stop])
+        names = [name for name, check, __ in self._logical_state_checks
+                 if check is module_imports_on_top_of_file]
+        states = None
+        if not (indent_tabs or self._physical_state_checks or
+                len(names) < len(self._logical_state_checks)):
+            states = names and self.init_import_states(
+                tree, [start for start, __ in regions])
+        if states is None:
+            regions = [[1, regions[-1][1]]]
+        elif names:
+            self._region_states = [
+                (start, dict((name, dict(state)) for name in names))
+                for (start, __), state in zip(regions, states)]
+        (self._regions, self._stop_row) = (regions[1:], regions[0][1])
+        self.line_number = self._row_offset = regions[0][0] - 1
+        if self._row_offset:
+            self._row_jumps.append((1, self._row_offset))
+
+    def init_import_states(self, tree, rows):
+        """Return the states of module_imports_on_top_of_file at the rows.
+
+        The state at a row follows from the first line of each top-level
+        statement above it, so the rows before a region are not read.
+        Return None if a statement needs its whole logical line: after or
+        on a continuation line, or with a noqa comment which may hide it.
+        """
+        starts = sorted(set(
+            min([node.lineno] + [dec.lineno for dec in
+                                 getattr(node, 'decorator_list', ())])
+            for node in tree.body if not node.col_offset))
+        starts.append(self.total_lines + 1)
+        noqa_rows = self.noqa_rows
+        state = {}
+        states = []
+        index = 0
+        for row in rows:
+            while starts[index] < row:
+                start = starts[index]
+                index += 1
+                if any(line.rstrip('\r\n').endswith('\\')
+                       for line in self.lines[max(start - 2, 0):start]):
+                    return None
+                before = dict(state)
+                for __ in module_imports_on_top_of_file(
+                        self.lines[start - 1], 0, state, False):
+                    pass
+                if state != before and any(noqa_rows[start:starts[index]]):
+                    return None
+            states.append(dict(state))
+        return states
+
+    def init_physical_rows(self):
+        """Find the rows where the built-in physical checks may report.
+
+        One pass over the source finds the rows with trailing whitespace,
+        the rows which are too long and the last row; check_physical()
+        skips the checks of BATCH_PHYSICAL_CHECKS on the other rows.
+        Without tabs in the indentation, tabs_or_spaces and tabs_obsolete
+        never report; otherwise the rows are not filtered.
+        """
+        self._physical_rows = None
+        if (not (self._batch_physical and self.lines) or
+                isinstance(self.lines, MappedLines)):
+            return
+        source = self.source
+        newlines = self.total_lines - (not self.lines[-1].endswith('\n'))
+        if source.count('\n') != newlines or INDENT_TAB_REGEX.search(source):
+            return
+        limit = self.max_line_length
+        if limit not in _long_line_regexes:
+            _long_line_regexes[limit] = re.compile(
+                r'^.{%d}' % (limit + 1), re.M)
+        rows = set(_match_rows(TRAILING_WHITESPACE_REGEX, source))
+        rows.update(_match_rows(_long_line_regexes[limit], source))
+        rows.add(self.total_lines)
+        self._physical_rows = rows
+
+    def skip_to_next_region(self):
+        """Move the input to the start of the next region, if any."""
+        if not self._regions:
+            self.line_number = self.total_lines
+            return
+        (start, stop) = self._regions.pop(0)
+        # Offset of the rows of the tokenizer, from its next row on
+        offset = self._row_offset
+        self._row_offset += start - self._stop_row
+        self._row_jumps.append((self._stop_row - offset, self._row_offset))
+        self.line_number = start - 1
+        self._stop_row = stop
+
     def generate_tokens(self):
         """Tokenize the file, run physical line checks and yield tokens."""
         if self._io_error:
             self.report_error(1, 0, 'E902 %s' % self._io_error, readlines)
         tokengen = tokenize.generate_tokens(self.readline)
+        row_jumps = self._row_jumps
+        offset = 0
         try:
             for token in tokengen:
-                if token[2][0] > self.total_lines:
+                while row_jumps and token[2][0] >= row_jumps[0][0]:
+                    offset = row_jumps.pop(0)[1]
+                if offset:
+                    token = (token[0], token[1],
+                             (token[2][0] + offset, token[2][1]),
+                             (token[3][0] + offset, token[3][1]), token[4])
+                if token[2][0] >= self._stop_row and not self._regions:
                     return
                 self.maybe_check_physical(token)
                 yield token
@@ -1543,7 +2546,7 @@ class Checker(object):
             # - have to wind self.line_number back because initially it
             #   points to the last line of the string, and we want
             #   check_physical() to give accurate feedback
-            if noqa(token[4]):
+            if any(self.noqa_rows[token[2][0]:token[3][0] + 1]):
                 return
             self.multiline = True
             self.line_number = token[2][0]
@@ -1556,9 +2559,25 @@ class Checker(object):
         """Run all checks on the input file."""
         self.report.init_file(self.filename, self.lines, expected, line_offset)
         self.total_lines = len(self.lines)
-        if self._ast_checks:
-            self.check_ast()
-        self.line_number = 0
+        self._noqa_rows = None
+        try:
+            self.init_parse()
+            if self._ast_checks:
+                self.check_ast()
+            self.line_number = 0
+            self.init_regions()
+            self.init_physical_rows()
+            if not self._keep_parse:
+                # Find the noqa rows before the source is released
+                self.noqa_rows
+                self.init_parse()
+            self.check_tokens()
+        except _StopChecks:
+            pass    # A limit is reached, the report knows which one
+        return self.report.get_file_results()
+
+    def check_tokens(self):
+        """Tokenize the file and run the physical and logical checks."""
         self.indent_char = None
         self.indent_level = self.previous_indent_level = 0
         self.previous_logical = ''
@@ -1602,7 +2621,10 @@ class Checker(object):
         if self.tokens:
             self.check_physical(self.lines[-1])
             self.check_logical()
-        return self.report.get_file_results()
+
+
+class _StopChecks(Exception):
+    """Raised by the report when a limit of the run is reached."""
 
 
 class BaseReport(object):
@@ -1613,15 +2635,29 @@ class BaseReport(object):
     def __init__(self, options):
         self._benchmark_keys = options.benchmark_keys
         self._ignore_code = options.ignore_code
+        # The filters of the files checked with their local options
+        self.file_ignore_code = {}
+        self._jobs = options.jobs
+        self._max_file_errors = options.max_errors_per_file
+        self._max_errors = options.max_errors
+        self._time_budget = options.time_budget
+        # The time when the checks stop, with a time budget
+        self.deadline = None
         # Results
         self.elapsed = 0
+        self.walk_elapsed = 0
         self.total_errors = 0
         self.counters = dict.fromkeys(self._benchmark_keys, 0)
         self.messages = {}
+        # The files not checked to the end and why, and why the run stopped
+        self.truncated = []
+        self.file_truncated = self.stopped = None
 
     def start(self):
         """Start the timer."""
         self._start_time = time.time()
+        if self._time_budget:
+            self.deadline = self._start_time + self._time_budget
 
     def stop(self):
         """Stop the timer."""
@@ -1629,23 +2665,52 @@ class BaseReport(object):
 
     def init_file(self, filename, lines, expected, line_offset):
         """Signal a new file."""
+        if self.deadline and not self.stopped and \
+                time.time() > self.deadline:
+            self.stopped = self.time_budget_exceeded()
+        if self.stopped:
+            raise _StopChecks(self.stopped)
         self.filename = filename
+        self._file_ignore_code = self.file_ignore_code.get(
+            filename, self._ignore_code)
         self.lines = lines
         self.expected = expected or ()
         self.line_offset = line_offset
         self.file_errors = 0
+        self.file_truncated = None
         self.counters['files'] += 1
         self.counters['physical lines'] += len(lines)
 
     def increment_logical_line(self):
         """Signal a new logical line."""
         self.counters['logical lines'] += 1
+        if self.deadline and time.time() > self.deadline:
+            self.truncate_file(self.time_budget_exceeded(), stop=True)
+
+    def time_budget_exceeded(self):
+        """Return the reason to stop when the time budget is over."""
+        return 'time budget of %g seconds exceeded' % self._time_budget
+
+    def truncate_file(self, reason, stop=False):
+        """Stop checking the file, and the run if stop is true."""
+        self.file_truncated = reason
+        self.truncated.append((self.filename, reason))
+        if stop:
+            self.stopped = reason
+        raise _StopChecks(reason)
 
     def error(self, line_number, offset, text, check):
         """Report an error, according to options."""
         code = text[:4]
-        if self._ignore_code(code):
+        if self._file_ignore_code(code):
             return
+        if self._max_errors and self.total_errors >= self._max_errors:
+            self.truncate_file('error limit of %d reached' %
+                               self._max_errors, stop=True)
+        if self._max_file_errors and \
+                self.file_errors >= self._max_file_errors:
+            self.truncate_file('error limit of %d per file reached' %
+                               self._max_file_errors)
         if code in self.counters:
             self.counters[code] += 1
         else:
@@ -1664,6 +2729,19 @@ class BaseReport(object):
         """Return the count of errors and warnings for this file."""
         return self.file_errors
 
+    def replay_file(self, filename, results):
+        """Feed the results recorded by a RecordingReport for a file."""
+        (lines, expected, line_offset, logical_lines, errors) = results
+        self.init_file(filename, lines, expected, line_offset)
+        try:
+            for __ in range(logical_lines):
+                self.increment_logical_line()
+            for (line_number, offset, text, check) in errors:
+                self.error(line_number, offset, text, check)
+        except _StopChecks:
+            pass
+        return self.get_file_results()
+
     def get_count(self, prefix=''):
         """Return the total count of errors and warnings."""
         return sum([self.counters[key]
@@ -1688,11 +2766,32 @@ class BaseReport(object):
     def print_benchmark(self):
         """Print benchmark numbers."""
         print('%-7.2f %s' % (self.elapsed, 'seconds elapsed'))
+        if self.walk_elapsed:
+            print('%-7.2f %s' % (self.walk_elapsed,
+                                 'seconds walking directories'))
         if self.elapsed:
             for key in self._benchmark_keys:
                 print('%-7d %s per second (%d total)' %
                       (self.counters[key] / self.elapsed, key,
                        self.counters[key]))
+        for key in CACHE_KEYS:
+            if key in self.counters:
+                print('%-7d %s' % (self.counters[key], key))
+        lookups = sum(self.counters.get(key, 0) for key in MEMO_KEYS)
+        if lookups:
+            for key in MEMO_KEYS:
+                print('%-7d %s' % (self.counters.get(key, 0), key))
+            print('%-7.1f %s' % (100. * self.counters.get(MEMO_KEYS[0], 0) /
+                                 lookups, '% memo hit rate'))
+        if resource is not None:
+            # Peak resident set size, in kilobytes (bytes on Mac OS X)
+            scale = 1024 if sys.platform == 'darwin' else 1
+            usage = [(resource.RUSAGE_SELF, '')]
+            if self._jobs > 1:
+                usage.append((resource.RUSAGE_CHILDREN, ' (workers)'))
+            for who, label in usage:
+                maxrss = resource.getrusage(who).ru_maxrss // scale
+                print('%-7d %s%s' % (maxrss, 'kB peak memory', label))
 
 
 class FileReport(BaseReport):
@@ -1700,6 +2799,194 @@ class FileReport(BaseReport):
     print_filename = True
 
 
+class RecordingReport(BaseReport):
+    """Record the raw results of the checks for later replay.
+
+    Nothing is filtered or printed: the results returned by
+    get_file_results() can be pickled and fed to another report with
+    BaseReport.replay_file().
+
+    With limits, the checks of a file stop where the replay will stop
+    them: at the error after the limit of errors per file (or of the
+    run, the most a file may report), or at the deadline of the run.
+    """
+
+    def __init__(self, options, limits=False, deadline=None):
+        super(RecordingReport, self).__init__(options)
+        (max_errors, self._max_file_errors) = (
+            (self._max_errors, self._max_file_errors) if limits else (0, 0))
+        if max_errors and (max_errors < self._max_file_errors or
+                           not self._max_file_errors):
+            self._max_file_errors = max_errors
+        self._stop_time = deadline
+        self._selected = (getattr(options, 'selected_lines', None)
+                          if options.diff or options.git_rev else None)
+
+    def init_file(self, filename, lines, expected, line_offset):
+        """Signal a new file."""
+        self._logical_lines = 0
+        self._errors = []
+        return super(RecordingReport, self).init_file(
+            filename, lines, expected, line_offset)
+
+    def increment_logical_line(self):
+        """Signal a new logical line."""
+        self._logical_lines += 1
+        if self._stop_time and time.time() > self._stop_time:
+            self.truncate_file(self.time_budget_exceeded())
+
+    def error(self, line_number, offset, text, check):
+        """Record an error, whatever the options."""
+        # Bound methods (e.g. Checker.report_invalid_syntax) are replaced
+        # by their function, which has the same docstring and pickles.
+        check = getattr(check, '__func__', check)
+        self._errors.append((line_number, offset, text, check))
+        if not self._max_file_errors or self._ignore_code(text[:4]) or (
+                self._selected is not None and
+                line_number not in self._selected[self.filename]):
+            return
+        # Count the errors like BaseReport.error() does on replay
+        if self.file_errors >= self._max_file_errors:
+            self.truncate_file('error limit of %d reached' %
+                               self._max_file_errors)
+        if text[:4] not in self.expected:
+            self.file_errors += 1
+
+    def get_file_results(self):
+        """Return the recorded results for this file."""
+        return (self.lines, self.expected, self.line_offset,
+                self._logical_lines, self._errors)
+
+
+class Violation(object):
+    """An error found in a source: its path, row, column and code."""
+
+    __slots__ = ('path', 'row', 'col', 'code')
+
+    def __init__(self, path, row, col, code):
+        self.path = path
+        self.row = row
+        self.col = col
+        self.code = code
+
+    def __repr__(self):
+        return 'Violation(%r, %d, %d, %r)' % (self.path, self.row, self.col,
+                                              self.code)
+
+
+class ViolationReport(BaseReport):
+    """Collect the errors as Violation records, without printing.
+
+    The records share the path of their file and the code strings; the
+    texts of the errors are not kept.
+    """
+
+    def __init__(self, options):
+        super(ViolationReport, self).__init__(options)
+        self.violations = []
+        self._codes = {}
+
+    def error(self, line_number, offset, text, check):
+        """Record an error, according to options."""
+        code = super(ViolationReport, self).error(line_number, offset, text,
+                                                  check)
+        if code:
+            self.violations.append(Violation(
+                self.filename, self.line_offset + line_number, offset + 1,
+                self._codes.setdefault(code, code)))
+        return code
+
+
+def _print_aside(output_file, method, *args):
+    """Call a print method, on stderr if the report goes to stdout."""
+    if output_file:
+        return method(*args)
+    stdout, sys.stdout = sys.stdout, sys.stderr
+    try:
+        return method(*args)
+    finally:
+        sys.stdout = stdout
+
+
+class ShardReport(RecordingReport):
+    """Write the results of a shard of the run, for pep8 --merge.
+
+    The partial report has the raw results of each file of the shard,
+    its index in the files of the whole run, and only the source lines
+    with errors.  It is written to options.output_file or stdout.  No
+    error is counted: the exit status of the run is the one of the merge.
+    """
+
+    def __init__(self, options):
+        super(ShardReport, self).__init__(options)
+        self._codec = ResultCache(None, options)
+        self._shard = options.shard
+        self._output_file = getattr(options, 'output_file', None)
+        self.file_indexes = {}
+        self.file_count = 0
+        self.files = []
+
+    def get_file_results(self):
+        """Keep the results of the file for the partial report."""
+        lines = self.lines
+        self.files.append([
+            self.file_indexes.get(self.filename, len(self.files)),
+            self.filename, len(lines), self._logical_lines,
+            self._codec.encode(self._errors),
+            [[row, lines[row - 1]]
+             for row in sorted(set(error[0] for error in self._errors))
+             if 0 < row <= len(lines)]])
+        return super(ShardReport, self).get_file_results()
+
+    def stop(self):
+        """Stop the timer and write the partial report."""
+        super(ShardReport, self).stop()
+        counters = dict((key, value) for key, value in self.counters.items()
+                        if key not in BENCHMARK_KEYS[1:])
+        partial = {'pep8': __version__, 'shard': self._shard,
+                   'fingerprint': self._codec.fingerprint,
+                   'elapsed': self.elapsed, 'walk_elapsed': self.walk_elapsed,
+                   'counters': counters, 'files': self.files}
+        if self._output_file:
+            with open(self._output_file, 'w') as f:
+                json.dump(partial, f, separators=(',', ':'))
+        else:
+            json.dump(partial, sys.stdout, separators=(',', ':'))
+
+    def print_statistics(self, prefix=''):
+        """Print the statistics, beside the partial report."""
+        _print_aside(self._output_file,
+                     super(ShardReport, self).print_statistics, prefix)
+
+    def print_benchmark(self):
+        """Print the benchmark numbers, beside the partial report."""
+        _print_aside(self._output_file,
+                     super(ShardReport, self).print_benchmark)
+
+
+def parse_shard(value):
+    """Parse a shard given as 'i/N' or (i, N), return [i, N].
+
+    Raise ValueError unless 1 <= i <= N.
+    """
+    if isinstance(value, str):
+        (shard, __, count) = value.partition('/')
+        if not (shard.isdigit() and count.isdigit()):
+            raise ValueError('--shard must be i/N with 1 <= i <= N')
+        value = (shard, count)
+    (shard, count) = [int(number) for number in value]
+    if not 0 < shard <= count:
+        raise ValueError('--shard must be i/N with 1 <= i <= N')
+    return [shard, count]
+
+
+def shard_of(filename, count):
+    """Return the shard of a file, from 1 to count."""
+    import zlib
+    name = os.path.normpath(filename).encode('utf-8', 'replace')
+    return (zlib.crc32(name) & 0xffffffff) % count + 1
+
+
 class StandardReport(BaseReport):
     """Collect and print the results of the checks."""
 
@@ -1752,8 +3039,17 @@ class StandardReport(BaseReport):
             # Typical buffer size is 8192. line written safely when
             # len(line) < 8192.
             sys.stdout.flush()
+        if self.file_truncated:
+            print('%s: checks truncated, %s' % (self.filename,
+                                                self.file_truncated))
         return self.file_errors
 
+    def stop(self):
+        """Stop the timer."""
+        super(StandardReport, self).stop()
+        if self.stopped:
+            print('... stopped, %s' % self.stopped)
+
 
 class DiffReport(StandardReport):
     """Collect and print the results for the changed lines only."""
@@ -1768,6 +3064,311 @@ class DiffReport(StandardReport):
         return super(DiffReport, self).error(line_number, offset, text, check)
 
 
+class DocumentReport(BaseReport):
+    """Write the results of the run as one document.
+
+    The document is written in large chunks to the standard output, or to
+    options.output_file, compressed with gzip if its name ends in '.gz'.
+    """
+
+    buffer_size = 1 << 16
+    quote = staticmethod(json.encoder.encode_basestring_ascii)
+
+    def __init__(self, options):
+        super(DocumentReport, self).__init__(options)
+        self._repeat = options.repeat
+        self._show_source = options.show_source
+        self._show_pep8 = options.show_pep8
+        self._selected = (options.selected_lines
+                          if options.diff or options.git_rev else None)
+        self._output_file = getattr(options, 'output_file', None)
+        self._stream = None
+        self._chunks = []
+        self._size = 0
+
+    def start(self):
+        """Start the timer and the document."""
+        super(DocumentReport, self).start()
+        if not self._output_file:
+            self._stream = sys.stdout
+        elif self._output_file.endswith('.gz'):
+            import gzip
+            self._stream = gzip.open(self._output_file, 'wt')
+        else:
+            self._stream = open(self._output_file, 'w')
+        self._separator = ''
+        self.write(self.header())
+
+    def stop(self):
+        """Stop the timer and finish the document."""
+        super(DocumentReport, self).stop()
+        self.write(self.footer())
+        self.flush()
+        if self._stream is not sys.stdout:
+            self._stream.close()
+        self._stream = None
+
+    def write(self, text):
+        """Write some text to the document, through the buffer."""
+        self._chunks.append(text)
+        self._size += len(text)
+        if self._size >= self.buffer_size:
+            self.flush()
+
+    def flush(self):
+        """Write the buffer to the stream."""
+        if self._chunks:
+            self._stream.write(''.join(self._chunks))
+            self._chunks = []
+            self._size = 0
+        self._stream.flush()
+
+    def init_file(self, filename, lines, expected, line_offset):
+        """Signal a new file."""
+        self._file_errors = []
+        return super(DocumentReport, self).init_file(
+            filename, lines, expected, line_offset)
+
+    def error(self, line_number, offset, text, check):
+        """Report an error, according to options."""
+        if (self._selected is not None and
+                line_number not in self._selected[self.filename]):
+            return
+        code = super(DocumentReport, self).error(line_number, offset,
+                                                 text, check)
+        if code and (self.counters[code] == 1 or self._repeat):
+            self._file_errors.append(
+                (line_number, offset, code, text[5:], check.__doc__))
+        return code
+
+    def get_file_results(self):
+        """Write the results and return the overall count for this file."""
+        if not self._file_errors:
+            return self.file_errors
+        self._file_errors.sort()
+        quote = self.quote
+        path = quote(self.format_path(self.filename))
+        results = []
+        for line_number, offset, code, text, doc in self._file_errors:
+            source = pep8 = ''
+            if self._show_source:
+                if line_number > len(self.lines):
+                    source = self.source_field % quote('')
+                else:
+                    source = self.source_field % quote(
+                        self.lines[line_number - 1].rstrip())
+            if self._show_pep8 and doc:
+                pep8 = self.pep8_field % quote(doc.strip())
+            results.append(self.error_format % {
+                'path': path, 'row': self.line_offset + line_number,
+                'col': offset + 1, 'code': code, 'text': quote(text),
+                'level': 'warning' if code[:1] == 'W' else 'error',
+                'source': source, 'pep8': pep8})
+        self.write(self._separator + ',\n'.join(results))
+        self._separator = ',\n'
+        return self.file_errors
+
+    def format_path(self, filename):
+        return filename
+
+    def get_summary(self):
+        """Return the counters of the run."""
+        return {'total_errors': self.total_errors,
+                'elapsed': round(self.elapsed, 3),
+                'walk_elapsed': round(self.walk_elapsed, 3),
+                'counters': self.counters,
+                'messages': self.messages,
+                'truncated': [{'path': self.format_path(filename),
+                               'reason': reason}
+                              for (filename, reason) in self.truncated],
+                'stopped': self.stopped}
+
+    def print_statistics(self, prefix=''):
+        """Print the statistics, beside the document."""
+        _print_aside(self._output_file,
+                     super(DocumentReport, self).print_statistics, prefix)
+
+    def print_benchmark(self):
+        """Print the benchmark numbers, beside the document."""
+        _print_aside(self._output_file,
+                     super(DocumentReport, self).print_benchmark)
+
+
+class JSONReport(DocumentReport):
+    """Write the results as a JSON document."""
+
+    error_format = ('{"path": %(path)s, "row": %(row)d, "col": %(col)d, '
+                    '"code": "%(code)s", "text": %(text)s%(source)s%(pep8)s}')
+    source_field = ', "source": %s'
+    pep8_field = ', "pep8": %s'
+
+    def header(self):
+        return '{"errors": [\n'
+
+    def footer(self):
+        summary = json.dumps(self.get_summary(), sort_keys=True)
+        return '\n], %s\n' % summary[1:]
+
+
+class SarifReport(DocumentReport):
+    """Write the results as a SARIF 2.1.0 log."""
+
+    error_format = ('{"ruleId": "%(code)s", "level": "%(level)s", '
+                    '"message": {"text": %(text)s}, "locations": [{'
+                    '"physicalLocation": {'
+                    '"artifactLocation": {"uri": %(path)s}, '
+                    '"region": {"startLine": %(row)d, "startColumn": %(col)d'
+                    '%(source)s}}}]%(pep8)s}')
+    source_field = ', "snippet": {"text": %s}'
+    pep8_field = ', "properties": {"pep8": %s}'
+
+    def header(self):
+        return ('{"version": "2.1.0", "$schema": '
+                '"https://json.schemastore.org/sarif-2.1.0.json", '
+                '"runs": [{"results": [\n')
+
+    def footer(self):
+        rules = [{'id': code, 'shortDescription': {'text': text}}
+                 for code, text in sorted(self.messages.items())]
+        tool = {'driver': {'name': 'pep8', 'version': __version__,
+                           'rules': rules}}
+        return '\n], "tool": %s, "properties": %s}]}\n' % (
+            json.dumps(tool, sort_keys=True),
+            json.dumps(self.get_summary(), sort_keys=True))
+
+    def format_path(self, filename):
+        # A relative URI
+        return filename.replace(os.sep, '/')
+
+
+DOCUMENT_REPORTS = {'json': JSONReport, 'sarif': SarifReport}
+
+
+class ResultCache(object):
+    """Store the recorded results of the checks on disk.
+
+    The entries are keyed on the content of the file and on a fingerprint
+    of the options which change the results.  The least recently used
+    entries are evicted by prune().
+    """
+
+    def __init__(self, cache_dir, options):
+        self.cache_dir = cache_dir
+        self._checks = {'readlines': readlines,
+                        'report_invalid_syntax':
+                            Checker.report_invalid_syntax}
+        names = []
+        for kind in ('physical_checks', 'logical_checks', 'ast_checks'):
+            for name, check, __ in getattr(options, kind):
+                self._checks[check.__name__] = check
+                names.append('%s.%s' % (check.__module__, name))
+        self.fingerprint = json.dumps([
+            __version__, sorted(options.select), sorted(options.ignore),
+            options.max_line_length, bool(options.hang_closing),
+            sorted(names)])
+
+    def encode(self, errors):
+        """Replace the checks with their names in the recorded errors."""
+        return [(line_number, offset, text, check.__name__)
+                for (line_number, offset, text, check) in errors]
+
+    def decode(self, errors):
+        """Resolve the names of the checks in the recorded errors."""
+        return [(line_number, offset, text, self._checks[name])
+                for (line_number, offset, text, name) in errors]
+
+    def get_key(self, lines):
+        """Return the cache key for these source lines."""
+        import hashlib
+        digest = hashlib.sha1(self.fingerprint.encode('utf-8'))
+        for line in lines:
+            digest.update(line.encode('utf-8', 'surrogatepass'))
+        return digest.hexdigest()
+
+    def _path(self, key):
+        return os.path.join(self.cache_dir, key[:2], key[2:])
+
+    def get(self, key):
+        """Return (logical_lines, errors) for the key, or None."""
+        path = self._path(key)
+        try:
+            with open(path) as f:
+                (logical_lines, errors) = json.load(f)
+            errors = self.decode(errors)
+            # Keep track of the last use of the entry, for prune()
+            os.utime(path, None)
+        except (IOError, OSError, ValueError, KeyError, TypeError):
+            return None
+        return (logical_lines, errors)
+
+    def put(self, key, logical_lines, errors):
+        """Store the results recorded for the key."""
+        errors = self.encode(errors)
+        if any(self._checks.get(name) is None for __, __, __, name in errors):
+            return  # This check could not be resolved on replay
+        path = self._path(key)
+        # Write to a temporary file first: other processes may read it
+        temp_path = '%s.%d.tmp' % (path, os.getpid())
+        try:
+            if not os.path.isdir(os.path.dirname(path)):
+                os.makedirs(os.path.dirname(path))
+            with open(temp_path, 'w') as f:
+                json.dump([logical_lines, errors], f)
+            os.rename(temp_path, path)
+        except (IOError, OSError):
+            pass
+
+    def prune(self, max_entries=CACHE_MAX_ENTRIES, added=None):
+        """Remove the least recently used entries above max_entries.
+
+        The count of the entries is kept in the cache directory.  When
+        the count of the entries added since the last prune is given, the
+        directory is walked only if the total passes max_entries; then
+        the entries are pruned to CACHE_PRUNE_RATIO of max_entries, so
+        that the next runs do not walk it again.
+        """
+        count_path = os.path.join(self.cache_dir, 'entries')
+        if added is not None:
+            try:
+                with open(count_path) as f:
+                    count = int(f.read()) + added
+            except (IOError, OSError, ValueError):
+                count = None    # Not counted yet
+            if count is not None and count <= max_entries:
+                self._write_count(count_path, count)
+                return
+        entries = []
+        for root, dirs, files in os.walk(self.cache_dir):
+            if root == self.cache_dir:
+                continue    # Only the count is kept at the top
+            for filename in files:
+                path = os.path.join(root, filename)
+                try:
+                    entries.append((os.path.getmtime(path), path))
+                except OSError:
+                    pass
+        count = len(entries)
+        if count > max_entries:
+            entries.sort()
+            for __, path in entries[:count -
+                                    int(max_entries * CACHE_PRUNE_RATIO)]:
+                try:
+                    os.remove(path)
+                    count -= 1
+                except OSError:
+                    pass
+        self._write_count(count_path, count)
+
+    def _write_count(self, count_path, count):
+        temp_path = '%s.%d.tmp' % (count_path, os.getpid())
+        try:
+            with open(temp_path, 'w') as f:
+                f.write('%d\n' % count)
+            os.rename(temp_path, count_path)
+        except (IOError, OSError):
+            pass
+
+
 class StyleGuide(object):
     """Initialize a PEP-8 instance with few options."""
 
@@ -1776,12 +3377,22 @@ class StyleGuide(object):
         self.checker_class = kwargs.pop('checker_class', Checker)
         parse_argv = kwargs.pop('parse_argv', False)
         config_file = kwargs.pop('config_file', False)
-        parser = kwargs.pop('parser', None)
+        parser = kwargs.pop('parser', None) or get_parser()
         # build options from dict
         options_dict = dict(*args, **kwargs)
         arglist = None if parse_argv else options_dict.get('paths', None)
         options, self.paths = process_options(
             arglist, parse_argv, config_file, parser)
+        # The parser keeps the values of its last parse, which are pickled
+        # with it for the worker processes
+        parser.values = None
+        # To read the configuration of other directories, with --per-dir
+        self._config_args = (arglist or ([] if not parse_argv else None),
+                             parser, options_dict)
+        self._config_dirs = {}
+        self._local_styleguides = {}    # By configuration directory
+        self._styleguides = {}          # By options
+        self._excluded_dirs = {}
         if options_dict:
             options.__dict__.update(options_dict)
             if 'paths' in options_dict:
@@ -1790,7 +3401,15 @@ class StyleGuide(object):
         self.runner = self.input_file
         self.options = options
 
-        if not options.reporter:
+        document_report = DOCUMENT_REPORTS.get(options.format.lower())
+        if options.shard:
+            options.shard = parse_shard(options.shard)
+            options.reporter = ShardReport
+        elif document_report and (not options.reporter or
+                                  options.reporter in (FileReport,
+                                                       DiffReport)):
+            options.reporter = document_report
+        elif not options.reporter:
             options.reporter = BaseReport if options.quiet else StandardReport
 
         options.select = tuple(options.select or ())
@@ -1806,8 +3425,49 @@ class StyleGuide(object):
         options.physical_checks = self.get_checks('physical_line')
         options.logical_checks = self.get_checks('logical_line')
         options.ast_checks = self.get_checks('tree')
+        options.profiler = None
+        if options.profile or options.profile_json:
+            options.profiler = CheckProfiler()
+        self.init_plans()
+        options.logical_memo = (LogicalMemo(options.logical_checks,
+                                            options.memo)
+                                if options.memo else None)
+        options.cache = (ResultCache(options.cache_dir, options)
+                         if options.cache_dir else None)
         self.init_report()
 
+    def __getstate__(self):
+        """Return the state to pickle, without the plans and the report.
+
+        The plans are functions made by compile_checks(): a worker process
+        started by spawn or forkserver compiles them again.  The report may
+        write to a stream; the workers make their own.
+        """
+        import copy
+        state = self.__dict__.copy()
+        state['options'] = options = copy.copy(self.options)
+        for name in ('physical_plan', 'logical_plan', 'visitor_plan',
+                     'logical_triggers', 'report'):
+            setattr(options, name, None)
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self.init_plans()
+
+    def init_plans(self):
+        """Compile the check plans of the options."""
+        options = self.options
+        options.physical_plan = compile_checks(options.physical_checks)
+        options.logical_plan = compile_checks(options.logical_checks)
+        options.visitor_plan = VisitorPlan(options.ast_checks)
+        if options.profiler:
+            options.physical_plan = options.profiler.wrap(
+                options.physical_plan, 'physical_line')
+            options.logical_plan = options.profiler.wrap(
+                options.logical_plan, 'logical_line')
+        options.logical_triggers = TriggerPlan(options.logical_plan)
+
     def init_report(self, reporter=None):
         """Initialize the report instance."""
         self.options.report = (reporter or self.options.reporter)(self.options)
@@ -1819,15 +3479,44 @@ class StyleGuide(object):
             paths = self.paths
         report = self.options.report
         runner = self.runner
+        filenames = None
+        if ((self.options.jobs > 1 or self.options.connect or
+                self.options.per_dir_config or self.options.shard) and
+                not self.options.git_rev and
+                runner == self.input_file and '-' not in paths):
+            # Collect the files first, then check them in worker processes
+            # or ask the daemon for the results
+            filenames = []
+            self.runner = runner = filenames.append
         report.start()
         try:
+            if self.options.git_rev:
+                self.input_git_files(paths)
+                paths = ()
             for path in paths:
                 if os.path.isdir(path):
                     self.input_dir(path)
-                elif not self.excluded(path):
+                elif self.excluded(path):
+                    continue
+                elif is_archive(path):
+                    if filenames:
+                        # Report the files before the archive first
+                        self.input_collected(filenames)
+                        del filenames[:]
+                    self.input_archive(path)
+                else:
                     runner(path)
+            if filenames:
+                self.input_collected(filenames)
         except KeyboardInterrupt:
             print('... stopped')
+        except _StopChecks:
+            pass    # A limit of the run is reached
+        finally:
+            if filenames is not None:
+                self.runner = self.input_file
+        if self.options.cache and report.counters.get(CACHE_KEYS[1]):
+            self.options.cache.prune(added=report.counters[CACHE_KEYS[1]])
         report.stop()
         return report
 
@@ -1835,31 +3524,523 @@ class StyleGuide(object):
         """Run all checks on a Python source file."""
         if self.options.verbose:
             print('checking %s' % filename)
+        if self.options.cache and filename not in (None, '-'):
+            (cached, file_results) = self.record_file(
+                filename, lines, expected, line_offset)
+            return self.replay_file(filename, cached, file_results)
         fchecker = self.checker_class(
             filename, lines=lines, options=self.options)
         return fchecker.check_all(expected=expected, line_offset=line_offset)
 
+    def record_file(self, filename, lines=None, expected=None,
+                    line_offset=0, limits=True):
+        """Run all checks on a file and return the recorded results.
+
+        Return a tuple (cached, file_results): cached is None without
+        a result cache, otherwise it tells if the checks were skipped.
+        With limits, the checks stop where the replay stops them; the
+        results of a file which is not checked to the end are not cached.
+        The memo lookups are counted by the report of this style guide.
+        """
+        cache = self.options.cache
+        cached = key = None
+        if cache and lines is None:
+            try:
+                lines = readlines(filename)
+            except IOError:
+                cache = None    # The checker reports the error
+        if cache:
+            key = cache.get_key(lines)
+            results = cache.get(key)
+            cached = results is not None
+            if cached:
+                (logical_lines, errors) = results
+                if lines and lines[0][:1] == '\ufeff':
+                    lines[0] = lines[0][1:]     # As done by the Checker
+                return cached, (lines, expected or (), line_offset,
+                                logical_lines, errors)
+        report = RecordingReport(self.options, limits,
+                                 self.options.report.deadline if limits
+                                 else None)
+        fchecker = self.checker_class(filename, lines=lines,
+                                      options=self.options, report=report)
+        if key:
+            fchecker.selected_rows = None   # Cache the whole file
+        file_results = fchecker.check_all(expected=expected,
+                                          line_offset=line_offset)
+        counters = self.options.report.counters
+        for name in MEMO_KEYS:
+            if name in report.counters:
+                counters[name] = counters.get(name, 0) + report.counters[name]
+        if key and not report.file_truncated:
+            cache.put(key, file_results[3], file_results[4])
+        return cached, file_results
+
+    def replay_file(self, filename, cached, file_results):
+        """Feed the recorded results for a file to the report."""
+        report = self.options.report
+        if cached is not None:
+            key = CACHE_KEYS[0] if cached else CACHE_KEYS[1]
+            report.counters[key] = report.counters.get(key, 0) + 1
+        return report.replay_file(filename, file_results)
+
+    def input_collected(self, filenames):
+        """Check the files which check_files() collected, in their order."""
+        if self.options.shard:
+            filenames = self.select_shard(filenames)
+        if filenames and self.options.per_dir_config:
+            self.input_files_configured(filenames)
+        elif filenames:
+            self.input_files(filenames)
+
+    def select_shard(self, filenames):
+        """Return the files of the shard of this run, with --shard."""
+        return [filename for filename in filenames
+                if self.in_shard(filename)]
+
+    def in_shard(self, filename):
+        """Tell if the next file of the run is in the shard of this run.
+
+        The report is told the index of each file of the shard in the
+        whole run.
+        """
+        (shard, count) = self.options.shard
+        report = self.options.report
+        index = report.file_count
+        report.file_count += 1
+        if shard_of(filename, count) != shard:
+            return False
+        report.file_indexes[filename] = index
+        return True
+
+    def merge_reports(self, filenames):
+        """Report the results of the partial reports of all the shards.
+
+        The output is the same as for a run without --shard.  Raise
+        ValueError if a partial report was written with other options or
+        is not valid JSON, or if a shard is missing.
+        """
+        codec = ResultCache(None, self.options)
+        report = self.options.report
+        shards = {}
+        files = []
+        (elapsed, walk_elapsed, counters) = (0, 0, {})
+        for filename in filenames:
+            with open(filename) as f:
+                partial = json.load(f)
+            if partial['fingerprint'] != codec.fingerprint:
+                raise ValueError('%s: the shard was run with other options' %
+                                 filename)
+            (shard, count) = partial['shard']
+            shards.setdefault(count, set()).add(shard)
+            files.extend(partial['files'])
+            elapsed += partial['elapsed'] - partial['walk_elapsed']
+            walk_elapsed = max(walk_elapsed, partial['walk_elapsed'])
+            for key, value in partial['counters'].items():
+                # Each shard walks all the directories
+                counters[key] = (max(counters.get(key, 0), value)
+                                 if key == 'directories' else
+                                 counters.get(key, 0) + value)
+        for count, found in shards.items():
+            if len(shards) > 1 or len(found) < count:
+                raise ValueError('missing shards: %s' % ', '.join(
+                    '%d/%d' % (shard, count)
+                    for shard in range(1, count + 1) if shard not in found))
+        report.start()
+        report.counters.update(counters)
+        try:
+            for index, filename, size, logical_lines, errors, source in \
+                    sorted(files):
+                lines = [''] * size
+                for (row, line) in source:
+                    lines[row - 1] = line
+                report.replay_file(filename, (lines, (), 0, logical_lines,
+                                              codec.decode(errors)))
+        except _StopChecks:
+            pass    # A limit of the run is reached
+        report.walk_elapsed = walk_elapsed
+        report._start_time = time.time() - elapsed - walk_elapsed
+        report.stop()
+        return report
+
+    def input_git_files(self, filenames):
+        """Run all checks on the files read from git with --git-rev."""
+        objects = self.options.git_objects
+        filenames = [filename for filename in filenames
+                     if filename in objects and not self.excluded(filename)]
+        contents = git_cat_files(objects[name] for name in filenames)
+        try:
+            for filename, data in zip(filenames, contents):
+                if data is not None:
+                    self.input_file(filename, lines=decode_lines(data))
+        finally:
+            contents.close()
+
+    def input_files(self, filenames):
+        """Run all checks on the files, in parallel or by the daemon."""
+        if self.options.connect:
+            self.input_files_remote(filenames)
+        elif self.options.jobs > 1:
+            self.input_files_parallel(filenames)
+        else:
+            for filename in filenames:
+                self.input_file(filename)
+
+    def input_files_configured(self, filenames):
+        """Run all checks on the files with their local configuration.
+
+        Each file is checked by the style guide returned by
+        local_styleguide(), in the order of the files.  The results go
+        to the report of this style guide, which filters the codes of
+        each file with its local options.
+        """
+        report = self.options.report
+        checked = []
+        for filename in filenames:
+            dirname = os.path.dirname(os.path.abspath(filename))
+            styleguide = self.local_styleguide(dirname)
+            if styleguide.excluded(filename) or self.local_excluded(dirname):
+                continue
+            self.share_report(styleguide)
+            report.file_ignore_code[filename] = styleguide.options.ignore_code
+            checked.append((styleguide, filename))
+        if self.options.jobs > 1 and not self.options.connect:
+            # The workers find the style guide of each file
+            self.run_workers(_check_configured_worker,
+                             [filename for (__, filename) in checked],
+                             self.options.jobs, self.replay_results)
+            return
+        # The consecutive files of a style guide are checked together
+        import itertools
+        import operator
+        for styleguide, group in itertools.groupby(checked,
+                                                   operator.itemgetter(0)):
+            styleguide.input_files([filename for (__, filename) in group])
+
+    def share_report(self, styleguide):
+        """Let another style guide use the report and the profiler."""
+        styleguide.options.report = self.options.report
+        if styleguide.options.profiler is not self.options.profiler:
+            styleguide.options.profiler = self.options.profiler
+            styleguide.init_plans()
+
+    def find_config_dir(self, dirname):
+        """Return the nearest directory above with a project configuration.
+
+        The result is cached for each directory on the way up.
+        """
+        found = self._config_dirs
+        visited = []
+        parent = dirname
+        while parent not in found:
+            visited.append(parent)
+            if any(os.path.isfile(os.path.join(parent, name))
+                   for name in PROJECT_CONFIG):
+                found[parent] = parent
+                break
+            (parent, tail) = os.path.split(parent)
+            if not tail:
+                found[parent] = None
+                break
+        for path in visited:
+            found[path] = found[parent]
+        return found[dirname]
+
+    def local_excluded(self, dirname):
+        """Check if a directory is excluded by its local configuration.
+
+        The directories up to the one of the configuration are checked.
+        """
+        excluded = self._excluded_dirs.get(dirname)
+        if excluded is None:
+            excluded = self.local_styleguide(dirname).excluded(dirname)
+            if not excluded and self.find_config_dir(dirname) not in (
+                    None, dirname):
+                excluded = self.local_excluded(os.path.dirname(dirname))
+            self._excluded_dirs[dirname] = excluded
+        return excluded
+
+    def local_styleguide(self, dirname):
+        """Return the style guide for the files of a directory.
+
+        It uses the project configuration nearest to the directory with
+        the command line options.  One style guide is built for each set
+        of options.  Its results go to the report of this style guide, so
+        the output options of the local configuration, like show-source
+        or format, are not used.
+        """
+        config_dir = self.find_config_dir(dirname)
+        styleguide = self._local_styleguides.get(config_dir)
+        if styleguide is not None:
+            return styleguide
+        (arglist, parser, options_dict) = self._config_args
+        (options, __) = parser.parse_args(arglist)
+        options = read_config(options, [config_dir] if config_dir else [],
+                              arglist, parser)
+        split_options(options)
+        options_dict = dict(vars(options), **options_dict)
+        options_dict.update(
+            reporter=BaseReport, per_dir_config=False, shard=None,
+            selected_lines=getattr(self.options, 'selected_lines', None))
+        key = repr(sorted(options_dict.items()))
+        styleguide = self._styleguides.get(key)
+        if styleguide is None:
+            styleguide = StyleGuide(parse_argv=False, config_file=False,
+                                    parser=parser, **options_dict)
+            self._styleguides[key] = styleguide
+        self._local_styleguides[config_dir] = styleguide
+        return styleguide
+
+    def input_files_parallel(self, filenames):
+        """Run all checks on the files using a pool of processes.
+
+        The workers record the results and the files are replayed in
+        their original order: the report is the same as a serial run.
+        """
+        self.run_workers(_check_file_worker, filenames, self.options.jobs,
+                         self.replay_results)
+
+    def replay_results(self, filename, results):
+        """Feed the results of _check_file_worker() to the report."""
+        (cached, file_results, (stats, counters)) = results
+        if self.options.verbose:
+            print('checking %s' % filename)
+        if stats:
+            self.options.profiler.merge(stats)
+        report = self.options.report
+        for key, value in counters.items():
+            report.counters[key] = report.counters.get(key, 0) + value
+        self.replay_file(filename, cached, file_results)
+
+    def run_workers(self, worker, items, jobs, replay, read_ahead=None):
+        """Call worker(item) in a pool of processes, then replay(item, result).
+
+        The results are replayed in the order of the items.  With
+        read_ahead, the items may be any iterable: no more than read_ahead
+        of them are taken before their result is replayed.
+        """
+        import multiprocessing
+
+        if read_ahead is None:
+            jobs = min(jobs, len(items))
+            chunksize = max(1, min(16, len(items) // (jobs * 4)))
+        pool = multiprocessing.Pool(jobs, _init_worker,
+                                    (self, self.options.report.deadline))
+        try:
+            if read_ahead is None:
+                results = zip(items, pool.imap(worker, items, chunksize))
+            else:
+                results = _apply_ahead(pool, worker, items, read_ahead)
+            for item, result in results:
+                replay(item, result)
+            pool.close()
+        except BaseException:
+            pool.terminate()
+            raise
+        finally:
+            pool.join()
+
+    def check_sources(self, sources, jobs=None):
+        """Run all checks on sources given as a mapping of names to text.
+
+        The text is a string, or bytes decoded as a file would be.  Nothing
+        is printed: return the list of Violation records, for the sources
+        in the order of the mapping.  With more than one job (by default,
+        options.jobs), the sources are checked in a pool of processes.
+        """
+        if jobs is None:
+            jobs = self.options.jobs
+        sources = list(sources.items())
+        report = ViolationReport(self.options)
+        report.start()
+        try:
+            if jobs > 1 and len(sources) > 1:
+                def replay(source, results):
+                    report.replay_file(source[0], results)
+                self.run_workers(_check_source_worker, sources, jobs, replay)
+            else:
+                for (name, text) in sources:
+                    self.checker_class(name, lines=source_lines(text),
+                                       options=self.options,
+                                       report=report).check_all()
+        except _StopChecks:
+            pass    # A limit of the run is reached
+        report.stop()
+        return report.violations
+
+    def input_archive(self, path):
+        """Check the Python files of a zip, wheel or tar archive.
+
+        The members are read from the archive, never extracted, and they
+        are reported as 'archive!member'.  With more than one job, they
+        are checked in a pool of processes while the next ones are read.
+        With --shard, only the members of the shard are read.
+        """
+        import tarfile
+        import zipfile
+        import zlib
+        filepatterns = self.options.filename
+        exclude = self.options.exclude
+        jobs = self.options.jobs
+        shard = self.options.shard
+        errors = []
+
+        def match(name):
+            parts = name.split('/')
+            dirnames = [part for part in parts[:-1] if part not in ('', '.')]
+            return (filename_match(parts[-1], filepatterns) and
+                    not any(filename_match(part, exclude, False)
+                            for part in dirnames) and
+                    not self.excluded(path + '!' + name) and
+                    (not shard or self.in_shard(path + '!' + name)))
+
+        def members():
+            try:
+                for (name, data) in read_archive(path, match):
+                    yield path + '!' + name, data
+            except (IOError, OSError, EOFError, zlib.error,
+                    zipfile.BadZipfile, tarfile.TarError):
+                errors.append(sys.exc_info()[:2])
+
+        def replay(member, results):
+            self.replay_results(member[0], results)
+
+        if self.options.verbose:
+            print('archive ' + path)
+        if jobs > 1:
+            self.run_workers(_check_member_worker, members(), jobs, replay,
+                             read_ahead=jobs * ARCHIVE_READ_AHEAD)
+        else:
+            for (name, data) in members():
+                self.input_file(name, lines=decode_lines(data))
+        if errors and (not shard or self.in_shard(path)):
+            # Reported like a file which cannot be read, after its members
+            (exc_type, exc) = errors[0]
+            fchecker = self.checker_class(path, lines=[],
+                                          options=self.options)
+            fchecker._io_error = '%s: %s' % (exc_type.__name__, exc)
+            fchecker.check_all()
+
+    def input_files_remote(self, filenames):
+        """Replay the results served by a pep8 daemon for the files.
+
+        The files are checked here if the daemon is not running or if
+        it does not use the same options.
+        """
+        codec = ResultCache(None, self.options)
+        request = {'fingerprint': codec.fingerprint,
+                   'files': [os.path.abspath(name) for name in filenames]}
+        try:
+            results = [(logical_lines, codec.decode(errors)) for
+                       (logical_lines, errors) in
+                       request_daemon(self.options.connect, request)]
+        except (IOError, OSError, ValueError, KeyError, TypeError):
+            if self.options.verbose:
+                print('daemon not available: %s' % sys.exc_info()[1])
+            for filename in filenames:
+                self.input_file(filename)
+            return
+        for filename, (logical_lines, errors) in zip(filenames, results):
+            if self.options.verbose:
+                print('checking %s' % filename)
+            try:
+                lines = readlines(filename)
+            except IOError:
+                lines = []
+            if lines and lines[0][:1] == '\ufeff':
+                lines[0] = lines[0][1:]     # As done by the Checker
+            self.options.report.replay_file(
+                filename, (lines, (), 0, logical_lines, errors))
+
+    def list_files(self, paths=None):
+        """Return the files which check_files() would check."""
+        filenames = []
+        runner, self.runner = self.runner, filenames.append
+        try:
+            for path in (self.paths if paths is None else paths):
+                if os.path.isdir(path):
+                    self.input_dir(path)
+                elif not self.excluded(path):
+                    filenames.append(path)
+        finally:
+            self.runner = runner
+        return filenames
+
     def input_dir(self, dirname):
         """Check all files in this directory and all subdirectories."""
         dirname = dirname.rstrip('/')
         if self.excluded(dirname):
             return 0
-        counters = self.options.report.counters
+        report = self.options.report
+        counters = report.counters
         verbose = self.options.verbose
-        filepatterns = self.options.filename
         runner = self.runner
-        for root, dirs, files in os.walk(dirname):
+        walker = self.walk(dirname)
+        while True:
+            start = time.time()
+            try:
+                (root, files) = next(walker)
+            except StopIteration:
+                break
+            finally:
+                report.walk_elapsed += time.time() - start
             if verbose:
                 print('directory ' + root)
             counters['directories'] += 1
-            for subdir in sorted(dirs):
-                if self.excluded(subdir, root):
-                    dirs.remove(subdir)
-            for filename in sorted(files):
-                # contain a pattern that matches?
-                if ((filename_match(filename, filepatterns) and
-                     not self.excluded(filename, root))):
-                    runner(os.path.join(root, filename))
+            for filename in files:
+                runner(os.path.join(root, filename))
+
+    def walk(self, dirname):
+        """Generate (root, filenames) for dirname and its subdirectories.
+
+        The directories come in the order of os.walk(), without the
+        excluded ones, and the filenames to check are sorted.  The
+        subdirectories are listed ahead of time by a pool of threads.
+        """
+        exclude = self.options.exclude
+        exclude = exclude and compile_patterns(exclude)
+        filepatterns = self.options.filename
+        filepatterns = filepatterns and compile_patterns(filepatterns)
+        normcase = os.path.normcase
+        tracked = self.options.gitignore and git_files(dirname)
+        try:
+            from concurrent.futures import ThreadPoolExecutor
+            pool = ThreadPoolExecutor(WALK_THREADS)
+        except ImportError:     # Python 2: list each directory when needed
+            pool = None
+        stack = [(dirname, pool.submit(_scandir, dirname) if pool else None)]
+        try:
+            while stack:
+                (root, listing) = stack.pop()
+                entries = listing.result() if pool else _scandir(root)
+                if entries is None:
+                    continue
+                absroot = os.path.abspath(root)
+                files = []
+                subdirs = []
+                for (name, is_dir, is_symlink) in entries:
+                    path = os.path.join(absroot, name)
+                    if exclude and (exclude(normcase(name)) or
+                                    exclude(normcase(path))):
+                        continue
+                    if is_dir:
+                        # Like os.walk(), do not follow the symbolic links
+                        if not (is_symlink or
+                                tracked and path not in tracked[1]):
+                            subdirs.append(os.path.join(root, name))
+                    elif not (filepatterns and
+                              not filepatterns(normcase(name)) or
+                              tracked and path not in tracked[0]):
+                        files.append(name)
+                for subdir in reversed(subdirs):
+                    stack.append((subdir, pool.submit(_scandir, subdir)
+                                  if pool else None))
+                yield root, sorted(files)
+        finally:
+            if pool is not None:
+                for (root, listing) in stack:
+                    listing.cancel()
+                pool.shutdown(wait=False)
 
     def excluded(self, filename, parent=None):
         """Check if the file should be excluded.
@@ -1903,13 +4084,679 @@ class StyleGuide(object):
         return sorted(checks)
 
 
+_worker_styleguide = None
+
+
+def _init_worker(styleguide, deadline):
+    """Set up a worker process of StyleGuide.input_files_parallel."""
+    global _worker_styleguide
+    import signal
+    # Let the parent process handle KeyboardInterrupt
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    # The report of the worker only counts what it sends to the parent,
+    # and it stops the checks at the deadline of the run
+    styleguide.init_report(BaseReport).deadline = deadline
+    if styleguide.options.profiler:
+        # Likewise, the plans of the worker are timed by its own profiler
+        styleguide.options.profiler = CheckProfiler()
+        styleguide.init_plans()
+    # The style guides of --per-dir-config share them
+    for local in styleguide._styleguides.values():
+        styleguide.share_report(local)
+    _worker_styleguide = styleguide
+
+
+def _pop_worker_stats():
+    """Return and reset the profile and the memo counters of the worker."""
+    profiler = _worker_styleguide.options.profiler
+    counters = _worker_styleguide.options.report.counters
+    memo = dict((key, counters.pop(key)) for key in MEMO_KEYS
+                if key in counters)
+    return profiler and profiler.pop_stats(), memo
+
+
+def _check_file_worker(filename):
+    """Check a file in a worker process and return the raw results."""
+    (cached, file_results) = _worker_styleguide.record_file(filename)
+    if isinstance(file_results[0], MappedLines):
+        # The memory map of a large file cannot be sent to the parent
+        file_results = (list(file_results[0]),) + file_results[1:]
+    return cached, file_results, _pop_worker_stats()
+
+
+def _check_configured_worker(filename):
+    """Check a file with its local configuration in a worker process."""
+    styleguide = _worker_styleguide.local_styleguide(
+        os.path.dirname(os.path.abspath(filename)))
+    (cached, file_results) = styleguide.record_file(filename)
+    if isinstance(file_results[0], MappedLines):
+        file_results = (list(file_results[0]),) + file_results[1:]
+    return cached, file_results, _pop_worker_stats()
+
+
+def _check_member_worker(member):
+    """Check a member read from an archive in a worker process."""
+    (name, data) = member
+    (cached, file_results) = _worker_styleguide.record_file(
+        name, lines=decode_lines(data))
+    return cached, file_results, _pop_worker_stats()
+
+
+def _apply_ahead(pool, worker, items, count):
+    """Generate (item, worker(item)), with count items pending in the pool."""
+    pending = deque()
+    for item in items:
+        pending.append((item, pool.apply_async(worker, (item,))))
+        if len(pending) >= count:
+            (item, result) = pending.popleft()
+            yield item, result.get()
+    while pending:
+        (item, result) = pending.popleft()
+        yield item, result.get()
+
+
+def _check_source_worker(source):
+    """Check a named source in a worker process and return the raw results."""
+    (name, text) = source
+    options = _worker_styleguide.options
+    checker = _worker_styleguide.checker_class(
+        name, lines=source_lines(text), options=options,
+        report=RecordingReport(options))
+    return checker.check_all()
+
+
+def source_lines(text):
+    """Split the text of a source, a string or bytes, in lines."""
+    if isinstance(text, bytes):
+        return decode_lines(text)
+    return _split_lines(text)
+
+
+def _stat_key(filename):
+    """Return what tells if a file changed since it was checked."""
+    stat = os.stat(filename)
+    return (stat.st_mtime, stat.st_size, stat.st_ino)
+
+
+class FileWatcher(object):
+    """Watch the files which a StyleGuide checks below some paths.
+
+    Use inotify where the C library provides it, otherwise compare
+    the modification times of the files every few seconds.
+    """
+    # IN_MODIFY | IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO |
+    # IN_CREATE | IN_DELETE
+    inotify_mask = 0x002 | 0x008 | 0x040 | 0x080 | 0x100 | 0x200
+    in_isdir = 0x40000000
+
+    def __init__(self, styleguide, paths, interval=2.0):
+        self.styleguide = styleguide
+        self.paths = [os.path.abspath(path) for path in paths]
+        self.interval = interval
+        self._stats = {}
+        self._watches = {}
+        self._libc = self._inotify = None
+        if sys.platform.startswith('linux'):
+            try:
+                import ctypes
+                import ctypes.util
+                self._libc = ctypes.CDLL(ctypes.util.find_library('c'),
+                                         use_errno=True)
+                self._inotify = self._libc.inotify_init()
+            except (OSError, AttributeError, TypeError):
+                self._inotify = None
+            if self._inotify is not None and self._inotify < 0:
+                self._inotify = None
+        if self._inotify is not None:
+            for path in self.paths:
+                self._watch(path)
+
+    def _watch(self, path):
+        """Watch this directory and its subdirectories."""
+        if not os.path.isdir(path):
+            # Watch the directory of the file, but not the subdirectories
+            self._add_watch(os.path.dirname(path), recursive=False)
+            return
+        for root, dirs, files in os.walk(path):
+            dirs[:] = [subdir for subdir in sorted(dirs)
+                       if not self.styleguide.excluded(subdir, root)]
+            self._add_watch(root)
+
+    def _add_watch(self, dirname, recursive=True):
+        encoded = dirname
+        if not isinstance(encoded, bytes):
+            encoded = dirname.encode(sys.getfilesystemencoding())
+        wd = self._libc.inotify_add_watch(self._inotify, encoded,
+                                          self.inotify_mask)
+        if wd >= 0:
+            if wd in self._watches:
+                recursive = recursive or self._watches[wd][1]
+            self._watches[wd] = (dirname, recursive)
+
+    def update(self, filenames):
+        """Return the (changed, removed) files among these files."""
+        changed = []
+        removed = []
+        for filename in filenames:
+            try:
+                key = _stat_key(filename)
+            except OSError:
+                if self._stats.pop(filename, None) is not None:
+                    removed.append(filename)
+                continue
+            if self._stats.get(filename) != key:
+                self._stats[filename] = key
+                changed.append(filename)
+        return changed, removed
+
+    def poll(self):
+        """Compare all the files with their state at the previous call."""
+        filenames = self.styleguide.list_files(self.paths)
+        known = set(filenames)
+        return self.update(filenames + [filename for filename in self._stats
+                                        if filename not in known])
+
+    def wait(self):
+        """Wait for some files to change, return (changed, removed)."""
+        if self._inotify is None:
+            time.sleep(self.interval)
+            return self.poll()
+        import select
+        import struct
+        if not select.select([self._inotify], [], [], self.interval)[0]:
+            return [], []
+        time.sleep(0.05)    # An editor rarely writes a file in one go
+        data = os.read(self._inotify, 1 << 16)
+        encoding = sys.getfilesystemencoding()
+        filenames = set()
+        pos = 0
+        while pos < len(data):
+            (wd, mask, cookie, length) = struct.unpack_from('iIII', data, pos)
+            name = data[pos + 16:pos + 16 + length].rstrip(b'\0')
+            pos += 16 + length
+            if wd not in self._watches or not name:
+                continue
+            (parent, recursive) = self._watches[wd]
+            if not isinstance(parent, bytes):
+                name = name.decode(encoding)
+            path = os.path.join(parent, name)
+            if not (recursive or path in self.paths):
+                continue
+            if not (mask & self.in_isdir):
+                if (filename_match(name, self.styleguide.options.filename) and
+                        not self.styleguide.excluded(name, parent)):
+                    filenames.add(path)
+            elif os.path.isdir(path):
+                if not self.styleguide.excluded(name, parent):
+                    self._watch(path)
+                    filenames.update(self.styleguide.list_files([path]))
+            else:
+                prefix = os.path.join(path, '')
+                filenames.update(filename for filename in self._stats
+                                 if filename.startswith(prefix))
+        return self.update(sorted(filenames))
+
+
+class CheckDaemon(object):
+    """Keep the results for the files of a StyleGuide warm.
+
+    The files are checked again as soon as they change, and the results
+    are served to the clients on a Unix socket, see request_daemon().
+    """
+
+    def __init__(self, styleguide, socket_path):
+        import threading
+        self.styleguide = styleguide
+        self.socket_path = socket_path
+        self.codec = ResultCache(None, styleguide.options)
+        self.results = {}
+        self._lock = threading.Lock()
+        self.watcher = FileWatcher(styleguide, styleguide.paths)
+
+    def get_results(self, filename):
+        """Return the (logical_lines, errors) for a file."""
+        try:
+            key = _stat_key(filename)
+        except OSError:
+            key = None  # The checker reports the error
+        entry = self.results.get(filename)
+        if key is None or entry is None or entry[0] != key:
+            with self._lock:
+                if self.styleguide.options.verbose:
+                    print('checking %s' % filename)
+                # The limits of the clients apply when they replay
+                (__, file_results) = self.styleguide.record_file(
+                    filename, limits=False)
+            entry = (key, file_results[3], self.codec.encode(file_results[4]))
+            self.results[filename] = entry
+        return entry[1:]
+
+    def refresh(self, changed, removed):
+        """Check the files which changed, forget the removed files."""
+        for filename in removed:
+            self.results.pop(filename, None)
+        for filename in changed:
+            self.get_results(filename)
+
+    def handle(self, request):
+        """Return the response to a request of a client."""
+        if request.get('fingerprint') != self.codec.fingerprint:
+            return {'error': 'the daemon uses other options'}
+        return {'results': [self.get_results(filename)
+                            for filename in request['files']]}
+
+    def serve_forever(self):
+        """Serve the results until interrupted."""
+        try:
+            import socketserver
+        except ImportError:     # Python 2
+            import SocketServer as socketserver
+        import signal
+        import socket
+        import threading
+        daemon = self
+
+        class RequestHandler(socketserver.StreamRequestHandler):
+            def handle(self):
+                try:
+                    request = json.loads(self.rfile.readline().decode('utf-8'))
+                    response = daemon.handle(request)
+                except (ValueError, KeyError, TypeError):
+                    response = {'error': str(sys.exc_info()[1])}
+                self.wfile.write(json.dumps(response).encode('utf-8'))
+
+        if os.path.exists(self.socket_path):
+            client = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            try:
+                client.connect(self.socket_path)
+            except socket.error:
+                os.remove(self.socket_path)     # Left by a dead daemon
+            else:
+                raise IOError('a daemon already listens on %s' %
+                              self.socket_path)
+            finally:
+                client.close()
+        server = socketserver.ThreadingUnixStreamServer(self.socket_path,
+                                                        RequestHandler)
+        server.daemon_threads = True
+        thread = threading.Thread(target=server.serve_forever)
+        thread.daemon = True
+        thread.start()
+        # Remove the socket when terminated
+        signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(0))
+        try:
+            self.refresh(*self.watcher.poll())
+            while True:
+                self.refresh(*self.watcher.wait())
+        except KeyboardInterrupt:
+            pass
+        finally:
+            server.shutdown()
+            server.server_close()
+            os.remove(self.socket_path)
+
+
+def request_daemon(socket_path, request):
+    """Send a request to the daemon listening on socket_path.
+
+    Return the list of (logical_lines, errors) for request['files'], with
+    the names of the checks in the errors.
+    """
+    import socket
+    client = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        client.connect(socket_path)
+        client.sendall(json.dumps(request).encode('utf-8') + b'\n')
+        client.shutdown(socket.SHUT_WR)
+        chunks = []
+        while True:
+            chunk = client.recv(1 << 16)
+            if not chunk:
+                break
+            chunks.append(chunk)
+    finally:
+        client.close()
+    response = json.loads(b''.join(chunks).decode('utf-8'))
+    if 'error' in response:
+        raise ValueError(response['error'])
+    return response['results']
+
+
+class _Resync(Exception):
+    """Raised by IncrementalChecker when the previous results apply."""
+
+
+class IncrementalChecker(Checker):
+    """Checker which resumes at a top-level statement of a previous run.
+
+    The state of the checker at the start of each top-level statement is
+    saved in `boundaries`, a list of (row, state).  check_from() starts
+    at one of these boundaries, and stops at the first boundary after
+    the edited rows where the state is the same as in the previous run:
+    the rest of the results of the previous run are still valid.
+
+    After an error token, the tokenizer may not tokenize the rest of the
+    file as it would from a boundary: `error_token` is set.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super(IncrementalChecker, self).__init__(*args, **kwargs)
+        self.boundaries = []
+        self.error_token = False
+        self._snapshots = {}
+        self._start = self._resync = None
+
+    def get_state(self):
+        """Return the state which the checks read from the checker."""
+        return (self.indent_char, self.blank_lines, self.blank_before,
+                self.previous_logical, self.previous_indent_level,
+                dict((name, dict(state))
+                     for name, state in self._checker_states.items()))
+
+    def set_state(self, state):
+        """Restore a state returned by get_state()."""
+        (self.indent_char, self.blank_lines, self.blank_before,
+         self.previous_logical, self.previous_indent_level,
+         checker_states) = state
+        self._checker_states = dict((name, dict(value))
+                                    for name, value in checker_states.items())
+
+    def check_from(self, boundary=None, resync=None):
+        """Run the checks from a boundary (row, state) of a previous run.
+
+        The resync argument is (last_row, states, delta): the last edited
+        row, the states of the previous run by row and the count of rows
+        added by the edit.  Return the row where the checks stopped
+        because the results of the previous run apply again, or None.
+        """
+        self._start = boundary
+        self._resync = resync
+        try:
+            self.check_all()
+        except _Resync:
+            return sys.exc_info()[1].args[0]
+
+    def init_regions(self):
+        super(IncrementalChecker, self).init_regions()
+        if self._start and self._start[0] > 1:
+            self.line_number = self._start[0] - 1
+            self._row_jumps.append((1, self.line_number))
+
+    def readline(self):
+        if self._start:
+            # Called first from check_all(), after the state is reset
+            self.set_state(self._start[1])
+            self._start = None
+        if not self.tokens:
+            # This row may start a top-level statement
+            self._snapshots[self.line_number + 1] = self.get_state()
+        return super(IncrementalChecker, self).readline()
+
+    def check_logical(self):
+        if not self.error_token:
+            self.error_token = any(token[0] == tokenize.ERRORTOKEN
+                                   for token in self.tokens)
+        for token in self.tokens:
+            if token[0] not in SKIP_COMMENTS:
+                (row, col) = token[2]
+                if col == 0 and row in self._snapshots:
+                    state = self._snapshots[row]
+                    if self._resync and row > self._resync[0]:
+                        (__, states, delta) = self._resync
+                        if states.get(row - delta) == state:
+                            raise _Resync(row)
+                    self.boundaries.append((row, state))
+                break
+        self._snapshots.clear()
+        return super(IncrementalChecker, self).check_logical()
+
+
+def _split_lines(text):
+    """Split the text of an editor in lines, with Unix newlines."""
+    lines = text.replace('\r\n', '\n').replace('\r', '\n').split('\n')
+    last = lines.pop()
+    lines = [line + '\n' for line in lines]
+    if last:
+        lines.append(last)
+    return lines
+
+
+def _utf16_index(line, character):
+    """Convert an offset in UTF-16 code units to an index in the line."""
+    index = 0
+    for char in line:
+        character -= 2 if ord(char) > 0xffff else 1
+        if character < 0:
+            break
+        index += 1
+    return index
+
+
+def _utf16_position(lines, position):
+    """Return the (row, index) of a position of the editor in the lines.
+
+    Like the protocol says, a position after the end of its line, or of
+    the text, is moved back to that end.
+    """
+    row = position['line']
+    if row >= len(lines):
+        if not lines or lines[-1].endswith('\n'):
+            return len(lines), 0
+        row = len(lines) - 1
+        return row, len(lines[row])
+    return row, _utf16_index(lines[row].rstrip('\n'), position['character'])
+
+
+class LanguageServer(object):
+    """Publish the diagnostics of the documents open in an editor.
+
+    A Language Server Protocol server on the standard input and output.
+    After an edit, only the top-level statements around the edited rows
+    are checked again, with IncrementalChecker.
+    """
+
+    def __init__(self, styleguide, stdin=None, stdout=None):
+        self.options = styleguide.options
+        self.stdin = stdin or getattr(sys.stdin, 'buffer', sys.stdin)
+        self.stdout = stdout or getattr(sys.stdout, 'buffer', sys.stdout)
+        self.documents = {}
+        self._shutdown = False
+
+    def read_message(self):
+        """Read a JSON-RPC message, or return None at the end of input."""
+        length = None
+        while True:
+            header = self.stdin.readline()
+            if not header:
+                return None
+            header = header.strip()
+            if not header:
+                break
+            (name, __, value) = header.decode('ascii').partition(':')
+            if name.lower() == 'content-length':
+                length = int(value)
+        return json.loads(self.stdin.read(length).decode('utf-8'))
+
+    def send_message(self, message):
+        """Write a JSON-RPC message."""
+        message['jsonrpc'] = '2.0'
+        body = json.dumps(message).encode('utf-8')
+        self.stdout.write(b'Content-Length: ' +
+                          str(len(body)).encode('ascii') + b'\r\n\r\n')
+        self.stdout.write(body)
+        self.stdout.flush()
+
+    # The handler of each method, None for the notifications to ignore
+    methods = {
+        'initialize': 'initialize',
+        'initialized': None,
+        'shutdown': 'shutdown',
+        'textDocument/didOpen': 'did_open',
+        'textDocument/didChange': 'did_change',
+        'textDocument/didClose': 'did_close',
+        'textDocument/didSave': None,
+    }
+
+    def run(self):
+        """Serve the editor until it exits; return the exit code."""
+        while True:
+            message = self.read_message()
+            if message is None or message.get('method') == 'exit':
+                return 0 if self._shutdown else 1
+            method = message.get('method')
+            if method not in self.methods:
+                response = {'error': {'code': -32601,
+                                      'message': 'method not found: %s' %
+                                                 method}}
+            else:
+                try:
+                    response = {'result': self.handle(
+                        method, message.get('params') or {})}
+                except Exception:
+                    # Keep the server running for the other documents
+                    response = {'error': {'code': -32603,
+                                          'message': str(sys.exc_info()[1])}}
+            if 'id' in message:
+                response['id'] = message['id']
+                self.send_message(response)
+
+    def handle(self, method, params):
+        """Handle a request or a notification, return the result."""
+        handler = self.methods[method]
+        if handler is not None:
+            return getattr(self, handler)(params)
+
+    def initialize(self, params):
+        """Return the capabilities of the server."""
+        return {'capabilities': {'textDocumentSync': {
+                    'openClose': True, 'change': 2}},
+                'serverInfo': {'name': 'pep8', 'version': __version__}}
+
+    def shutdown(self, params):
+        """Let the next exit notification return 0."""
+        self._shutdown = True
+
+    def did_open(self, params):
+        """Check a document opened in the editor."""
+        document = params['textDocument']
+        self.update(document['uri'], _split_lines(document['text']))
+
+    def did_change(self, params):
+        """Apply the changes of the editor and check the document."""
+        uri = params['textDocument']['uri']
+        lines = list(self.documents[uri]['lines'])
+        for change in params['contentChanges']:
+            lines = self.apply_change(lines, change)
+        self.update(uri, lines)
+
+    def did_close(self, params):
+        """Forget a document and clear its diagnostics."""
+        uri = params['textDocument']['uri']
+        self.documents.pop(uri, None)
+        self.send_message({'method': 'textDocument/publishDiagnostics',
+                           'params': {'uri': uri, 'diagnostics': []}})
+
+    def apply_change(self, lines, change):
+        """Return the lines with a change of the editor applied."""
+        if 'range' not in change:
+            return _split_lines(change['text'])
+        (first, start) = _utf16_position(lines, change['range']['start'])
+        (last, end) = _utf16_position(lines, change['range']['end'])
+        prefix = lines[first][:start] if first < len(lines) else ''
+        suffix = lines[last][end:] if last < len(lines) else ''
+        lines[first:last + 1] = _split_lines(prefix + change['text'] + suffix)
+        return lines
+
+    def check(self, filename, lines, document=None):
+        """Check the lines, again from the edit if there is a document.
+
+        Return the (errors, boundaries) of the new lines.
+        """
+        checker = IncrementalChecker(filename, lines=list(lines),
+                                     options=self.options,
+                                     report=RecordingReport(self.options))
+        if document is None or self.options.ast_checks:
+            checker.check_from()
+            if checker.error_token:
+                return checker.report._errors, []
+            return checker.report._errors, checker.boundaries
+        old_lines = document['lines']
+        # The rows before the first edited row are the same
+        size = min(len(lines), len(old_lines))
+        first = 0
+        while first < size and lines[first] == old_lines[first]:
+            first += 1
+        same = 0
+        while (same < size - first and
+               lines[-1 - same] == old_lines[-1 - same]):
+            same += 1
+        delta = len(lines) - len(old_lines)
+        starts = [row for (row, state) in document['boundaries']
+                  if row <= first]
+        start = document['boundaries'][len(starts) - 1] if starts else None
+        start_row = start[0] if start else 1
+        states = dict(document['boundaries'])
+        stop_row = checker.check_from(
+            start, (len(lines) - same, states, delta))
+        errors = checker.report._errors
+        if checker.error_token or any(text[:2] == 'E9'
+                                      for (__, __, text, __) in errors):
+            # The rows of the tokenizer errors are not relative to start
+            return self.check(filename, lines)
+        errors = [error for error in document['errors']
+                  if error[0] < start_row] + errors
+        boundaries = [boundary for boundary in document['boundaries']
+                      if boundary[0] < start_row] + checker.boundaries
+        if stop_row is not None:
+            errors = [error for error in errors if error[0] < stop_row]
+            errors.extend((row + delta, offset, text, check)
+                          for (row, offset, text, check) in document['errors']
+                          if row >= stop_row - delta)
+            boundaries.extend((row + delta, state)
+                              for (row, state) in document['boundaries']
+                              if row >= stop_row - delta)
+        return errors, boundaries
+
+    def update(self, uri, lines):
+        """Check a document again and publish its diagnostics."""
+        try:
+            from urllib.parse import unquote
+        except ImportError:     # Python 2
+            from urllib import unquote
+        filename = unquote(uri[7:]) if uri.startswith('file://') else uri
+        document = self.documents.get(uri)
+        if document and any(text[:2] == 'E9'
+                            for (__, __, text, __) in document['errors']):
+            document = None     # Check the whole file after an E9 error
+        (errors, boundaries) = self.check(filename, lines, document)
+        self.documents[uri] = {'lines': lines, 'errors': errors,
+                               'boundaries': boundaries}
+        diagnostics = []
+        for (row, offset, text, check) in sorted(errors):
+            code = text[:4]
+            if self.options.ignore_code(code):
+                continue
+            line = lines[row - 1] if 0 < row <= len(lines) else ''
+            character = len(line[:offset].encode('utf-16-le')) // 2
+            position = {'line': row - 1, 'character': character}
+            diagnostics.append({
+                'range': {'start': position,
+                          'end': dict(position, character=character + 1)},
+                'severity': 2 if code[:1] == 'W' else 1,
+                'code': code, 'source': 'pep8', 'message': text[5:]})
+        self.send_message({'method': 'textDocument/publishDiagnostics',
+                           'params': {'uri': uri,
+                                      'diagnostics': diagnostics}})
+
+
 def get_parser(prog='pep8', version=__version__):
     parser = OptionParser(prog=prog, version=version,
-                          usage="%prog [options] input ...")
+                          usage="%prog [options] input ...\n"
+                                "       %prog --merge [options] partial ...")
     parser.config_options = [
         'exclude', 'filename', 'select', 'ignore', 'max-line-length',
         'hang-closing', 'count', 'format', 'quiet', 'show-pep8',
-        'show-source', 'statistics', 'verbose']
+        'show-source', 'statistics', 'verbose', 'jobs', 'gitignore']
     parser.add_option('-v', '--verbose', default=0, action='count',
                       help="print status messages, or debug with -vv")
     parser.add_option('-q', '--quiet', default=0, action='count',
@@ -1925,6 +4772,13 @@ def get_parser(prog='pep8', version=__version__):
                       help="when parsing directories, only check filenames "
                            "matching these comma separated patterns "
                            "(default: %default)")
+    parser.add_option('--per-dir-config', action='store_true',
+                      help="read the project configuration nearest to each "
+                           "file, for repositories of several projects; "
+                           "the output options are those of the run")
+    parser.add_option('--gitignore', action='store_true',
+                      help="when parsing directories, skip the files "
+                           "ignored by git")
     parser.add_option('--select', metavar='errors', default='',
                       help="select errors and warnings (e.g. E,W6)")
     parser.add_option('--ignore', metavar='errors', default='',
@@ -1937,6 +4791,14 @@ def get_parser(prog='pep8', version=__version__):
                            "(implies --first)")
     parser.add_option('--statistics', action='store_true',
                       help="count errors and warnings")
+    parser.add_option('--max-errors-per-file', type='int', metavar='n',
+                      default=0,
+                      help="stop checking a file after n errors")
+    parser.add_option('--max-errors', type='int', metavar='n', default=0,
+                      help="stop the run after n errors")
+    parser.add_option('--time-budget', type='float', metavar='seconds',
+                      default=0,
+                      help="stop the run after this time")
     parser.add_option('--count', action='store_true',
                       help="print total number of errors and warnings "
                            "to standard error and set exit code to 1 if "
@@ -1949,10 +4811,43 @@ def get_parser(prog='pep8', version=__version__):
                       help="hang closing bracket instead of matching "
                            "indentation of opening bracket's line")
     parser.add_option('--format', metavar='format', default='default',
-                      help="set the error format [default|pylint|<custom>]")
+                      help="set the error format "
+                           "[default|pylint|json|sarif|<custom>]")
+    parser.add_option('--output-file', metavar='path',
+                      help="write the json or sarif document to this file, "
+                           "compressed with gzip if it ends in '.gz'")
+    parser.add_option('--git-rev', metavar='A..B',
+                      help="report only lines changed between the git "
+                           "revisions, checking the files of B from git")
     parser.add_option('--diff', action='store_true',
                       help="report only lines changed according to the "
                            "unified diff received on STDIN")
+    parser.add_option('--shard', metavar='i/N',
+                      help="check only the i-th of N shards of the files "
+                           "and write a partial report for pep8 --merge "
+                           "(the shard exits with 0, the merge with 1 if "
+                           "there are errors)")
+    parser.add_option('--merge', action='store_true',
+                      help="report the results of the partial reports of "
+                           "the shards given as arguments")
+    parser.add_option('--jobs', type='int', metavar='n', default=1,
+                      help="number of processes used to check the files "
+                           "(default: %default)")
+    parser.add_option('--cache-dir', metavar='path',
+                      help="store the results in this directory and skip "
+                           "the files which did not change")
+    parser.add_option('--memo', metavar='n', type='int', default=0,
+                      help="remember the results of the checks on the last "
+                           "n distinct logical lines, across the files")
+    parser.add_option('--serve', metavar='socket',
+                      help="keep checking the input files as they change "
+                           "and serve the results on this Unix socket")
+    parser.add_option('--lsp', action='store_true',
+                      help="run a language server on the standard input "
+                           "and output")
+    parser.add_option('--connect', metavar='socket',
+                      help="get the results from the daemon listening on "
+                           "this Unix socket")
     group = parser.add_option_group("Testing Options")
     if os.path.exists(TESTSUITE_PATH):
         group.add_option('--testsuite', metavar='dir',
@@ -1961,6 +4856,13 @@ def get_parser(prog='pep8', version=__version__):
                          help="run doctest on myself")
     group.add_option('--benchmark', action='store_true',
                      help="measure processing speed")
+    group.add_option('--import-time', action='store_true',
+                     help="measure the time to import pep8")
+    group.add_option('--profile', action='store_true',
+                     help="measure the time spent in each check")
+    group.add_option('--profile-json', metavar='path',
+                     help="write the time spent in each check to this "
+                          "JSON file")
     return parser
 
 
@@ -2060,30 +4962,77 @@ def process_options(arglist=None, parse_argv=False, config_file=None,
 
     if options.ensure_value('testsuite', False):
         args.append(options.testsuite)
-    elif not options.ensure_value('doctest', False):
+    elif not (options.ensure_value('doctest', False) or
+              options.ensure_value('import_time', False)):
         if parse_argv and not args:
-            if options.diff or any(os.path.exists(name)
-                                   for name in PROJECT_CONFIG):
+            if (options.diff or options.lsp or options.git_rev or
+                    any(os.path.exists(name) for name in PROJECT_CONFIG)):
                 args = ['.']
             else:
                 parser.error('input not specified')
-        options = read_config(options, args, arglist, parser)
+        # The partial reports of --merge are not the paths of the project
+        options = read_config(options, ['.'] if options.merge else args,
+                              arglist, parser)
         options.reporter = parse_argv and options.quiet == 1 and FileReport
+        if options.shard:
+            try:
+                options.shard = parse_shard(options.shard)
+            except ValueError:
+                parser.error(str(sys.exc_info()[1]))
+            if options.merge:
+                parser.error('--shard and --merge are separate runs')
 
-    options.filename = options.filename and options.filename.split(',')
-    options.exclude = normalize_paths(options.exclude)
-    options.select = options.select and options.select.split(',')
-    options.ignore = options.ignore and options.ignore.split(',')
+    split_options(options)
 
     if options.diff:
         options.reporter = DiffReport
         stdin = stdin_get_value()
         options.selected_lines = parse_udiff(stdin, options.filename, args[0])
         args = sorted(options.selected_lines)
+    elif options.git_rev:
+        import subprocess
+        options.reporter = DiffReport
+        try:
+            (options.selected_lines, options.git_objects) = git_diff_lines(
+                options.git_rev, args, options.filename)
+        except (OSError, subprocess.CalledProcessError):
+            parser.error('git diff failed for --git-rev=%s' %
+                         options.git_rev)
+        args = sorted(options.selected_lines)
 
     return options, args
 
 
+def split_options(options):
+    """Split the lists of the options read as comma-separated strings."""
+    options.filename = options.filename and options.filename.split(',')
+    options.exclude = normalize_paths(options.exclude)
+    options.select = options.select and options.select.split(',')
+    options.ignore = options.ignore and options.ignore.split(',')
+
+
+def print_import_time(repeat=10):
+    """Print the best time to import pep8 in a new interpreter."""
+    import subprocess
+    dirname, basename = os.path.split(os.path.abspath(__file__))
+    module = os.path.splitext(basename)[0]
+    env = dict(os.environ, PYTHONPATH=dirname)
+    timings = []
+    for statement in ('pass', 'import ' + module):
+        best = None
+        for __ in range(repeat):
+            start = time.time()
+            with open(os.devnull, 'w') as devnull:
+                subprocess.call([sys.executable, '-c', statement], env=env,
+                                stdout=devnull, stderr=devnull)
+            elapsed = time.time() - start
+            best = elapsed if best is None else min(best, elapsed)
+        timings.append(best * 1000)
+    print('%-7.2f %s' % (timings[0], 'ms to start Python'))
+    print('%-7.2f %s' % (timings[1] - timings[0],
+                         'ms to import %s (best of %d)' % (module, repeat)))
+
+
 def _main():
     """Parse options and run checks on Python source."""
     import signal
@@ -2096,15 +5045,32 @@ def _main():
 
     pep8style = StyleGuide(parse_argv=True)
     options = pep8style.options
+    if options.import_time:
+        print_import_time()
+        return
     if options.doctest or options.testsuite:
         from testsuite.support import run_tests
         report = run_tests(pep8style)
+    elif options.serve:
+        CheckDaemon(pep8style, options.serve).serve_forever()
+        return
+    elif options.lsp:
+        sys.exit(LanguageServer(pep8style).run())
+    elif options.merge:
+        try:
+            report = pep8style.merge_reports(pep8style.paths)
+        except ValueError:
+            sys.exit(str(sys.exc_info()[1]))
     else:
         report = pep8style.check_files()
     if options.statistics:
         report.print_statistics()
     if options.benchmark:
         report.print_benchmark()
+    if options.profile:
+        options.profiler.print_table()
+    if options.profile_json:
+        options.profiler.dump(options.profile_json)
     if options.testsuite and not options.quiet:
         report.print_results()
     if report.total_errors:
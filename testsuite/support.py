@@ -0,0 +1,243 @@
+"""Helpers of the pep8 test suite, and the runner of --doctest/--testsuite."""
+from __future__ import with_statement
+
+import contextlib
+import io
+import os
+import re
+import shutil
+import sys
+import tempfile
+import unittest
+
+import pep8
+
+SELFTEST_REGEX = re.compile(r'\b(Okay|[EW]\d{3}):\s(.*)')
+
+# A small project: each file has a few errors of a different kind
+SAMPLES = {
+    'clean.py': 'import os\n\n\ndef main():\n    return os.getcwd()\n',
+    'spacing.py': 'a=1\nb = [1,2 , 3]\nif a == None :\n    print( b)\n',
+    'blank_lines.py': 'import os\ndef f():\n    pass\nclass C:\n\n\n\n'
+                      '    x = 1\n',
+    'pkg/__init__.py': '',
+    'pkg/indent.py': 'def f(a,\n    b):\n  return (a +\n        b)\n',
+    'pkg/long_lines.py': 'x = "%s"  \nl = 1 # comment\n\n\n' % ('y' * 90),
+    'pkg/sub/noqa.py': 'import os, sys  # noqa\nx=1  # noqa\ny=2\n'
+                       's = """\n  \n"""  # noqa\n',
+    'pkg/sub/syntax.py': 'def f(:\n    pass\n',
+    'pkg/sub/coding.py': '# -*- coding: utf-8 -*-\ns = "\xe9"\nt=s\n',
+}
+# Enough files for several chunks of each worker of a pool
+for _index in range(24):
+    SAMPLES['gen/mod%02d.py' % _index] = (
+        'import os\n' + 'def f%d(x ,y):\n    return x+y\n' % _index +
+        _index % 3 * 'z = (1,\n    2)\n' + _index % 4 * 'w=0;\n')
+del _index
+
+
+def write_tree(root, sources=None):
+    """Write the sources, by relative path, under root and return root."""
+    for name, text in (SAMPLES if sources is None else sources).items():
+        path = os.path.join(root, *name.split('/'))
+        if not os.path.isdir(os.path.dirname(path)):
+            os.makedirs(os.path.dirname(path))
+        with io.open(path, 'w', encoding='utf-8') as f:
+            f.write(text)
+    return root
+
+
+def run_main(args, stdin=None):
+    """Run the pep8 command line, return (exit status, standard output)."""
+    saved = (sys.argv, sys.stdout, pep8.stdin_get_value)
+    sys.argv = ['pep8'] + list(args)
+    sys.stdout = io.StringIO() if str is not bytes else io.BytesIO()
+    if stdin is not None:
+        pep8.stdin_get_value = lambda: stdin
+    try:
+        try:
+            pep8._main()
+            status = 0
+        except SystemExit:
+            status = sys.exc_info()[1].code
+        return status, sys.stdout.getvalue()
+    finally:
+        (sys.argv, sys.stdout, pep8.stdin_get_value) = saved
+
+
+@contextlib.contextmanager
+def registered(check, codes=None, triggers=None):
+    """Register a check for the style guides created in the block."""
+    pep8.register_check(check, codes, triggers)
+    try:
+        yield check
+    finally:
+        for checks in pep8._checks.values():
+            checks.pop(check, None)
+        pep8._check_triggers.pop(check, None)
+
+
+@contextlib.contextmanager
+def spawn_pool():
+    """Start the pools of processes of the block with spawn.
+
+    It is the default of macOS and Windows: the workers are new
+    interpreters, which import the modules again and unpickle the style
+    guide.  The tempfile.py of the repository must not hide the one of
+    the standard library there.
+    """
+    import multiprocessing
+    from unittest import mock
+    repo = os.path.dirname(os.path.abspath(pep8.__file__))
+    path = [entry for entry in sys.path
+            if os.path.abspath(entry) != repo] + [repo]
+    spawn = multiprocessing.get_context('spawn')
+    with mock.patch.object(multiprocessing, 'Pool', spawn.Pool):
+        with mock.patch.object(sys, 'path', path):
+            yield
+
+
+class TreeTestCase(unittest.TestCase):
+    """Test case with the sample sources in a temporary directory."""
+
+    sources = None
+
+    def setUp(self):
+        self.root = write_tree(tempfile.mkdtemp(prefix='pep8-'),
+                               self.sources)
+        self.addCleanup(shutil.rmtree, self.root)
+        self.cwd = os.getcwd()
+        os.chdir(self.root)
+        self.addCleanup(os.chdir, self.cwd)
+
+    def assertSameAsSerial(self, args, serial_args=None):
+        """Check that pep8 with args gives the output of a serial run."""
+        result = run_main(args)
+        expected = run_main(args if serial_args is None else serial_args)
+        self.assertEqual(result, expected)
+        return result
+
+
+def generic_plan(plan):
+    """Return a plan which calls each check with Checker.run_check()."""
+    generic = []
+    for (name, check, __) in plan:
+        kind = 'physical_line' if check in pep8._checks['physical_line'] \
+            else 'logical_line'
+        argument_names = pep8._checks[kind][check][1]
+
+        def caller(checker, name=name, check=check,
+                   argument_names=argument_names):
+            checker.init_checker_state(name, argument_names)
+            return checker.run_check(check, argument_names)
+        generic.append((name, check, caller))
+    return generic
+
+
+class AllChecks(object):
+    """Trigger plan which selects all the checks for every line."""
+
+    def __init__(self, plan):
+        self.plan = plan
+
+    def select(self, text):
+        return self.plan
+
+
+class GenericChecker(pep8.Checker):
+    """Checker which runs every check on every line, the generic way.
+
+    The checks are called with run_check(), without the compiled plans,
+    the triggers of the logical checks and the rows found in advance for
+    the physical checks: the results must be the same as the Checker.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super(GenericChecker, self).__init__(*args, **kwargs)
+        physical = generic_plan(self._physical_checks)
+        logical = generic_plan(self._logical_checks)
+        self._physical_checks = self._physical_other_checks = physical
+        self._logical_checks = logical
+        self._logical_triggers = AllChecks(logical)
+        self._logical_memo = None
+        self._batch_physical = False
+        self._physical_state_checks = [
+            entry for entry in physical
+            if 'checker_state' in pep8._checks['physical_line'][entry[1]][1]]
+        self._logical_state_checks = [
+            entry for entry in logical
+            if 'checker_state' in pep8._checks['logical_line'][entry[1]][1]]
+
+
+def docstring_examples(options):
+    """Generate (name, code, source, lines) for the examples of the checks.
+
+    The examples are the lines like 'E225: i=i+1' of the docstrings.
+    """
+    for name, check, __ in options.physical_checks + options.logical_checks:
+        for line in (check.__doc__ or '').splitlines():
+            match = SELFTEST_REGEX.match(line.lstrip())
+            if match is not None:
+                (code, source) = match.groups()
+                lines = [part.replace(r'\t', '\t') + '\n'
+                         for part in source.split(r'\n')]
+                yield name, code, source, lines
+
+
+def selftest(options, checker_class=pep8.Checker):
+    """Run the examples of the docstrings of the checks.
+
+    Return (count_failed, count_all).
+    """
+    count_failed = count_all = 0
+    report = pep8.BaseReport(options)
+    counters = report.counters
+    for (name, code, source, lines) in docstring_examples(options):
+        checker = checker_class(lines=lines, options=options, report=report)
+        checker.check_all()
+        found = sorted(key for key in counters
+                       if key not in options.benchmark_keys)
+        error = None
+        if code == 'Okay':
+            if found:
+                error = 'incorrectly found %s' % ', '.join(found)
+        elif code not in found:
+            error = 'failed to find %s' % code
+        # Count the codes of each example on their own
+        for key in found:
+            del counters[key]
+        report.messages = {}
+        count_all += 1
+        if error:
+            count_failed += 1
+            print('%s: %s:' % (name, error))
+            for line in checker.lines:
+                print(line.rstrip())
+        elif options.verbose:
+            print('%s: %s' % (code, source))
+    return count_failed, count_all
+
+
+def run_tests(style):
+    """Run the tests for --doctest or --testsuite, and exit on failure."""
+    options = style.options
+    if options.doctest:
+        import doctest
+        (fail_d, done_d) = doctest.testmod(pep8, report=False,
+                                           verbose=options.verbose)
+        (fail_s, done_s) = selftest(options)
+        count_failed = fail_s + fail_d
+        if not options.quiet:
+            print('%d passed and %d failed.' %
+                  (done_d + done_s - count_failed, count_failed))
+            print('Test failed.' if count_failed else 'Test passed.')
+        if count_failed:
+            sys.exit(1)
+    if options.testsuite:
+        suite = unittest.defaultTestLoader.discover(
+            options.testsuite, top_level_dir=os.path.dirname(
+                os.path.abspath(options.testsuite)))
+        result = unittest.TextTestRunner(
+            verbosity=1 + options.verbose - options.quiet).run(suite)
+        sys.exit(not result.wasSuccessful())
+    return style.init_report()
@@ -0,0 +1,85 @@
+"""Tests of the Python files checked inside zip and tar archives."""
+import json
+import os
+import tarfile
+import zipfile
+
+from testsuite.support import SAMPLES, TreeTestCase, run_main
+
+ARCHIVES = ('proj.zip', 'proj.whl', 'proj.tar', 'proj.tar.gz')
+
+
+class ArchiveTestCase(TreeTestCase):
+
+    sources = dict(('proj/' + name, text) for name, text in SAMPLES.items())
+    sources.update({'first.py': 'a=1\n', 'last.py': 'import os, sys\n'})
+
+    def setUp(self):
+        super(ArchiveTestCase, self).setUp()
+        names = sorted(name for name in self.sources
+                       if name.startswith('proj/'))
+        for archive in ARCHIVES:
+            if archive.endswith(('.zip', '.whl')):
+                with zipfile.ZipFile(archive, 'w') as f:
+                    for name in names:
+                        f.write(name)
+            else:
+                mode = 'w:gz' if archive.endswith('.gz') else 'w'
+                with tarfile.open(archive, mode) as f:
+                    for name in names:
+                        f.add(name)
+        with open('bad.zip', 'wb') as f:
+            f.write(b'PK\x03\x04 not a zip file')
+
+    def test_same_as_directory(self):
+        for args in ([], ['--select=E2,W', '--max-line-length=100']):
+            (status, output) = run_main(args + ['proj'])
+            expected = (status, sorted(output.splitlines()))
+            self.assertEqual(status, 1)
+            for archive in ARCHIVES:
+                for jobs in ('1', '3'):
+                    (status, output) = run_main(
+                        ['--jobs', jobs] + args + [archive])
+                    self.assertEqual(
+                        (status, sorted(output.replace(archive + '!', '')
+                                        .splitlines())), expected)
+
+    def test_bad_archive(self):
+        (status, output) = self.assertSameAsSerial(
+            ['--jobs', '2', 'first.py', 'bad.zip', 'last.py'],
+            ['first.py', 'bad.zip', 'last.py'])
+        self.assertEqual(status, 1)
+        self.assertEqual([line.split(':')[0] for line in
+                          output.splitlines()],
+                         ['first.py', 'bad.zip', 'last.py'])
+        self.assertIn('bad.zip:1:1: E902 ', output)
+
+    def test_order_with_jobs(self):
+        args = ['first.py', 'proj.tar.gz', 'last.py', 'proj.zip', 'first.py']
+        for options in (['--jobs', '2'], ['--jobs', '2', '--per-dir-config'],
+                        ['--per-dir-config']):
+            (status, output) = self.assertSameAsSerial(options + args, args)
+            paths = [line.split(':')[0].split('!')[0]
+                     for line in output.splitlines()]
+            found = [path for index, path in enumerate(paths)
+                     if path != paths[index - 1] or not index]
+            self.assertEqual(found, args)
+
+    def test_shards(self):
+        args = ['first.py', 'proj.zip', 'proj', 'bad.zip', 'proj.tar',
+                'last.py']
+        partials = []
+        for shard in (1, 2, 3):
+            partials.append('shard%d.json' % shard)
+            self.assertEqual(run_main(['--shard', '%d/3' % shard,
+                                       '--output-file', partials[-1]] +
+                                      args), (0, ''))
+        files = []
+        for partial in partials:
+            with open(partial) as f:
+                files.extend(entry[1] for entry in json.load(f)['files'])
+        # Each file is checked by one shard
+        self.assertEqual(len(files), len(set(files)))
+        self.assertIn(os.path.join('proj', 'spacing.py'), files)
+        self.assertIn('proj.zip!proj/spacing.py', files)
+        self.assertEqual(run_main(['--merge'] + partials), run_main(args))
@@ -0,0 +1,92 @@
+"""Tests of the result cache of pep8 --cache-dir."""
+import os
+import shutil
+import tempfile
+import unittest
+from unittest import mock
+
+import pep8
+from testsuite.support import TreeTestCase, run_main
+
+
+class CacheTestCase(TreeTestCase):
+
+    def setUp(self):
+        super(CacheTestCase, self).setUp()
+        self.cache_dir = tempfile.mkdtemp(prefix='pep8-cache-')
+        self.addCleanup(shutil.rmtree, self.cache_dir)
+
+    def check(self, **options):
+        style = pep8.StyleGuide(paths=['.'], cache_dir=self.cache_dir,
+                                reporter=pep8.BaseReport, **options)
+        return style.check_files()
+
+    def test_same_output(self):
+        args = ['--cache-dir', self.cache_dir, '--show-source', '.']
+        expected = run_main(['--show-source', '.'])
+        self.assertEqual(run_main(args), expected)
+        # Now replayed from the cache
+        self.assertEqual(run_main(args), expected)
+        self.assertEqual(run_main(['--jobs', '2'] + args), expected)
+
+    def test_hits_and_misses(self):
+        files = self.check().counters['files']
+        counters = self.check().counters
+        self.assertEqual(counters.get('cache hits'), files)
+        self.assertNotIn('cache misses', counters)
+        with open('spacing.py', 'a') as f:
+            f.write('c=3\n')
+        counters = self.check().counters
+        self.assertEqual(counters['cache misses'], 1)
+        self.assertEqual(counters['cache hits'], files - 1)
+
+    def test_options_change_the_key(self):
+        self.check()
+        report = self.check(max_line_length=100)
+        self.assertNotIn('cache hits', report.counters)
+
+
+class PruneTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.cache_dir = tempfile.mkdtemp(prefix='pep8-cache-')
+        self.addCleanup(shutil.rmtree, self.cache_dir)
+        options = pep8.StyleGuide(cache_dir=self.cache_dir).options
+        self.cache = options.cache
+
+    def add_entries(self, count, start=0):
+        for index in range(start, start + count):
+            key = self.cache.get_key(['x = %d\n' % index])
+            self.cache.put(key, 1, [])
+            # The entries are used in this order
+            os.utime(self.cache._path(key), (index, index))
+
+    def count_entries(self):
+        return sum(len(files) for root, __, files in os.walk(self.cache_dir)
+                   if root != self.cache_dir)
+
+    def read_count(self):
+        with open(os.path.join(self.cache_dir, 'entries')) as f:
+            return int(f.read())
+
+    def test_prune_without_walk(self):
+        self.add_entries(8)
+        self.cache.prune(max_entries=10, added=8)
+        self.assertEqual(self.read_count(), 8)
+        self.add_entries(2, 8)
+        with mock.patch.object(pep8.os, 'walk') as walk:
+            self.cache.prune(max_entries=10, added=2)
+        self.assertFalse(walk.called)
+        self.assertEqual(self.read_count(), 10)
+        self.assertEqual(self.count_entries(), 10)
+
+    def test_prune_least_recently_used(self):
+        self.add_entries(10)
+        self.cache.prune(max_entries=10, added=10)
+        self.add_entries(3, 10)
+        self.cache.prune(max_entries=10, added=3)
+        self.assertEqual(self.count_entries(), 9)
+        self.assertEqual(self.read_count(), 9)
+        for index in range(13):
+            key = self.cache.get_key(['x = %d\n' % index])
+            self.assertEqual(self.cache.get(key) is None, index < 4)
@@ -0,0 +1,78 @@
+"""Tests of pep8 --per-dir-config in a repository of several projects."""
+import pep8
+from testsuite.support import SAMPLES, TreeTestCase, run_main, spawn_pool
+
+SOURCES = {}
+for _project in ('alpha', 'beta', 'beta/gamma', 'delta'):
+    for _name, _text in SAMPLES.items():
+        if not _name.startswith('gen/'):
+            SOURCES['%s/%s' % (_project, _name)] = _text
+del _project, _name, _text
+SOURCES.update({
+    'alpha/setup.cfg': '[pep8]\nmax-line-length = 100\nignore = E225\n',
+    'beta/tox.ini': '[pep8]\nselect = E2,W\nexclude = noqa.py\n',
+    'beta/gamma/.pep8': '[pep8]\nignore = W\n',
+    # Without configuration, delta is checked with the defaults
+})
+
+
+class PerDirConfigTestCase(TreeTestCase):
+
+    sources = SOURCES
+    projects = ['alpha', 'beta', 'beta/gamma', 'delta']
+
+    def separate_runs(self, args):
+        """Run pep8 on each project and return the joined results."""
+        (status, output) = (0, '')
+        for project in self.projects:
+            args_project = args + [project]
+            if project == 'beta':
+                args_project += ['--exclude=gamma,noqa.py']
+            (status_project, output_project) = run_main(args_project)
+            status = status or status_project
+            output += output_project
+        return status, output
+
+    def test_same_as_separate_runs(self):
+        paths = ['alpha', 'beta', 'delta']
+        files = pep8.StyleGuide().list_files(paths)
+        for args in ([], ['--jobs', '2']):
+            (status, output) = self.separate_runs(args)
+            # In the order of the files of a run without --per-dir-config
+            lines = output.splitlines(True)
+            expected = (status, ''.join(
+                line for filename in files for line in lines
+                if line.startswith(filename + ':')))
+            self.assertEqual(len(expected[1]), len(output))
+            self.assertEqual(run_main(args + ['--per-dir-config'] + paths),
+                             expected)
+        with spawn_pool():
+            self.assertEqual(run_main(args + ['--per-dir-config'] + paths),
+                             expected)
+        self.assertEqual(expected[0], 1)
+        self.assertIn('delta/pkg/long_lines.py:1:80: E501', expected[1])
+        self.assertNotIn('alpha/pkg/long_lines.py:1:80: E501', expected[1])
+        self.assertNotIn('alpha/spacing.py:1:2: E225', expected[1])
+
+    def test_report_filters(self):
+        # A report which filters the codes itself sees the local options
+        class NoWarnings(pep8.BaseReport):
+
+            def error(self, line_number, offset, text, check):
+                if not text.startswith('W'):
+                    return super(NoWarnings, self).error(
+                        line_number, offset, text, check)
+
+        style = pep8.StyleGuide(paths=['alpha', 'delta'],
+                                per_dir_config=True, reporter=NoWarnings)
+        counters = style.check_files().counters
+        self.assertEqual(counters['E225'], 4)   # alpha ignores E225
+        self.assertNotIn('W291', counters)
+
+    def test_output_options_of_the_run(self):
+        args = ['--per-dir-config', 'alpha', 'delta']
+        expected = run_main(args)
+        with open('delta/setup.cfg', 'w') as f:
+            f.write('[pep8]\nshow-source = 1\nformat = pylint\n')
+        self.assertEqual(run_main(args), expected)
+        self.assertIn('delta/spacing.py:1:2: E225', expected[1])
@@ -0,0 +1,71 @@
+"""Tests of the daemon of pep8 --serve and of its client, --connect."""
+import os
+import signal
+import subprocess
+import sys
+import time
+
+import pep8
+from testsuite.support import TreeTestCase, run_main
+
+# Append the directory of pep8: the tests may run from elsewhere
+SERVE = ('import sys; sys.path.append(%r); import pep8; '
+         'sys.argv = ["pep8"] + sys.argv[1:]; pep8._main()' %
+         os.path.dirname(os.path.abspath(pep8.__file__)))
+
+
+class DaemonTestCase(TreeTestCase):
+
+    def setUp(self):
+        super(DaemonTestCase, self).setUp()
+        self.socket_path = os.path.join(self.root, 'pep8.sock')
+        self.daemon = subprocess.Popen(
+            [sys.executable, '-c', SERVE, '--serve', self.socket_path, '.'],
+            stdout=subprocess.PIPE, stderr=subprocess.STDOUT)
+        self.addCleanup(self.stop)
+        deadline = time.time() + 30
+        while not os.path.exists(self.socket_path):
+            self.assertIsNone(self.daemon.poll())
+            self.assertTrue(time.time() < deadline, 'no daemon')
+            time.sleep(0.05)
+
+    def stop(self):
+        if self.daemon.returncode is None:
+            self.daemon.send_signal(signal.SIGTERM)
+            self.daemon.communicate()
+
+    def request(self, filenames):
+        options = pep8.StyleGuide().options
+        codec = pep8.ResultCache(None, options)
+        return pep8.request_daemon(self.socket_path, {
+            'fingerprint': codec.fingerprint,
+            'files': [os.path.abspath(name) for name in filenames]})
+
+    def test_same_output(self):
+        args = ['--show-source', '--statistics', '.']
+        self.assertSameAsSerial(['--connect', self.socket_path] + args, args)
+        (status, output) = run_main(['-v', '--connect', self.socket_path,
+                                     '.'])
+        self.assertNotIn('daemon not available', output)
+
+    def test_changed_file(self):
+        self.assertEqual(self.request(['clean.py']), [[3, []]])
+        with open('clean.py', 'a') as f:
+            f.write('x=1\n')
+        self.assertSameAsSerial(['--connect', self.socket_path, '.'], ['.'])
+        self.assertEqual(self.request(['clean.py']),
+                         [[4, [[6, 1, 'E225 missing whitespace around '
+                                'operator', 'missing_whitespace_around_'
+                                'operator']]]])
+
+    def test_other_options(self):
+        self.assertRaises(ValueError, pep8.request_daemon, self.socket_path,
+                          {'fingerprint': 'other', 'files': []})
+        # The client checks the files itself
+        args = ['--max-line-length=100', '.']
+        self.assertSameAsSerial(['--connect', self.socket_path] + args, args)
+
+    def test_stop(self):
+        self.stop()
+        self.assertEqual(self.daemon.returncode, 0)
+        self.assertFalse(os.path.exists(self.socket_path))
@@ -0,0 +1,119 @@
+"""Tests of pep8 --diff, which checks only the regions of the changes."""
+import pep8
+from testsuite.support import TreeTestCase, run_main
+
+# Top-level statements with errors in their bodies and between them
+MODULE = ''.join(
+    'def f%d(a, b):\n    x=a\n    return (x +\n        b)\n%s' %
+    (index, '\n' * (index % 4)) for index in range(30)) + 'y = f1( 1, 2)\n'
+# Imports after the first statements, each in its own region
+IMPORTS = ("#!/usr/bin/env python\n'''Docstring.'''\nimport os\n\n" +
+           MODULE.replace('def f3(', 'import re\n\n\ndef f3(')
+           .replace('def f20(', 'from os import path\ndef f20(') +
+           'import sys\n')
+
+
+def make_diff(changes):
+    """Return a unified diff which adds these rows of the files."""
+    diff = []
+    for path, rows in sorted(changes.items()):
+        with open(path) as f:
+            lines = f.readlines()
+        diff += ['--- a/%s\n' % path, '+++ b/%s\n' % path]
+        for row in sorted(rows):
+            diff += ['@@ -%d,0 +%d,1 @@\n' % (row, row),
+                     '+' + lines[row - 1]]
+    return ''.join(diff)
+
+
+class DiffTestCase(TreeTestCase):
+
+    sources = {
+        'module.py': MODULE,
+        'tabs.py': MODULE.replace('    x=a', '\tx=a'),
+        'spacing.py': 'a=1\nb = [1,2 , 3]\nif a == None :\n    print( b)\n',
+        'imports.py': IMPORTS,
+        'strings.py': IMPORTS.replace('import os\n',
+                                      "'Not a docstring.'\nimport os\n"),
+        # The state from the first line of the statements is not enough
+        'noqa.py': 'x = 1  # noqa\nimport os\nimport sys\nimport re\n',
+        'continued.py': 'from\\\n    os import path\nimport sys\nimport re\n',
+    }
+
+    def assertSameAsFiltered(self, changes, args=()):
+        (status, output) = run_main(list(args) + ['.'])
+        expected = [line for line in output.splitlines()
+                    if int(line.split(':')[1]) in
+                    changes.get(line.split(':')[0][2:], ())]
+        (status, output) = run_main(['--diff'] + list(args),
+                                    stdin=make_diff(changes))
+        self.assertEqual(output.splitlines(), expected)
+        self.assertEqual(status, 1 if expected else 0)
+        return expected
+
+    def test_changed_rows(self):
+        found = self.assertSameAsFiltered({
+            'module.py': set([2, 8, 19, 20, 21, 22, 61, 120, 121]),
+            'spacing.py': set([3])})
+        self.assertTrue(len(found) > 5)
+
+    def test_regions_at_the_ends(self):
+        rows = set([1, 2, len(MODULE.splitlines())])
+        self.assertSameAsFiltered({'module.py': rows})
+
+    def test_blank_lines_context(self):
+        # Separate regions, each with the blank lines before its row
+        rows = set(row for row, line in enumerate(MODULE.splitlines(), 1)
+                   if line.startswith(('def f5(', 'def f13(', 'def f21(')))
+        # Without E402, which keeps a state, only the regions are read
+        found = self.assertSameAsFiltered({'module.py': rows},
+                                          ['--select=E3'])
+        self.assertEqual([line.split(': ')[1][:4] for line in found],
+                         ['E302', 'E302', 'E302'])
+
+    def test_without_state(self):
+        self.assertSameAsFiltered({
+            'module.py': set([2, 8, 19, 61, 120, 121])},
+            ['--select=E1,E2,E3,W'])
+
+    def test_tabs(self):
+        self.assertSameAsFiltered({'tabs.py': set([2, 30, 40])})
+
+    def test_unchanged_rows(self):
+        self.assertSameAsFiltered({'module.py': set([5])})
+
+    def test_selected_rows(self):
+        options = pep8.StyleGuide(select=['E', 'W']).options
+        options.selected_lines = {'module.py': set([30])}
+        report = pep8.RecordingReport(options)
+        checker = pep8.Checker('module.py', lines=MODULE.splitlines(True),
+                               options=options, report=report)
+        self.assertEqual(checker.selected_rows, set([30]))
+        (__, __, __, logical_lines, errors) = checker.check_all()
+        # Only the region around the row is checked
+        self.assertTrue(logical_lines < 20)
+        self.assertIn(30, [error[0] for error in errors])
+
+    def test_import_state(self):
+        changes = {'noqa.py': set([4]), 'continued.py': set([4])}
+        for path in ('imports.py', 'strings.py'):
+            with open(path) as f:
+                changes[path] = set(
+                    row for row, line in enumerate(f, 1)
+                    if line.startswith(('import ', 'from ', 'def f1(')))
+        found = self.assertSameAsFiltered(changes)
+        self.assertEqual(len([line for line in found if ' E402 ' in line]),
+                         7)
+
+    def test_skip_with_import_state(self):
+        # By default, E402 keeps a state: it is found from the AST
+        options = pep8.StyleGuide().options
+        for (path, rows) in (('imports.py', [40]), ('imports.py', [3, 40]),
+                             ('module.py', [30])):
+            options.selected_lines = {path: set(rows)}
+            report = pep8.RecordingReport(options)
+            with open(path) as f:
+                checker = pep8.Checker(path, lines=f.readlines(),
+                                       options=options, report=report)
+            (__, __, __, logical_lines, __) = checker.check_all()
+            self.assertTrue(logical_lines < 20)
@@ -0,0 +1,88 @@
+"""Tests of the json and sarif documents of pep8 --format."""
+import gzip
+import json
+
+import pep8
+from testsuite.support import TreeTestCase, run_main
+
+ARGS = ['--show-source', '.']
+
+
+def text_errors(output):
+    """Return the (path, row, col, code, text) of the default format."""
+    errors = []
+    for line in output.splitlines():
+        parts = line.split(':', 3)
+        if len(parts) == 4 and parts[1].isdigit():
+            (code, text) = parts[3].strip().split(' ', 1)
+            errors.append((parts[0], int(parts[1]), int(parts[2]),
+                           code, text))
+    return errors
+
+
+def without_times(properties):
+    """Return the properties of a document without the elapsed times."""
+    return dict((key, value) for key, value in properties.items()
+                if not key.endswith('elapsed'))
+
+
+class DocumentTestCase(TreeTestCase):
+
+    def run_document(self, args):
+        (status, output) = run_main(args + ARGS)
+        return status, json.loads(output)
+
+    def test_json_matches_text(self):
+        (expected_status, expected) = run_main(ARGS)
+        (status, document) = self.run_document(['--format=json'])
+        self.assertEqual(status, expected_status)
+        self.assertTrue(len(document['errors']) > 20)
+        self.assertEqual([(error['path'], error['row'], error['col'],
+                           error['code'], error['text'])
+                          for error in document['errors']],
+                         text_errors(expected))
+        report = pep8.StyleGuide(paths=['.'],
+                                 reporter=pep8.BaseReport).check_files()
+        self.assertEqual(document['counters'], report.counters)
+        self.assertEqual(document['total_errors'], report.total_errors)
+
+    def test_sarif_matches_json(self):
+        (__, document) = self.run_document(['--format=json'])
+        (status, sarif) = self.run_document(['--format=sarif'])
+        self.assertEqual(status, 1)
+        run = sarif['runs'][0]
+        results = []
+        for result in run['results']:
+            location = result['locations'][0]['physicalLocation']
+            results.append((location['artifactLocation']['uri'],
+                            location['region']['startLine'],
+                            location['region']['startColumn'],
+                            result['ruleId'], result['message']['text']))
+        self.assertEqual(results, [(error['path'], error['row'], error['col'],
+                                    error['code'], error['text'])
+                                   for error in document['errors']])
+        document.pop('errors')
+        self.assertEqual(without_times(run['properties']),
+                         without_times(document))
+
+    def test_gzip_output_file(self):
+        (__, document) = self.run_document(['--format=json'])
+        (status, output) = run_main(['--format=json', '--output-file',
+                                     'report.json.gz'] + ARGS)
+        self.assertEqual((status, output), (1, ''))
+        with gzip.open('report.json.gz', 'rt') as f:
+            written = json.load(f)
+        self.assertEqual(without_times(written), without_times(document))
+
+    def test_parallel(self):
+        for format in ('json', 'sarif'):
+            (status, document) = self.run_document(['--format=' + format])
+            (status_jobs, parallel) = self.run_document(
+                ['--format=' + format, '--jobs', '2'])
+            self.assertEqual(status_jobs, status)
+            if format == 'sarif':
+                (document, parallel) = (document['runs'][0],
+                                        parallel['runs'][0])
+                document['properties'] = without_times(document['properties'])
+                parallel['properties'] = without_times(parallel['properties'])
+            self.assertEqual(without_times(parallel), without_times(document))
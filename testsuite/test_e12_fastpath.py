@@ -0,0 +1,346 @@
+"""Tests of continued_indentation() against its former implementation."""
+import random
+import unittest
+from unittest import mock
+
+import pep8
+from pep8 import NEWLINE, expand_indent, tokenize
+from testsuite.support import registered
+
+
+def continued_indentation_reference(logical_line, tokens, indent_level,
+                                    hang_closing, indent_char, noqa,
+                                    verbose):
+    """The former implementation of continued_indentation()."""
+    first_row = tokens[0][2][0]
+    nrows = 1 + tokens[-1][2][0] - first_row
+    if noqa or nrows == 1:
+        return
+
+    # indent_next tells us whether the next block is indented; assuming
+    # that it is indented by 4 spaces, then we should not allow 4-space
+    # indents on the final continuation line; in turn, some other
+    # indents are allowed to have an extra 4 spaces.
+    indent_next = logical_line.endswith(':')
+
+    row = depth = 0
+    valid_hangs = (4,) if indent_char != '\t' else (4, 8)
+    # remember how many brackets were opened on each line
+    parens = [0] * nrows
+    # relative indents of physical lines
+    rel_indent = [0] * nrows
+    # for each depth, collect a list of opening rows
+    open_rows = [[0]]
+    # for each depth, memorize the hanging indentation
+    hangs = [None]
+    # visual indents
+    indent_chances = {}
+    last_indent = tokens[0][2]
+    visual_indent = None
+    last_token_multiline = False
+    # for each depth, memorize the visual indent column
+    indent = [last_indent[1]]
+    if verbose >= 3:
+        print(">>> " + tokens[0][4].rstrip())
+
+    for token_type, text, start, end, line in tokens:
+
+        newline = row < start[0] - first_row
+        if newline:
+            row = start[0] - first_row
+            newline = not last_token_multiline and token_type not in NEWLINE
+
+        if newline:
+            # this is the beginning of a continuation line.
+            last_indent = start
+            if verbose >= 3:
+                print("... " + line.rstrip())
+
+            # record the initial indent.
+            rel_indent[row] = expand_indent(line) - indent_level
+
+            # identify closing bracket
+            close_bracket = (token_type == tokenize.OP and text in ']})')
+
+            # is the indent relative to an opening bracket line?
+            for open_row in reversed(open_rows[depth]):
+                hang = rel_indent[row] - rel_indent[open_row]
+                hanging_indent = hang in valid_hangs
+                if hanging_indent:
+                    break
+            if hangs[depth]:
+                hanging_indent = (hang == hangs[depth])
+            # is there any chance of visual indent?
+            visual_indent = (not close_bracket and hang > 0 and
+                             indent_chances.get(start[1]))
+
+            if close_bracket and indent[depth]:
+                # closing bracket for visual indent
+                if start[1] != indent[depth]:
+                    yield (start, "E124 closing bracket does not match "
+                           "visual indentation")
+            elif close_bracket and not hang:
+                # closing bracket matches indentation of opening bracket's line
+                if hang_closing:
+                    yield start, "E133 closing bracket is missing indentation"
+            elif indent[depth] and start[1] < indent[depth]:
+                if visual_indent is not True:
+                    # visual indent is broken
+                    yield (start, "E128 continuation line "
+                           "under-indented for visual indent")
+            elif hanging_indent or (indent_next and rel_indent[row] == 8):
+                # hanging indent is verified
+                if close_bracket and not hang_closing:
+                    yield (start, "E123 closing bracket does not match "
+                           "indentation of opening bracket's line")
+                hangs[depth] = hang
+            elif visual_indent is True:
+                # visual indent is verified
+                indent[depth] = start[1]
+            elif visual_indent in (text, str):
+                # ignore token lined up with matching one from a previous line
+                pass
+            else:
+                # indent is broken
+                if hang <= 0:
+                    error = "E122", "missing indentation or outdented"
+                elif indent[depth]:
+                    error = "E127", "over-indented for visual indent"
+                elif not close_bracket and hangs[depth]:
+                    error = "E131", "unaligned for hanging indent"
+                else:
+                    hangs[depth] = hang
+                    if hang > 4:
+                        error = "E126", "over-indented for hanging indent"
+                    else:
+                        error = "E121", "under-indented for hanging indent"
+                yield start, "%s continuation line %s" % error
+
+        # look for visual indenting
+        if (parens[row] and
+                token_type not in (tokenize.NL, tokenize.COMMENT) and
+                not indent[depth]):
+            indent[depth] = start[1]
+            indent_chances[start[1]] = True
+            if verbose >= 4:
+                print("bracket depth %s indent to %s" % (depth, start[1]))
+        # deal with implicit string concatenation
+        elif (token_type in (tokenize.STRING, tokenize.COMMENT) or
+              text in ('u', 'ur', 'b', 'br')):
+            indent_chances[start[1]] = str
+        # special case for the "if" statement because len("if (") == 4
+        elif not indent_chances and not row and not depth and text == 'if':
+            indent_chances[end[1] + 1] = True
+        elif text == ':' and line[end[1]:].isspace():
+            open_rows[depth].append(row)
+
+        # keep track of bracket depth
+        if token_type == tokenize.OP:
+            if text in '([{':
+                depth += 1
+                indent.append(0)
+                hangs.append(None)
+                if len(open_rows) == depth:
+                    open_rows.append([])
+                open_rows[depth].append(row)
+                parens[row] += 1
+                if verbose >= 4:
+                    print("bracket depth %s seen, col %s, visual min = %s" %
+                          (depth, start[1], indent[depth]))
+            elif text in ')]}' and depth > 0:
+                # parent indents should not be more than this one
+                prev_indent = indent.pop() or last_indent[1]
+                hangs.pop()
+                for d in range(depth):
+                    if indent[d] > prev_indent:
+                        indent[d] = 0
+                for ind in list(indent_chances):
+                    if ind >= prev_indent:
+                        del indent_chances[ind]
+                del open_rows[depth + 1:]
+                depth -= 1
+                if depth:
+                    indent_chances[indent[depth]] = True
+                for idx in range(row, -1, -1):
+                    if parens[idx]:
+                        parens[idx] -= 1
+                        break
+            assert len(indent) == depth + 1
+            if start[1] not in indent_chances:
+                # allow to line up tokens
+                indent_chances[start[1]] = text
+
+        last_token_multiline = (start[0] != end[0])
+        if last_token_multiline:
+            rel_indent[end[0] - first_row] = rel_indent[row]
+
+    if indent_next and expand_indent(line) == indent_level + 4:
+        pos = (start[0], indent[0] + 4)
+        if visual_indent:
+            code = "E129 visually indented line"
+        else:
+            code = "E125 continuation line"
+        yield pos, "%s with same indent as next logical line" % code
+
+
+class ContinuationComparer(pep8.Checker):
+    """Run both implementations on every logical line, keep the mismatches."""
+
+    implementations = (pep8.continued_indentation,
+                       continued_indentation_reference)
+
+    def __init__(self, *args, **kwargs):
+        super(ContinuationComparer, self).__init__(*args, **kwargs)
+        self.compared = 0
+        self.mismatches = []
+
+    def check_logical(self):
+        tokens = self.tokens
+        super(ContinuationComparer, self).check_logical()
+        if not tokens:
+            return
+        args = (self.logical_line, tokens, self.indent_level,
+                self.hang_closing, self.indent_char, self.noqa, 0)
+        results = [[(offset, text[:4]) for offset, text in check(*args)]
+                   for check in self.implementations]
+        self.compared += 1
+        if results[0] != results[1]:
+            self.mismatches.append(
+                ''.join(self.lines[tokens[0][2][0] - 1:tokens[-1][2][0]]))
+
+
+def generate_continuation_lines(rand, statements=40):
+    """Return the lines of a source with random continuation lines."""
+    atoms = ['x', 'value', '42', '1.5', "'s'", 'u"t"', 'b', 'a.b', 'not y',
+             '"""a\nb"""', "'a' 'b'", 'lambda: 0', 'f()', 'x[1:2]']
+    operators = ['+', '-', '*', '%', 'or', 'and', '==', 'in', 'if x else']
+
+    def expression(level):
+        kind = rand.random()
+        if level > 3 or kind < 0.3:
+            return [rand.choice(atoms)]
+        if kind < 0.45:
+            return (expression(level + 1) + [rand.choice(operators)] +
+                    expression(level + 1))
+        if kind < 0.85:
+            opening = rand.choice(['(', '[', 'f(', 'call(', 'x[', '{'])
+            closing = {'(': ')', '[': ']', '{': '}'}[opening[-1]]
+            pieces = [opening]
+            for index in range(rand.randint(0, 4)):
+                if index:
+                    pieces.append(',')
+                if opening == '{':
+                    pieces += expression(level + 1) + [':']
+                elif opening.endswith('(') and rand.random() < 0.3:
+                    pieces.append('key=')
+                pieces += expression(level + 1)
+            if rand.random() < 0.2:
+                pieces.append(',')
+            return pieces + [closing]
+        return ['-'] + expression(level + 1)
+
+    lines = []
+    base = ''
+    for __ in range(statements):
+        if rand.random() < 0.05:
+            # An empty logical line: the next one starts with its tokens
+            lines.append('\\\n' + '\n' * rand.randint(0, 2))
+        if rand.random() < 0.1:
+            base = '' if base else '    '
+            if base:
+                lines.append('def function():\n')
+        header, footer = rand.choice([
+            ('x = ', ''), ('if ', ':'), ('while ', ':'), ('print(', ')'),
+            ('assert ', ''), ('return ', ''), ('foo.bar = ', ''),
+            ('for x in ', ':'), ('def f(', '):'), ('with ', ' as y:')])
+        pieces = [header] + expression(0) + ([footer] if footer else [])
+        line = base
+        # the columns of the open brackets, with the indent of their line
+        brackets = []
+        for index, piece in enumerate(pieces):
+            if piece[:1] in ')]}' and brackets:
+                brackets.pop()
+            if index and (brackets or piece[:1] not in ')]},:') and \
+                    rand.random() < 0.3:
+                if brackets:
+                    if rand.random() < 0.1:
+                        line += '  # comment'
+                elif pieces[index - 1] in operators:
+                    line += ' \\'
+                else:
+                    line += ' ' * (piece[:1] not in ')]},:')
+                    line += piece
+                    continue
+                lines.append(line + '\n')
+                column, indent = brackets[-1] if brackets else (0, len(base))
+                line = ' ' * rand.choice([
+                    column, column - 1, indent + 4, indent + 8, indent + 2,
+                    indent, len(base) + 4, rand.randint(0, 16)])
+            elif (line.strip() and piece[:1] not in ')]},:' and
+                  line[-1:] not in '([{ '):
+                line += ' '
+            line += piece
+            if piece[-1:] in '([{':
+                line_start = line.rfind('\n') + 1
+                brackets.append((len(line) - line_start,
+                                 len(line) - len(line.lstrip())))
+        lines.append(line + '\n')
+        if footer.endswith(':'):
+            lines.append(base + '    pass\n')
+    return ''.join(lines).splitlines(True)
+
+
+class ContinuationTestCase(unittest.TestCase):
+
+    count = 100
+
+    def setUp(self):
+        self.rand = random.Random(0)
+        self.guides = [pep8.StyleGuide(select=['E1'], hang_closing=closing,
+                                       reporter=pep8.BaseReport)
+                       for closing in (False, True)]
+
+    def generated(self):
+        for index in range(self.count):
+            yield (index, self.guides[index % 2].options,
+                   generate_continuation_lines(self.rand))
+
+    def record(self, lines, options):
+        checker = pep8.Checker(lines=lines[:], options=options,
+                               report=pep8.RecordingReport(options))
+        return [error[:3] for error in checker.check_all()[4]]
+
+    def test_same_errors_on_each_line(self):
+        compared = 0
+        for (index, options, lines) in self.generated():
+            checker = ContinuationComparer('generated%d.py' % index, lines,
+                                           options=options)
+            checker.check_all()
+            self.assertEqual(checker.mismatches, [])
+            compared += checker.compared
+        self.assertTrue(compared > 10 * self.count)
+
+    def test_same_errors_with_the_triggers(self):
+        generated = list(self.generated())
+        expected = [self.record(lines, options)
+                    for (index, options, lines) in generated]
+        self.assertTrue(any(expected))
+        # The former check runs on every logical line, without trigger
+        checks = pep8._checks['logical_line']
+        with mock.patch.dict(checks):
+            del checks[pep8.continued_indentation]
+            with registered(continued_indentation_reference, ['E1']):
+                guides = [pep8.StyleGuide(select=['E1'], hang_closing=closing,
+                                          reporter=pep8.BaseReport)
+                          for closing in (False, True)]
+                results = [self.record(lines, guides[index % 2].options)
+                           for (index, options, lines) in generated]
+        self.assertEqual(results, expected)
+
+    def test_tokens_before_the_first_row(self):
+        # The DEDENT after a backslash alone on its row comes first
+        lines = ['def f():\n', '    x = 1\n', '\\\n', '\n', '\n',
+                 'class A:\n', '    pass\n']
+        self.assertEqual(self.record(lines, self.guides[0].options),
+                         [(6, 0, 'E122 continuation line missing '
+                                 'indentation or outdented')])
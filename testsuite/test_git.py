@@ -0,0 +1,63 @@
+"""Tests of pep8 --git-rev against --diff on a checkout."""
+import subprocess
+
+from testsuite.support import TreeTestCase, run_main
+
+CHANGES = {
+    'spacing.py': 'a=1\nb = [1, 2, 3]\nif a == None :\n    print( b)\nc=3\n',
+    'clean.py': 'import os\n\n\ndef main():\n    return os.getcwd()\n'
+                'def other( ):\n    pass\n',
+    'pkg/indent.py': 'def f(a,\n      b):\n    return (a +\n    b)\n',
+    'pkg/new.py': 'x=1\ny = 2 # comment\n',
+    'pkg/notes.txt': 'not=python\n',
+}
+
+
+class GitRevTestCase(TreeTestCase):
+
+    def git(self, *args):
+        return subprocess.check_output(
+            ['git', '-c', 'user.name=pep8', '-c', 'user.email=pep8@localhost',
+             '-c', 'commit.gpgsign=false'] + list(args)).decode('utf-8')
+
+    def setUp(self):
+        super(GitRevTestCase, self).setUp()
+        try:
+            self.git('init', '-q', '.')
+        except OSError:
+            self.skipTest('git is not installed')
+        self.git('add', '.')
+        self.git('commit', '-q', '-m', 'first')
+        self.first = self.git('rev-parse', 'HEAD').strip()
+        for name, text in CHANGES.items():
+            with open(name, 'w') as f:
+                f.write(text)
+        self.git('rm', '-q', 'blank_lines.py')
+        self.git('add', '.')
+        self.git('commit', '-q', '-m', 'second')
+
+    def assertSameAsDiff(self, args, rev, paths=()):
+        diff = self.git('diff', '--unified=0', rev, '--', *paths)
+        (status, output) = run_main(['--git-rev', rev] + args + list(paths))
+        (expected_status, expected) = run_main(['--diff'] + args, stdin=diff)
+        # The paths of --diff start with the directory of the diff
+        expected = expected.replace('\n./', '\n')
+        expected = expected[2:] if expected[:2] == './' else expected
+        self.assertEqual((status, output), (expected_status, expected))
+        return output
+
+    def test_same_as_diff(self):
+        output = self.assertSameAsDiff([], self.first + '..HEAD')
+        self.assertIn('pkg/new.py:1:2: E225', output)
+        self.assertIn('clean.py:6:1: E302', output)
+        self.assertNotIn('spacing.py:3', output)
+        self.assertSameAsDiff(['--show-source'], self.first + '...HEAD')
+        self.assertSameAsDiff(['--select=E2'], self.first, ['pkg'])
+
+    def test_working_tree_not_read(self):
+        expected = run_main(['--git-rev', self.first + '..HEAD'])
+        for name in CHANGES:
+            with open(name, 'w') as f:
+                f.write('# changed in the working tree\n')
+        self.assertEqual(run_main(['--git-rev', self.first + '..HEAD']),
+                         expected)
@@ -0,0 +1,125 @@
+"""Tests of the error and time limits of a pep8 run."""
+import json
+import os
+import shutil
+import signal
+import tempfile
+import time
+
+import pep8
+from testsuite.support import TreeTestCase, run_main, spawn_pool
+
+LIMITS = [
+    ['--max-errors-per-file=2'],
+    ['--max-errors=7'],
+    ['--max-errors=7', '--max-errors-per-file=1', '--statistics'],
+    ['--max-errors-per-file=1', '--select=E2', '--format=json'],
+]
+
+
+def document(output):
+    """Return the json document without the times and the cache counters."""
+    document = json.loads(output)
+    for key in ('elapsed', 'walk_elapsed'):
+        del document[key]
+    for key in pep8.CACHE_KEYS:
+        document['counters'].pop(key, None)
+    return document
+
+
+class LimitsTestCase(TreeTestCase):
+
+    def setUp(self):
+        super(LimitsTestCase, self).setUp()
+        self.cache_dir = tempfile.mkdtemp(prefix='pep8-cache-')
+        self.addCleanup(shutil.rmtree, self.cache_dir)
+
+    def assertSameAsSerial(self, args, serial_args=None):
+        (status, output) = run_main(args)
+        expected = run_main(args if serial_args is None else serial_args)
+        if '--format=json' in args:
+            (output, expected) = (document(output),
+                                  (expected[0], document(expected[1])))
+        self.assertEqual((status, output), expected)
+        return status, output
+
+    def test_same_as_serial(self):
+        for limits in LIMITS:
+            args = limits + ['.']
+            (status, output) = run_main(args)
+            self.assertEqual(status, 1)
+            self.assertIn('truncated', output)
+            cached = ['--cache-dir', self.cache_dir] + args
+            self.assertSameAsSerial(['--jobs', '2'] + args, args)
+            self.assertSameAsSerial(cached, args)
+            # Again, from the cache
+            self.assertSameAsSerial(['--jobs', '2'] + cached, args)
+
+    def test_same_counters(self):
+        options = {'paths': ['.'], 'reporter': pep8.BaseReport,
+                   'max_errors_per_file': 1}
+        expected = pep8.StyleGuide(**options).check_files()
+        report = pep8.StyleGuide(jobs=2, **options).check_files()
+        self.assertEqual(report.counters, expected.counters)
+        self.assertEqual(report.truncated, expected.truncated)
+
+    def test_recorded_up_to_the_limit(self):
+        style = pep8.StyleGuide(max_errors_per_file=1, max_errors=5,
+                                cache_dir=self.cache_dir)
+        (__, results) = style.record_file('spacing.py')
+        (__, complete) = style.record_file('spacing.py', limits=False)
+        self.assertEqual(results[4], complete[4][:2])
+        self.assertTrue(results[3] < complete[3])
+        # Only the complete results are cached
+        (cached, results) = style.record_file('spacing.py')
+        self.assertEqual((cached, results), (True, complete))
+        style = pep8.StyleGuide(max_errors=3)
+        (__, results) = style.record_file('spacing.py')
+        self.assertEqual(results[4], complete[4][:4])
+
+    def test_time_budget(self):
+        args = ['--time-budget=1e-9', '.']
+        (status, output) = self.assertSameAsSerial(['--jobs', '2'] + args,
+                                                   args)
+        self.assertEqual(
+            (status, output),
+            (0, '... stopped, time budget of 1e-09 seconds exceeded\n'))
+        for options in (['--jobs', '2', '--per-dir-config'],
+                        ['--per-dir-config']):
+            self.assertEqual(run_main(options + args), (status, output))
+        with spawn_pool():
+            self.assertEqual(run_main(['--jobs', '2'] + args),
+                             (status, output))
+        style = pep8.StyleGuide(time_budget=1)
+        style.options.report.deadline = time.time()
+        (__, results) = style.record_file('spacing.py')
+        self.assertEqual(results[3:], (1, []))
+
+    def test_worker_deadline(self):
+        style = pep8.StyleGuide(time_budget=1)
+        handler = signal.getsignal(signal.SIGINT)
+        try:
+            pep8._init_worker(style, time.time())
+            (__, results, __) = pep8._check_file_worker('spacing.py')
+        finally:
+            signal.signal(signal.SIGINT, handler)
+            pep8._worker_styleguide = None
+        self.assertEqual(results[3:], (1, []))
+
+    def test_daemon_results_are_complete(self):
+        style = pep8.StyleGuide(paths=['.'], max_errors_per_file=1)
+        daemon = pep8.CheckDaemon(style, os.path.join(self.root, 'sock'))
+        (logical_lines, errors) = daemon.get_results('spacing.py')
+        self.assertEqual(len(errors), 6)
+        request = {'fingerprint': daemon.codec.fingerprint,
+                   'files': [os.path.abspath('spacing.py')]}
+        args = ['--max-errors-per-file=1', '--connect', 'sock', 'spacing.py']
+        original = pep8.request_daemon
+        pep8.request_daemon = lambda path, request: daemon.handle(
+            request)['results']
+        try:
+            self.assertSameAsSerial(args, args[:1] + args[3:])
+        finally:
+            pep8.request_daemon = original
+        self.assertEqual(daemon.handle(request)['results'],
+                         [(logical_lines, errors)])
@@ -0,0 +1,137 @@
+"""Tests of pep8 --lsp: the protocol and the incremental checks."""
+import io
+import json
+import random
+import unittest
+
+import pep8
+from testsuite.support import SAMPLES
+
+URI = 'file:///tmp/edited.py'
+EDITS = ['x=1\n', '    y = 2\n', 'def g():\n', '    pass\n', '\n', '(',
+         ')', '# comment\n', 'import os\n', '"""\n', 'class C:\n', ' ',
+         '\t', 'z = [1,\n', '  2]\n', '']
+
+
+def message(method, params=None, id=None):
+    """Return a JSON-RPC message with its header."""
+    body = {'jsonrpc': '2.0', 'method': method, 'params': params or {}}
+    if id is not None:
+        body['id'] = id
+    body = json.dumps(body).encode('utf-8')
+    return b'Content-Length: %d\r\n\r\n' % len(body) + body
+
+
+def read_messages(output):
+    """Return the JSON-RPC messages written by the server."""
+    stream = io.BytesIO(output)
+    server = pep8.LanguageServer(pep8.StyleGuide(), stdin=stream)
+    messages = []
+    while True:
+        response = server.read_message()
+        if response is None:
+            return messages
+        messages.append(response)
+
+
+class RecordingServer(pep8.LanguageServer):
+    """Server which keeps the diagnostics of the documents."""
+
+    def __init__(self, *args, **kwargs):
+        super(RecordingServer, self).__init__(*args, **kwargs)
+        self.diagnostics = {}
+
+    def send_message(self, message):
+        params = message['params']
+        self.diagnostics[params['uri']] = params['diagnostics']
+
+
+class ProtocolTestCase(unittest.TestCase):
+
+    def run_server(self, *messages):
+        stdin = io.BytesIO(b''.join(messages))
+        stdout = io.BytesIO()
+        server = pep8.LanguageServer(pep8.StyleGuide(), stdin, stdout)
+        return server.run(), read_messages(stdout.getvalue())
+
+    def test_session(self):
+        (status, responses) = self.run_server(
+            message('initialize', id=1), message('initialized'),
+            message('textDocument/didOpen', {'textDocument': {
+                'uri': URI, 'text': 'x=1\n'}}),
+            message('shutdown', id=2), message('exit'))
+        self.assertEqual(status, 0)
+        self.assertEqual(responses[0]['id'], 1)
+        self.assertIn('capabilities', responses[0]['result'])
+        diagnostics = responses[1]['params']['diagnostics']
+        self.assertEqual([d['code'] for d in diagnostics], ['E225'])
+        self.assertEqual(responses[2], {'jsonrpc': '2.0', 'id': 2,
+                                        'result': None})
+
+    def test_method_not_found(self):
+        (status, responses) = self.run_server(
+            message('textDocument/hover', id=1),
+            message('$/setTrace', {'value': 'off'}),
+            message('workspace/didChangeConfiguration'),
+            message('shutdown', id=2), message('exit'))
+        self.assertEqual(status, 0)
+        # Only the requests are answered
+        self.assertEqual(len(responses), 2)
+        self.assertEqual(responses[0]['id'], 1)
+        self.assertEqual(responses[0]['error']['code'], -32601)
+        self.assertEqual(responses[1]['id'], 2)
+
+    def test_exit_without_shutdown(self):
+        self.assertEqual(self.run_server(message('exit')), (1, []))
+
+
+class IncrementalTestCase(unittest.TestCase):
+
+    def full_check(self, text):
+        server = RecordingServer(pep8.StyleGuide())
+        server.did_open({'textDocument': {'uri': URI, 'text': text}})
+        return server.diagnostics[URI]
+
+    def test_edits_same_as_full_check(self):
+        rand = random.Random(0)
+        for source in sorted(SAMPLES.values()):
+            server = RecordingServer(pep8.StyleGuide())
+            server.did_open({'textDocument': {'uri': URI, 'text': source}})
+            lines = source.splitlines(True)
+            for __ in range(20):
+                first = rand.randint(0, len(lines))
+                last = min(len(lines), first + rand.randint(0, 2))
+                # Some of the positions are after the end of their line
+                change = {'range': {
+                    'start': {'line': first, 'character': rand.randint(0, 4)},
+                    'end': {'line': last, 'character': rand.randint(0, 4)}},
+                    'text': ''.join(rand.sample(EDITS, 2))}
+                if first == last:
+                    change['range']['end'] = change['range']['start']
+                server.did_change({'textDocument': {'uri': URI},
+                                   'contentChanges': [change]})
+                lines = server.documents[URI]['lines']
+                self.assertEqual(server.diagnostics[URI],
+                                 self.full_check(''.join(lines)),
+                                 ''.join(lines))
+
+    def test_positions_after_the_end(self):
+        server = RecordingServer(pep8.StyleGuide())
+        server.did_open({'textDocument': {'uri': URI, 'text': 'x = 1\ny'}})
+        for (line, character) in ((0, 9), (1, 5), (4, 0)):
+            server.did_change({'textDocument': {'uri': URI},
+                               'contentChanges': [{'range': {
+                                   'start': {'line': line,
+                                             'character': character},
+                                   'end': {'line': line,
+                                           'character': character}},
+                                   'text': '=2'}]})
+        self.assertEqual(server.documents[URI]['lines'],
+                         ['x = 1=2\n', 'y=2=2'])
+
+    def test_close(self):
+        server = RecordingServer(pep8.StyleGuide())
+        server.did_open({'textDocument': {'uri': URI, 'text': 'x=1\n'}})
+        server.did_close({'textDocument': {'uri': URI}})
+        self.assertEqual(server.diagnostics[URI], [])
+        self.assertNotIn(URI, server.documents)
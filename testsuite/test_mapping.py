@@ -0,0 +1,132 @@
+"""Tests of OffsetMapping, which finds the positions of logical offsets."""
+import io
+import random
+import sys
+import time
+import unittest
+from unittest import mock
+
+import pep8
+from testsuite.support import SAMPLES, TreeTestCase, run_main
+
+
+def dense_source(count):
+    """Return the lines of a dict literal of count dense items.
+
+    Each item adds 12 tokens and 4 errors to the logical line.
+    """
+    return (['data = {\n'] +
+            ["    'k%d':%d,'v%d':[%d,%d],\n" % ((index,) * 5)
+             for index in range(count)] + ['}\n'])
+
+
+def benchmark_dense_lines(items):
+    """Print the time to check dict literals of up to items dense items.
+
+    The time should grow in proportion with the items.
+    """
+    guide = pep8.StyleGuide(reporter=pep8.BaseReport)
+    for count in (items // 4, items // 2, items):
+        start = time.time()
+        checker = pep8.Checker('dense%d.py' % count, dense_source(count),
+                               options=guide.options)
+        errors = checker.check_all()
+        print('%-7.2f seconds for %d items (%d errors)' %
+              (time.time() - start, count, errors))
+
+
+class LinearMapping(pep8.OffsetMapping):
+    """The mapping of the offsets, searched from the first token."""
+
+    def position(self, offset):
+        for index in range(len(self)):
+            (token_offset, pos) = self[index]
+            if offset <= token_offset:
+                break
+        return (pos[0], pos[1] + offset - token_offset)
+
+
+class MappingChecker(pep8.Checker):
+    """Checker which keeps the mappings of the logical lines."""
+
+    def build_tokens_line(self):
+        mapping = super(MappingChecker, self).build_tokens_line()
+        if mapping:
+            self.mappings.append((self.logical_line, mapping))
+        return mapping
+
+
+def generate_sources(count, seed=12):
+    """Generate sources of dense, continued and indented logical lines."""
+    rand = random.Random(seed)
+    items = ['1', 'x', "'s'", '[1,2]', '(a, b)', '{1: 2}', 'f(x)', '"""\n"""']
+    for __ in range(count):
+        lines = []
+        for __ in range(rand.randint(1, 6)):
+            values = [rand.choice(items) for __ in range(rand.randint(0, 30))]
+            separators = [rand.choice([',', ', ', ' ,', ',\n    '])
+                          for __ in values]
+            body = ''.join(value + separator
+                           for value, separator in zip(values, separators))
+            indent = rand.choice(['', 'if x:\n    ', 'def f():\n    '])
+            comment = rand.choice(['', '  # comment', '  # noqa'])
+            lines.append('%sv = [%s]%s\n' % (indent, body, comment))
+        yield ''.join(lines)
+
+
+class OffsetMappingTestCase(unittest.TestCase):
+
+    def mappings(self, source):
+        checker = MappingChecker(lines=source.splitlines(True))
+        checker.mappings = []
+        checker.check_all()
+        return checker.mappings
+
+    def assertSamePositions(self, source):
+        for (logical_line, mapping) in self.mappings(source):
+            linear = LinearMapping(mapping.positions[0])
+            linear.offsets = mapping.offsets
+            linear.positions = mapping.positions
+            for offset in range(len(logical_line) + 2):
+                self.assertEqual(mapping.position(offset),
+                                 linear.position(offset))
+
+    def test_samples(self):
+        for name, source in SAMPLES.items():
+            if 'syntax' not in name:
+                self.assertSamePositions(source)
+
+    def test_generated(self):
+        for source in generate_sources(200):
+            self.assertSamePositions(source)
+
+    def test_dense(self):
+        self.assertSamePositions(''.join(dense_source(300)))
+
+    def test_benchmark(self):
+        saved = sys.stdout
+        sys.stdout = io.StringIO() if str is not bytes else io.BytesIO()
+        try:
+            benchmark_dense_lines(40)
+            output = sys.stdout.getvalue()
+        finally:
+            sys.stdout = saved
+        lines = output.splitlines()
+        self.assertEqual([line.split(' for ')[1] for line in lines],
+                         ['10 items (40 errors)', '20 items (80 errors)',
+                          '40 items (160 errors)'])
+
+
+class DenseOutputTestCase(TreeTestCase):
+
+    sources = dict(('dense%d.py' % index, source) for index, source in
+                   enumerate(generate_sources(20)))
+    sources['dense.py'] = ''.join(dense_source(200))
+
+    def test_same_output(self):
+        args = ['--show-source', '--statistics', '.']
+        with mock.patch.object(pep8, 'OffsetMapping', LinearMapping):
+            expected = run_main(args)
+        self.assertEqual(run_main(args), expected)
+        self.assertEqual(run_main(['--jobs', '2'] + args), expected)
+        self.assertIn('./dense.py:2:9: E231', expected[1])
@@ -0,0 +1,50 @@
+"""Tests of pep8 --memo: the results remembered for the logical lines."""
+import shutil
+import tempfile
+
+import pep8
+from testsuite.support import TreeTestCase, run_main
+
+
+class MemoTestCase(TreeTestCase):
+
+    def check(self, **options):
+        style = pep8.StyleGuide(paths=['.'], memo=100,
+                                reporter=pep8.BaseReport, **options)
+        return style.check_files()
+
+    def lookups(self, report):
+        return sum(report.counters.get(key, 0) for key in pep8.MEMO_KEYS)
+
+    def test_same_output(self):
+        args = ['--show-source', '--statistics', '.']
+        expected = run_main(args)
+        self.assertEqual(run_main(['--memo', '100'] + args), expected)
+        self.assertEqual(run_main(['--memo', '100', '--jobs', '2'] + args),
+                         expected)
+
+    def test_counters_with_jobs(self):
+        serial = self.check()
+        self.assertTrue(serial.counters['memo hits'])
+        parallel = self.check(jobs=2)
+        self.assertEqual(self.lookups(parallel), self.lookups(serial))
+        self.assertTrue(parallel.counters['memo hits'])
+        counters = dict(parallel.counters)
+        for key in pep8.MEMO_KEYS:
+            del counters[key]
+            del serial.counters[key]
+        self.assertEqual(counters, serial.counters)
+
+    def test_counters_with_cache(self):
+        cache_dir = tempfile.mkdtemp(prefix='pep8-cache-')
+        self.addCleanup(shutil.rmtree, cache_dir)
+        report = self.check(cache_dir=cache_dir)
+        self.assertEqual(self.lookups(report), self.lookups(self.check()))
+        # The checks of the cached files are skipped
+        self.assertEqual(self.lookups(self.check(cache_dir=cache_dir)), 0)
+
+    def test_benchmark_with_jobs(self):
+        (status, output) = run_main(['--memo', '100', '--jobs', '2',
+                                     '--benchmark', '.'])
+        self.assertIn(' memo hits\n', output)
+        self.assertIn(' % memo hit rate\n', output)
@@ -0,0 +1,32 @@
+"""Tests of the large files mapped in memory."""
+import pep8
+from testsuite.support import TreeTestCase, run_main
+
+# Long lines in a string, with a few errors around it
+LARGE_SOURCE = ('x=1\n"""\n' +
+                ('a' * 1000 + '\n') * (pep8.MMAP_MIN_SIZE // 1000) +
+                '"""\ny = [1,2]\n')
+
+
+class MappedLinesTestCase(TreeTestCase):
+
+    sources = {'large.py': LARGE_SOURCE, 'small.py': 'z=1\n'}
+
+    def test_mapped(self):
+        lines = pep8.readlines('large.py')
+        self.assertTrue(isinstance(lines, pep8.MappedLines))
+        self.assertEqual(len(lines), LARGE_SOURCE.count('\n'))
+        self.assertEqual(lines[-1], 'y = [1,2]\n')
+
+    def test_same_output(self):
+        args = ['--max-line-length=1000', '--show-source']
+        (status, output) = run_main(args + ['large.py', 'small.py'])
+        self.assertEqual(len([line for line in output.splitlines()
+                              if line.startswith(('large.py:', 'small.py:'))]),
+                         3)
+        self.assertIn('large.py:1:2: E225', output)
+        self.assertIn('large.py:%d:7: E231' % len(pep8.readlines('large.py')),
+                      output)
+        self.assertEqual(run_main(['--jobs', '2'] + args +
+                                  ['large.py', 'small.py']),
+                         (status, output))
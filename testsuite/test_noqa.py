@@ -0,0 +1,64 @@
+"""Tests of the index of the rows with a noqa comment."""
+import unittest
+
+import pep8
+from testsuite.support import GenericChecker, registered
+
+
+class LineNoqaChecker(GenericChecker):
+    """Checker which searches each physical line for noqa."""
+
+    @property
+    def noqa_rows(self):
+        return bytearray([0] + [bool(pep8.noqa(line)) for line in self.lines])
+
+
+class Always(object):
+    """Report every row, to test the noqa rows of the tree checks."""
+
+    def __init__(self, tree, filename):
+        self.rows = range(1, len(tree.body) + 3)
+
+    def run(self):
+        for row in self.rows:
+            yield row, 0, 'W902 row %d' % row, None
+
+
+SOURCES = [
+    ['import os, sys  # noqa\n', 'x=1  # NOQA\n', 'y=2\n'],
+    ['s = """\n', '  \n', '"""  # noqa\n', 't = """\n', '  \n', '"""\n'],
+    ['x = "# noqa"; y=2\n', 'z = ("# noqa",\n', '     1)  # nopep8\n'],
+    ['a=1\r\n', 'b=2  # noqa\r\n', 'c=3\r\n'],
+    ['a=1\r', 'b=2  # noqa\r', 'c=3'],
+    ['def f(a):  # noqa\n', '    return a+1'],
+    [],
+]
+
+
+class NoqaTestCase(unittest.TestCase):
+
+    def check(self, lines, checker_class=pep8.Checker):
+        options = pep8.StyleGuide(select=['E', 'W']).options
+        checker = checker_class(lines=lines[:], options=options,
+                                report=pep8.RecordingReport(options))
+        return checker, checker.check_all()[3:]
+
+    def test_same_as_each_line(self):
+        with registered(Always, ['W902']):
+            for lines in SOURCES:
+                (__, results) = self.check(lines)
+                self.assertEqual(results,
+                                 self.check(lines, LineNoqaChecker)[1], lines)
+
+    def test_rows(self):
+        (checker, results) = self.check(SOURCES[2])
+        self.assertEqual(list(checker.noqa_rows), [0, 1, 1, 1])
+        # A marker in a string does not apply to the logical lines
+        self.assertEqual([error[2][:4] for error in results[1]],
+                         ['E702', 'E225'])
+
+    def test_source_released(self):
+        (checker, results) = self.check(SOURCES[0])
+        self.assertIsNone(checker._source)
+        self.assertEqual(list(checker.noqa_rows), [0, 1, 1, 0])
+        self.assertIsNone(checker._source)
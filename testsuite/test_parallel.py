@@ -0,0 +1,67 @@
+"""Tests of pep8 --jobs: the pool of processes and the replay."""
+import os
+import zipfile
+
+import pep8
+from testsuite.support import TreeTestCase, run_main, spawn_pool
+
+
+class ParallelTestCase(TreeTestCase):
+
+    def test_same_output(self):
+        (status, output) = self.assertSameAsSerial(['--jobs', '3', '.'],
+                                                   ['.'])
+        self.assertEqual(status, 1)
+        self.assertIn('./spacing.py:1:2: E225', output)
+
+    def test_same_statistics(self):
+        args = ['--statistics', '--show-source', '--format=pylint', '.']
+        self.assertSameAsSerial(['--jobs', '2'] + args, args)
+
+    def test_files_in_argument_order(self):
+        paths = [os.path.join('gen', 'mod%02d.py' % index)
+                 for index in (7, 3, 11, 1)]
+        (status, output) = self.assertSameAsSerial(
+            ['--jobs', '2'] + paths, paths)
+        found = []
+        for line in output.splitlines():
+            if line.split(':')[0] not in found:
+                found.append(line.split(':')[0])
+        self.assertEqual(found, paths)
+
+    def test_counters(self):
+        serial = pep8.StyleGuide(paths=['.'], reporter=pep8.BaseReport)
+        parallel = pep8.StyleGuide(paths=['.'], jobs=2,
+                                   reporter=pep8.BaseReport)
+        (expected, report) = (serial.check_files(), parallel.check_files())
+        self.assertEqual(report.counters, expected.counters)
+        self.assertEqual(report.total_errors, expected.total_errors)
+
+    def test_missing_file(self):
+        (status, output) = self.assertSameAsSerial(
+            ['--jobs', '2', 'clean.py', 'missing.py'],
+            ['clean.py', 'missing.py'])
+        self.assertIn('missing.py:1:1: E902', output)
+        self.assertEqual(status, 1)
+
+    def test_clean_run(self):
+        self.assertEqual(run_main(['--jobs', '2', 'clean.py', 'pkg']),
+                         run_main(['clean.py', 'pkg']))
+        self.assertEqual(run_main(['--jobs', '2', 'clean.py',
+                                   os.path.join('pkg', '__init__.py')]),
+                         (0, ''))
+
+    def test_spawn(self):
+        with zipfile.ZipFile('gen.zip', 'w') as f:
+            for name in sorted(os.listdir('gen')):
+                f.write(os.path.join('gen', name))
+        sources = {'a.py': 'a=1\n', 'b.py': 'b = 2\n', 'c.py': 'c=3\n'}
+        style = pep8.StyleGuide()
+        expected = [(v.path, v.row, v.col, v.code)
+                    for v in style.check_sources(sources, jobs=1)]
+        with spawn_pool():
+            args = ['--statistics', '--show-source', '.', 'gen.zip']
+            self.assertSameAsSerial(['--jobs', '2'] + args, args)
+            self.assertEqual([(v.path, v.row, v.col, v.code) for v in
+                              style.check_sources(sources, jobs=2)],
+                             expected)
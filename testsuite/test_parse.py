@@ -0,0 +1,70 @@
+"""Tests of the parse product shared by the check stages."""
+import unittest
+
+import pep8
+from testsuite.support import GenericChecker, registered
+
+
+class FunctionNames(object):
+    """Report the functions, to test the tree checks."""
+
+    def __init__(self, tree, filename):
+        self.tree = tree
+
+    def run(self):
+        import ast
+        for node in ast.walk(self.tree):
+            if isinstance(node, ast.FunctionDef):
+                yield node.lineno, 0, 'W901 function %s' % node.name, None
+
+
+SOURCE = ['import os\n', 'def f():\n', '    return os.sep # noqa\n',
+          'def g(a = 1):\n', '    return a\n']
+
+
+class ParseTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.compiled = []
+        pep8.compile = self.compile
+        self.addCleanup(delattr, pep8, 'compile')
+
+    def compile(self, *args):
+        self.compiled.append(args[1:])
+        return compile(*args)
+
+    def check(self, lines, checker_class=pep8.Checker, **options):
+        options = pep8.StyleGuide(select=['E', 'W'], **options).options
+        checker = checker_class(lines=lines[:], options=options,
+                                report=pep8.RecordingReport(options))
+        return checker, checker.check_all()[3:]
+
+    def test_parsed_once(self):
+        with registered(FunctionNames, ['W901']):
+            (checker, results) = self.check(SOURCE)
+            (__, expected) = self.check(SOURCE, GenericChecker)
+        self.assertEqual(results, expected)
+        self.assertEqual(self.compiled[:1], [('', 'exec', pep8.PyCF_ONLY_AST)])
+        self.assertEqual(len(self.compiled), 2)     # One for each checker
+        self.assertEqual([error[2][:4] for error in results[1]],
+                         ['W901', 'W901', 'E302', 'E261', 'E302', 'E251',
+                          'E251'])
+
+    def test_parse_released(self):
+        with registered(FunctionNames, ['W901']):
+            (checker, results) = self.check(SOURCE)
+        self.assertIsNone(checker._source)
+        self.assertIsNone(checker._tree)
+        del self.compiled[:]
+        (checker, results) = self.check(SOURCE)
+        self.assertEqual(self.compiled, [])
+        self.assertIsNone(checker._source)
+
+    def test_syntax_error(self):
+        lines = ['def f(:\n', '    pass\n']
+        with registered(FunctionNames, ['W901']):
+            (checker, results) = self.check(lines)
+            (__, expected) = self.check(lines, GenericChecker)
+        self.assertEqual(results, expected)
+        self.assertEqual(len(self.compiled), 2)
+        self.assertEqual(results[1][0][2], 'E901 SyntaxError: invalid syntax')
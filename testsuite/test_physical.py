@@ -0,0 +1,86 @@
+"""Tests of the rows found in advance for the physical checks."""
+import random
+import unittest
+from unittest import mock
+
+import pep8
+from testsuite.support import SAMPLES, docstring_examples
+
+PIECES = [
+    'x = 1', 'x = 1  ', 'y = 2\t', '\x0c', '', '   ', 'if x:', '    pass',
+    's = """', 'text  ', '"""  # noqa', '"""', 'z = (1 +\\', '     2)',
+    'l = "%s"' % ('a' * 80), '# %s' % ('b' * 80), 'u = """%s' % ('c' * 90),
+    't = x  # noqa  ', 'w = \\', "    'unterminated", 'def f():',
+    '\tx = 1', '    \ty = 2', 'pass \x0c',
+    # One character over the limits of the tests
+    'v = %s' % ('d' * 17), '# %s' % ('e' * 78),
+]
+
+
+def generated_sources(count, seed=0):
+    """Generate the lines of count random sources."""
+    rand = random.Random(seed)
+    for __ in range(count):
+        lines = [rand.choice(PIECES) + rand.choice(['\n', '\n', '\r\n'])
+                 for __ in range(rand.randint(1, 12))]
+        if rand.random() < 0.3:
+            lines[-1] = lines[-1].rstrip('\r\n')
+        yield lines
+
+
+class AllRowsChecker(pep8.Checker):
+    """Checker which runs the physical checks on every row."""
+
+    def init_physical_rows(self):
+        self._physical_rows = None
+
+
+class PhysicalRowsTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.options = pep8.StyleGuide(select=['E', 'W']).options
+
+    def record(self, lines, checker_class=pep8.Checker, options=None):
+        options = options or self.options
+        checker = checker_class(lines=lines[:], options=options,
+                                report=pep8.RecordingReport(options))
+        return checker.check_all()[3:]
+
+    def assertSameAsAllRows(self, lines, options=None):
+        self.assertEqual(self.record(lines, options=options),
+                         self.record(lines, AllRowsChecker, options), lines)
+
+    def test_samples(self):
+        for text in SAMPLES.values():
+            self.assertSameAsAllRows(text.splitlines(True))
+
+    def test_docstring_examples(self):
+        for (name, code, source, lines) in docstring_examples(self.options):
+            self.assertSameAsAllRows(lines)
+
+    def test_generated_sources(self):
+        short = pep8.StyleGuide(select=['E', 'W'],
+                                max_line_length=20).options
+        for lines in generated_sources(500):
+            self.assertSameAsAllRows(lines)
+            self.assertSameAsAllRows(lines, short)
+
+    def test_fewer_calls(self):
+        calls = []
+
+        def trailing_whitespace(physical_line):
+            calls.append(physical_line)
+            return pep8.trailing_whitespace(physical_line)
+        self.options.physical_plan = pep8.compile_checks([
+            (name, trailing_whitespace if check is pep8.trailing_whitespace
+             else check, args)
+            for (name, check, args) in self.options.physical_checks])
+        lines = ['x = 1\n'] * 20 + ['y = 2  \n', 'z = 3\n']
+        with mock.patch.object(pep8, 'BATCH_PHYSICAL_CHECKS',
+                               pep8.BATCH_PHYSICAL_CHECKS |
+                               frozenset([trailing_whitespace])):
+            self.assertEqual(self.record(lines)[1],
+                             self.record(lines, AllRowsChecker)[1])
+        (batch, all_rows) = (calls[:2], calls[2:])
+        self.assertEqual(batch, ['y = 2  \n', 'z = 3\n'])
+        self.assertEqual(len(all_rows), len(lines))
@@ -0,0 +1,50 @@
+"""Tests of the compiled check plans against the generic loop."""
+import unittest
+
+import pep8
+from testsuite.support import (SAMPLES, GenericChecker, docstring_examples,
+                               selftest)
+
+
+def record(checker_class, lines, options):
+    """Return the raw results of a checker on the lines."""
+    checker = checker_class(lines=lines, options=options,
+                            report=pep8.RecordingReport(options))
+    return checker.check_all()[3:]
+
+
+class PlanTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.options = pep8.StyleGuide(select=['E', 'W'],
+                                       reporter=pep8.BaseReport).options
+
+    def test_selftest(self):
+        for checker_class in (pep8.Checker, GenericChecker):
+            (failed, count) = selftest(self.options, checker_class)
+            self.assertEqual(failed, 0)
+            self.assertTrue(count > 150)
+
+    def test_docstring_examples(self):
+        for (name, code, source, lines) in docstring_examples(self.options):
+            self.assertEqual(
+                record(pep8.Checker, lines[:], self.options),
+                record(GenericChecker, lines[:], self.options), source)
+
+    def test_samples(self):
+        for name, text in sorted(SAMPLES.items()):
+            lines = text.splitlines(True)
+            expected = record(GenericChecker, lines[:], self.options)
+            self.assertEqual(record(pep8.Checker, lines[:], self.options),
+                             expected, name)
+
+    def test_pep8_source(self):
+        lines = pep8.readlines(pep8.__file__.rstrip('co'))
+        self.assertEqual(record(pep8.Checker, lines[:], self.options),
+                         record(GenericChecker, lines[:], self.options))
+
+    def test_compiled_once(self):
+        plan = pep8.compile_checks(self.options.logical_checks)
+        again = pep8.compile_checks(self.options.logical_checks)
+        self.assertEqual([entry[2] for entry in plan],
+                         [entry[2] for entry in again])
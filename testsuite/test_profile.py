@@ -0,0 +1,63 @@
+"""Tests of pep8 --profile and --profile-json."""
+import json
+import os
+import zipfile
+
+from testsuite.support import TreeTestCase, run_main, spawn_pool
+
+
+class ProfileTestCase(TreeTestCase):
+
+    def read_profile(self, args):
+        (status, output) = run_main(['--profile-json', 'profile.json'] + args)
+        with open('profile.json') as f:
+            rows = json.load(f)
+        os.remove('profile.json')
+        return (status, output), dict(((row['kind'], row['name']),
+                                       row['calls']) for row in rows)
+
+    def test_same_output(self):
+        (status, expected) = run_main(['.'])
+        (status, output) = run_main(['--profile', '.'])
+        self.assertTrue(output.startswith(expected))
+        table = output[len(expected):].splitlines()
+        self.assertEqual(table[0].split(), ['calls', 'total', 'ms', 'max',
+                                            'ms', 'check'])
+        self.assertTrue(any(line.endswith(' tabs_or_spaces (physical_line)')
+                            for line in table))
+        self.assertEqual(status, 1)
+
+    def test_calls(self):
+        (result, calls) = self.read_profile(['.'])
+        self.assertEqual(result, run_main(['.']))
+        self.assertEqual(calls[('logical_line', 'blank_lines')],
+                         calls[('logical_line', 'indentation')])
+
+    def test_jobs(self):
+        (result, calls) = self.read_profile(['.'])
+        self.assertEqual(self.read_profile(['--jobs', '2', '.']),
+                         (result, calls))
+
+    def test_jobs_spawn(self):
+        with zipfile.ZipFile('gen.zip', 'w') as f:
+            for name in sorted(os.listdir('gen')):
+                f.write(os.path.join('gen', name))
+        # The workers send the calls they timed, once
+        args = ['spacing.py', 'gen.zip', 'pkg']
+        (result, calls) = self.read_profile(args)
+        self.assertEqual(self.read_profile(['--jobs', '2'] + args),
+                         (result, calls))
+        with spawn_pool():
+            self.assertEqual(self.read_profile(['--jobs', '2'] + args),
+                             (result, calls))
+
+    def test_trigger_scan_from_first_token(self):
+        with open('indented.py', 'w') as f:
+            f.write('def f(x):\n    if x:\n        return x\n'
+                    '    return not  x\n')
+        (result, calls) = self.read_profile(['indented.py'])
+        self.assertIn('indented.py:4:15: E271', result[1])
+        # Only the last line has two spaces after its indentation
+        self.assertEqual(calls[('logical_line', 'indentation')], 4)
+        self.assertEqual(calls[('logical_line',
+                                'whitespace_around_keywords')], 1)
@@ -0,0 +1,50 @@
+"""Tests of the table of the built-in checks."""
+import unittest
+from unittest import mock
+
+import pep8
+
+
+def registry(module=None):
+    """Return the checks and triggers registered from module, or the table."""
+    checks = dict((kind, {}) for kind in pep8._checks)
+    with mock.patch.object(pep8, '_checks', checks):
+        with mock.patch.object(pep8, '_check_triggers', {}):
+            pep8.init_checks_registry(module)
+            return pep8._checks, pep8._check_triggers
+
+
+def entries(checks):
+    """Return the (name, codes, args) of the checks, each code once."""
+    result = []
+    for check, (codes, args) in checks.items():
+        unique = [code for index, code in enumerate(codes)
+                  if code not in codes[:index]]
+        result.append((check.__name__, unique, args))
+    return sorted(result)
+
+
+class RegistryTestCase(unittest.TestCase):
+
+    def test_table_matches_the_module(self):
+        (checks, triggers) = registry()
+        (expected, expected_triggers) = registry(pep8)
+        for kind in expected:
+            # The docstring of a check gives a code for each of its examples
+            self.assertEqual(entries(checks[kind]), entries(expected[kind]))
+        self.assertEqual(triggers, expected_triggers)
+
+    def test_triggers_of_logical_checks(self):
+        logical = [name for (name, args, codes) in pep8.BUILTIN_CHECKS
+                   if args.split()[0] == 'logical_line']
+        for name in pep8.BUILTIN_TRIGGERS:
+            self.assertIn(name, logical)
+
+    def test_default_registry(self):
+        (checks, triggers) = registry()
+        self.assertEqual(pep8._checks['physical_line'],
+                         checks['physical_line'])
+        self.assertEqual(pep8._checks['logical_line'],
+                         checks['logical_line'])
+        for check in triggers:
+            self.assertEqual(pep8._check_triggers[check], triggers[check])
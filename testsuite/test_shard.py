@@ -0,0 +1,89 @@
+"""Tests of pep8 --shard and of the merge of the partial reports."""
+import io
+import json
+import sys
+
+import pep8
+from testsuite.support import TreeTestCase, run_main
+
+
+class ShardTestCase(TreeTestCase):
+
+    def run_shards(self, args, count=3):
+        """Run each shard, return the exit statuses and the partial reports."""
+        partials = ['shard%d.json' % shard for shard in range(1, count + 1)]
+        statuses = [run_main(['--shard', '%d/%d' % (shard, count),
+                              '--output-file', partial] + args + ['.'])
+                    for shard, partial in enumerate(partials, 1)]
+        return statuses, partials
+
+    def test_merge_same_as_single_run(self):
+        for args in ([], ['--statistics', '--show-source'], ['--count'],
+                     ['--select=E2', '--format=pylint']):
+            (statuses, partials) = self.run_shards(args)
+            # The exit status comes from the merge
+            self.assertEqual(statuses, [(0, '')] * 3)
+            (status, output) = run_main(['--merge'] + args + partials)
+            self.assertEqual((status, output), run_main(args + ['.']))
+            self.assertEqual(status, 1)
+
+    def test_merge_json(self):
+        (statuses, partials) = self.run_shards(['--format=json'], 2)
+        document = json.loads(run_main(['--merge', '--format=json'] +
+                                       partials)[1])
+        expected = json.loads(run_main(['--format=json', '.'])[1])
+        for key in ('elapsed', 'walk_elapsed'):
+            del document[key], expected[key]
+        self.assertEqual(document, expected)
+
+    def test_shards_of_the_files(self):
+        files = []
+        for shard in ('1/2', '2/2', (2, 2), [1, 2]):
+            style = pep8.StyleGuide(paths=['.'], shard=shard,
+                                    output_file='partial.json')
+            style.check_files()
+            with open('partial.json') as f:
+                files.append(sorted(entry[1]
+                                    for entry in json.load(f)['files']))
+        self.assertEqual(files[2:], files[1::-1])
+        self.assertEqual(sorted(files[0] + files[1]),
+                         sorted(pep8.StyleGuide().list_files(['.'])))
+        for shard in ('0/2', '3/2', 'a/b', '2', (0, 1)):
+            self.assertRaises(ValueError, pep8.StyleGuide, shard=shard)
+
+    def test_benchmark_beside_the_partial_report(self):
+        stderr = sys.stderr
+        sys.stderr = io.StringIO()
+        try:
+            (status, output) = run_main(['--shard', '1/2', '--benchmark',
+                                         '--statistics', '.'])
+            aside = sys.stderr.getvalue()
+        finally:
+            sys.stderr = stderr
+        self.assertEqual(json.loads(output)['shard'], [1, 2])
+        self.assertIn('seconds elapsed', aside)
+
+    def test_merge_is_an_option(self):
+        with open('merge', 'w') as f:
+            f.write('x=1\n')
+        self.assertEqual(run_main(['merge']),
+                         (1, 'merge:1:2: E225 missing whitespace around '
+                             'operator\n'))
+        (statuses, partials) = self.run_shards([], 2)
+        self.assertEqual(run_main(['--merge', partials[0]]),
+                         ('missing shards: 2/2', ''))
+
+    def test_merge_errors(self):
+        (statuses, partials) = self.run_shards([], 2)
+        style = pep8.StyleGuide()
+        self.assertRaises(ValueError, style.merge_reports, partials[:1])
+        other = pep8.StyleGuide(max_line_length=100)
+        self.assertRaises(ValueError, other.merge_reports, partials)
+        with open('partial.json', 'w') as f:
+            f.write('{"shard"')
+        self.assertRaises(ValueError, style.merge_reports, ['partial.json'])
+        self.assertEqual(
+            run_main(['--merge', '--max-line-length=100'] + partials),
+            ('%s: the shard was run with other options' % partials[0], ''))
+        self.assertEqual(run_main(['--merge'] + partials),
+                         run_main(['.']))
@@ -0,0 +1,61 @@
+"""Tests of StyleGuide.check_sources(), the checks of sources in memory."""
+import io
+import sys
+from unittest import mock
+
+import pep8
+from testsuite.support import SAMPLES, TreeTestCase
+
+
+def records(violations):
+    return [(v.path, v.row, v.col, v.code) for v in violations]
+
+
+class CheckSourcesTestCase(TreeTestCase):
+
+    names = sorted(SAMPLES)
+
+    def read_sources(self, encode=False):
+        sources = pep8.OrderedDict()
+        for name in self.names:
+            with open(name, 'rb') as f:
+                data = f.read()
+            sources[name] = data if encode else data.decode('utf-8')
+        return sources
+
+    def check_files(self, **options):
+        style = pep8.StyleGuide(paths=self.names,
+                                reporter=pep8.ViolationReport, **options)
+        return records(style.check_files().violations)
+
+    def check_sources(self, sources, jobs=None, **options):
+        style = pep8.StyleGuide(**options)
+        saved = sys.stdout
+        sys.stdout = io.StringIO() if str is not bytes else io.BytesIO()
+        try:
+            violations = style.check_sources(sources, jobs=jobs)
+            self.assertEqual(sys.stdout.getvalue(), '')
+        finally:
+            sys.stdout = saved
+        return records(violations)
+
+    def test_same_as_files(self):
+        for options in ({}, {'select': ['E2', 'W']}, {'max_line_length': 60},
+                        {'max_errors_per_file': 2}):
+            expected = self.check_files(**options)
+            self.assertTrue(expected)
+            for encode in (False, True):
+                sources = self.read_sources(encode)
+                self.assertEqual(self.check_sources(sources, **options),
+                                 expected)
+                self.assertEqual(
+                    self.check_sources(sources, jobs=2, **options), expected)
+
+    def test_jobs_option(self):
+        # By default, the jobs of the options
+        style = pep8.StyleGuide(jobs=2)
+        with mock.patch.object(style, 'run_workers',
+                               wraps=style.run_workers) as run_workers:
+            violations = style.check_sources(self.read_sources())
+        self.assertTrue(run_workers.called)
+        self.assertEqual(records(violations), self.check_files())
@@ -0,0 +1,76 @@
+"""Tests of the triggers which select the logical checks to run."""
+import unittest
+
+import pep8
+from testsuite.support import (SAMPLES, AllChecks, docstring_examples,
+                               registered)
+
+TRICKY = [
+    'if  x:\n', 'x = 1  # not None\n', "s = 'a  b'  ;  t = 2\n",
+    'y = [1,\n     2]  == None\n', 'z = (a\tand b)\n', 'print  (x)\n',
+    'def f(a ,b=1):\n    return a  if b else  None\n',
+    'if True:\n\tx = y  # tab\n', 'l = x\\\n    .has_key(1)\n',
+]
+
+
+class UntriggeredChecker(pep8.Checker):
+    """Checker which runs all the logical checks on every line."""
+
+    def __init__(self, *args, **kwargs):
+        super(UntriggeredChecker, self).__init__(*args, **kwargs)
+        self._logical_triggers = AllChecks(self._logical_checks)
+
+
+class TriggerTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.options = pep8.StyleGuide(select=['E', 'W']).options
+
+    def record(self, lines, checker_class=pep8.Checker):
+        checker = checker_class(lines=lines[:], options=self.options,
+                                report=pep8.RecordingReport(self.options))
+        return checker.check_all()[3:]
+
+    def assertSameAsUntriggered(self, lines):
+        self.assertEqual(self.record(lines),
+                         self.record(lines, UntriggeredChecker), lines)
+
+    def test_samples(self):
+        for text in list(SAMPLES.values()) + TRICKY:
+            self.assertSameAsUntriggered(text.splitlines(True))
+
+    def test_docstring_examples(self):
+        for (name, code, source, lines) in docstring_examples(self.options):
+            self.assertSameAsUntriggered(lines)
+
+    def test_pep8_source(self):
+        self.assertSameAsUntriggered(
+            pep8.readlines(pep8.__file__.rstrip('co')))
+
+    def test_plugin_triggers(self):
+        calls = []
+
+        def print_call(logical_line):
+            calls.append(logical_line)
+            if logical_line.startswith('print'):
+                yield 0, 'W903 print call'
+        with registered(print_call, ['W903'], ['print']):
+            self.options = pep8.StyleGuide(select=['W903']).options
+            (logical_lines, errors) = self.record(
+                ['x = 1\n', 'print(x)\n', 'y = (1,\n', '     print)\n'])
+        self.assertEqual(logical_lines, 3)
+        self.assertEqual(calls, ['print(x)', 'y = (1, print)'])
+        self.assertEqual([error[:3] for error in errors],
+                         [(2, 0, 'W903 print call')])
+
+    def test_select(self):
+        plan = [('a', 'a', None), ('b', 'b', None), ('c', 'c', None)]
+        pep8._check_triggers.update({'a': ['  '], 'b': [' ']})
+        try:
+            triggers = pep8.TriggerPlan(plan)
+        finally:
+            del pep8._check_triggers['a'], pep8._check_triggers['b']
+        self.assertEqual(triggers.select('x'), [plan[2]])
+        self.assertEqual(triggers.select('x y'), plan[1:])
+        # A trigger also finds the triggers it contains
+        self.assertEqual(triggers.select('x  y'), plan)
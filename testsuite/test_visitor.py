@@ -0,0 +1,121 @@
+"""Tests of the shared walk of the tree checks with node_types."""
+import ast
+import contextlib
+
+import pep8
+from testsuite.support import TreeTestCase, registered, run_main
+
+
+class Functions(object):
+    """Report the functions."""
+
+    node_types = ['FunctionDef', 'AsyncFunctionDef']
+
+    def __init__(self, tree, filename):
+        self.tree = tree
+
+    def visit(self, node):
+        return [(node.lineno, node.col_offset,
+                 'W911 function %s' % node.name, type(self))]
+
+
+class Statements(Functions):
+    """Report the expression statements, visiting their base class."""
+
+    node_types = ['stmt']
+
+    def visit(self, node):
+        if isinstance(node, ast.Expr):
+            return [(node.lineno, node.col_offset,
+                     'W912 expression statement', type(self))]
+
+
+class Names(Functions):
+    """Report the names x and y, with a node class in node_types."""
+
+    node_types = [ast.Name, 'NoSuchNode']
+
+    def visit(self, node):
+        if node.id in ('x', 'y'):
+            yield node.lineno, node.col_offset, 'W913 name', type(self)
+
+
+class Nodes(Functions):
+    """Count the nodes of the tree, without node_types."""
+
+    node_types = None
+
+    def run(self):
+        count = sum(1 for node in ast.walk(self.tree))
+        yield 1, 0, 'W914 %d nodes' % count, type(self)
+
+
+class Walking(object):
+    """Mixin of a tree check which walks the tree itself to visit nodes."""
+
+    def run(self):
+        types = tuple(getattr(ast, name) if isinstance(name, str) else name
+                      for name in self.visited_types
+                      if not isinstance(name, str) or hasattr(ast, name))
+        for node in ast.walk(self.tree):
+            if isinstance(node, types):
+                for error in self.visit(node) or ():
+                    yield error
+
+
+# The same checks without node_types, in the same order of names
+class FunctionsWalk(Walking, Functions):
+    (node_types, visited_types) = (None, Functions.node_types)
+
+
+class NamesWalk(Walking, Names):
+    (node_types, visited_types) = (None, Names.node_types)
+
+
+class StatementsWalk(Walking, Statements):
+    (node_types, visited_types) = (None, Statements.node_types)
+
+
+@contextlib.contextmanager
+def plugins(*checks):
+    """Register the tree checks for the block."""
+    with contextlib.ExitStack() as stack:
+        for index, check in enumerate(checks):
+            stack.enter_context(registered(check, ['W91%d' % (index + 1)]))
+        yield
+
+
+class VisitorTestCase(TreeTestCase):
+
+    def setUp(self):
+        super(VisitorTestCase, self).setUp()
+        with open('plugins.py', 'w') as f:
+            f.write('x = 1\nprint(x)\n\n\nasync def f(y):\n    await y\n'
+                    'def g():\n    class C:\n        def h(self):\n'
+                    '            x.y\n')
+
+    def test_same_as_walking(self):
+        visitors = (Functions, Statements, Names, Nodes)
+        for args in (['.'], ['--select=W9', '--show-source', '.'],
+                     ['--jobs', '2', '.']):
+            with plugins(*visitors):
+                (status, output) = run_main(args)
+            with plugins(FunctionsWalk, StatementsWalk, NamesWalk, Nodes):
+                self.assertEqual((status, output), run_main(args))
+            for code in ('W911', 'W912', 'W913', 'W914'):
+                self.assertIn(code, output)
+
+    def test_one_walk(self):
+        walks = []
+
+        def walk(tree):
+            walks.append(tree)
+            return ast.walk(tree)
+        with plugins(Functions, Statements, Names):
+            style = pep8.StyleGuide(select=['W9'], reporter=pep8.BaseReport)
+            style.options.visitor_plan.walk = walk
+            report = style.check_files(['plugins.py'])
+        self.assertEqual(len(walks), 1)
+        self.assertEqual(report.counters['W911'], 3)
+        self.assertEqual(report.counters['W912'], 3)
+        self.assertEqual(report.counters['W913'], 4)
@@ -0,0 +1,74 @@
+"""Tests of the directory walker of pep8 against os.walk()."""
+import os
+import subprocess
+from unittest import mock
+
+import pep8
+from testsuite.support import SAMPLES, TreeTestCase, run_main
+
+SOURCES = dict(SAMPLES)
+SOURCES.update({
+    'build/generated.py': 'x=1\n',
+    'pkg/sub/build/deep.py': 'x=1\n',
+    'pkg/data.txt': 'x=1\n',
+    'pkg/script.pyw': 'x=1\n',
+    'pkg/test_one.py': 'x=1\n',
+    'zeta/alpha/b.py': 'x=1\n',
+    'zeta/Beta/a.py': 'x=1\n',
+})
+
+
+def os_walk(style, dirname):
+    """Generate the (root, filenames) of the former os.walk() loop."""
+    filepatterns = style.options.filename
+    for root, dirs, files in os.walk(dirname):
+        for subdir in sorted(dirs):
+            if style.excluded(subdir, root):
+                dirs.remove(subdir)
+        yield root, [filename for filename in sorted(files)
+                     if (pep8.filename_match(filename, filepatterns) and
+                         not style.excluded(filename, root))]
+
+
+class WalkTestCase(TreeTestCase):
+
+    sources = SOURCES
+    options = [
+        {},
+        {'exclude': ['build']},
+        {'exclude': ['build', '*.pyw', 'test_*']},
+        {'exclude': [os.path.join('pkg', 'sub')]},
+        {'filename': ['*.py', '*.pyw']},
+        {'filename': ['*.pyw', '*.txt'], 'exclude': ['zeta']},
+    ]
+
+    def test_same_as_os_walk(self):
+        for options in self.options:
+            style = pep8.StyleGuide(**options)
+            # Like the command line, a pattern with a slash is a path
+            style.options.exclude = pep8.normalize_paths(
+                ','.join(options.get('exclude', [])))
+            for dirname in ('.', 'pkg', self.root):
+                self.assertEqual(list(style.walk(dirname)),
+                                 list(os_walk(style, dirname)), options)
+
+    def test_same_output(self):
+        args = ['--exclude=build,alpha', '-v', '.']
+        with mock.patch.object(pep8.StyleGuide, 'walk', os_walk):
+            expected = run_main(args)
+        self.assertIn('directory ./zeta/Beta', expected[1])
+        self.assertEqual(run_main(args), expected)
+        with mock.patch.object(pep8.StyleGuide, 'walk', os_walk):
+            expected = run_main(['--jobs', '2'] + args)
+        self.assertEqual(run_main(['--jobs', '2'] + args), expected)
+
+    def test_gitignore(self):
+        with open('.gitignore', 'w') as f:
+            f.write('build/\n*.pyw\n')
+        try:
+            subprocess.check_call(['git', 'init', '-q', '.'])
+        except OSError:
+            self.skipTest('git is not installed')
+        self.assertEqual(
+            run_main(['--gitignore', '.']),
+            run_main(['--exclude=build,*.pyw,.git', '.']))